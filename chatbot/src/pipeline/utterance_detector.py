@@ -0,0 +1,93 @@
+from collections import deque
+
+import numpy as np
+
+
+class UtteranceDetector:
+    def __init__(self, sample_rate, config):
+        """
+        Energy-based endpointing that turns a stream of audio blocks into utterances.
+
+        Args:
+            sample_rate (int): Sample rate of the audio blocks.
+            config (dict): The "pipeline" section of the config.
+        """
+        self.sample_rate = sample_rate
+        self.speech_threshold = config["speech_threshold"]
+        self.barge_in_threshold = config["barge_in_threshold"]
+        self.min_speech_ms = config["min_speech_ms"]
+        self.end_silence_ms = config["end_silence_ms"]
+        self.partial_interval_ms = config["partial_interval_ms"]
+        self.preroll_ms = config["preroll_ms"]
+        self.reset()
+
+    def reset(self):
+        """
+        Drop any partially detected utterance.
+        """
+        self.preroll = deque()
+        self.preroll_samples = 0
+        self.utterance = []
+        self.in_speech = False
+        self.speech_ms = 0.0
+        self.silence_ms = 0.0
+        self.since_partial_ms = 0.0
+
+    def feed(self, block, bot_active=False):
+        """
+        Process one block of audio.
+
+        Args:
+            block (np.ndarray): Mono float32 samples.
+            bot_active (bool, optional): Whether the bot is talking, which raises the speech threshold
+                                         so its own voice does not count as learner speech. Defaults to False.
+
+        Returns:
+            List[Tuple[str, np.ndarray]]: Events in order: ("speech_start", None) when the learner starts
+                                          talking, ("partial", audio) every partial interval while they talk
+                                          and ("end", audio) with the whole utterance once they stop.
+        """
+        events = []
+        block_ms = len(block) * 1000 / self.sample_rate
+        level = float(np.sqrt(np.mean(np.square(block)))) if len(block) else 0.0
+
+        if not self.in_speech:
+            self.preroll.append(block)
+            self.preroll_samples += len(block)
+            while len(self.preroll) > 1 and (self.preroll_samples - len(self.preroll[0])) * 1000 / self.sample_rate >= self.preroll_ms:
+                self.preroll_samples -= len(self.preroll.popleft())
+
+            threshold = self.barge_in_threshold if bot_active else self.speech_threshold
+            if level >= threshold:
+                self.speech_ms += block_ms
+                if self.speech_ms >= self.min_speech_ms:
+                    self.in_speech = True
+                    self.utterance = list(self.preroll)
+                    self.silence_ms = 0.0
+                    self.since_partial_ms = 0.0
+                    events.append(("speech_start", None))
+            else:
+                self.speech_ms = 0.0
+            return events
+
+        self.utterance.append(block)
+        self.silence_ms = self.silence_ms + block_ms if level < self.speech_threshold else 0.0
+        self.since_partial_ms += block_ms
+
+        if self.silence_ms >= self.end_silence_ms:
+            events.append(("end", self.flush()))
+        elif self.since_partial_ms >= self.partial_interval_ms:
+            self.since_partial_ms = 0.0
+            events.append(("partial", np.concatenate(self.utterance)))
+        return events
+
+    def flush(self):
+        """
+        End the current utterance now, e.g. when the client signals the end of speech.
+
+        Returns:
+            np.ndarray: Audio of the utterance, or None if no speech was detected.
+        """
+        audio = np.concatenate(self.utterance) if self.in_speech and self.utterance else None
+        self.reset()
+        return audio
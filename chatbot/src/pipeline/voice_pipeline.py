@@ -0,0 +1,331 @@
+import time
+import queue
+import threading
+from contextlib import nullcontext
+
+import sounddevice as sd
+
+from src.pipeline.utterance_detector import UtteranceDetector
+from src.tts.voice_context import VoiceContext
+from src.utils.load_config import load_config
+from src.utils.log_config import RateLimitedLogger, setup_logging
+from src.utils.tracing import TurnTrace, get_tracer, now_ns
+
+logger = setup_logging()
+tracer = get_tracer(__name__)
+
+
+class VoicePipeline:
+    def __init__(self, stt, rag, tts, context=None, speaker=6, session_id="local", config_path="config.yaml"):
+        """
+        Voice conversation loop split into concurrent stages connected by bounded queues:
+        capture -> transcription -> generation -> synthesis -> playback.
+
+        Generation hands sentences to synthesis as soon as they close and synthesized
+        audio goes to playback as soon as it is ready. The microphone stays open while
+        the bot talks, and learner speech cancels the bot's in-flight turn (barge-in).
+
+        Args:
+            stt (STTProcessor): Speech to text processor.
+            rag (RAGPipeline): RAG pipeline generating the responses.
+            tts (TTSProcessor): Text to speech processor.
+            context (list, optional): Voice prompt segments conditioning the bot's voice. With "tts.context"
+                                      enabled, recent turns of the conversation follow them. Defaults to None.
+            speaker (int, optional): Speaker id of the bot's voice. Defaults to 6.
+            session_id (str, optional): Conversation id for the RAG memory. Defaults to "local".
+            config_path (str, optional): Path to the config file. Defaults to "config.yaml".
+        """
+        self.config = load_config(config_path)
+        pipeline_config = self.config["pipeline"]
+
+        self.stt = stt
+        self.rag = rag
+        self.tts = tts
+        self.speaker = speaker
+        context_config = self.config["tts"].get("context", {})
+        self.learner_speaker = context_config.get("learner_speaker", 0)
+        self.voice_context = VoiceContext.from_config(tts.generator, context, context_config)
+        self.context = self.voice_context or context or []
+        self.session_id = session_id
+
+        self.sample_rate = self.config["stt"]["sample_rate"]
+        self.block_samples = int(self.sample_rate * pipeline_config["block_ms"] / 1000)
+        self.detector = UtteranceDetector(self.sample_rate, pipeline_config)
+        self.playback_block_ms = pipeline_config["playback_block_ms"]
+
+        queue_size = pipeline_config["queue_size"]
+        self.audio_queue = queue.Queue(maxsize=pipeline_config["capture_queue_size"])
+        self.transcript_queue = queue.Queue(maxsize=queue_size)
+        self.sentence_queue = queue.Queue(maxsize=queue_size)
+        self.playback_queue = queue.Queue(maxsize=queue_size)
+
+        self.turn = 0
+        self.turn_lock = threading.Lock()
+        self.traces = {}
+        self.speech_started_ns = None
+        self.running = threading.Event()
+        self.bot_active = threading.Event()
+        self.dropped_blocks = 0
+        self.callback_logger = RateLimitedLogger(logger)
+        self.threads = []
+        self.input_stream = None
+
+    def new_turn(self):
+        """
+        Start a new turn, making everything still in flight for the previous turn stale.
+
+        Returns:
+            int: Id of the new turn.
+        """
+        with self.turn_lock:
+            self.turn += 1
+            for turn_trace in self.traces.values():
+                turn_trace.end(cancelled=True)
+            self.traces = {}
+            return self.turn
+
+    def is_current(self, turn):
+        return turn == self.turn
+
+    def _start_trace(self, turn):
+        """
+        Open the root span of a turn, starting when the learner started speaking.
+        The trace is only tracked once the turn is started with _track_trace.
+
+        Returns:
+            TurnTrace: Trace of the turn.
+        """
+        turn_trace = TurnTrace(tracer, turn, self.session_id, start_time=self.speech_started_ns)
+        tracer.start_span("capture", context=turn_trace.context, start_time=turn_trace.start_time).end()
+        return turn_trace
+
+    def _track_trace(self, turn, turn_trace):
+        with self.turn_lock:
+            self.traces[turn] = turn_trace
+
+    def _activate(self, turn):
+        turn_trace = self.traces.get(turn)
+        return turn_trace.activate() if turn_trace is not None else nullcontext()
+
+    def _end_trace(self, turn):
+        with self.turn_lock:
+            turn_trace = self.traces.pop(turn, None)
+        if turn_trace is not None:
+            turn_trace.end()
+
+    def barge_in(self):
+        """
+        Cancel the bot's in-flight generation, synthesis and playback.
+        """
+        turn = self.new_turn()
+        self.bot_active.clear()
+        for stage_queue in (self.sentence_queue, self.playback_queue):
+            while True:
+                try:
+                    stage_queue.get_nowait()
+                except queue.Empty:
+                    break
+        logger.info(f"Barge-in: cancelled bot output, now at turn {turn}")
+
+    def _put(self, stage_queue, item, turn):
+        """
+        Put an item on a bounded queue, giving up once the turn is stale or the pipeline stops.
+
+        Returns:
+            bool: True if the item was queued.
+        """
+        while self.running.is_set() and self.is_current(turn):
+            try:
+                stage_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage_queue):
+        try:
+            return stage_queue.get(timeout=0.1)
+        except queue.Empty:
+            return None
+
+    def _capture_callback(self, indata, frames, time_info, status):
+        # Runs on the audio thread: never block here.
+        if status:
+            self.callback_logger.info(f"Status of audio: {status}")
+        try:
+            self.audio_queue.put_nowait(indata[:, 0].copy())
+        except queue.Full:
+            self.dropped_blocks += 1
+
+    def _transcription_loop(self):
+        while self.running.is_set():
+            block = self._get(self.audio_queue)
+            if block is None:
+                continue
+
+            for event, audio in self.detector.feed(block, bot_active=self.bot_active.is_set()):
+                if event == "speech_start":
+                    self.speech_started_ns = now_ns()
+                    if self.bot_active.is_set():
+                        self.barge_in()
+                elif event == "partial":
+                    partial = self.stt.process_audio(audio, self.sample_rate)
+                    if partial:
+                        self.rag.speculate(partial, session_id=self.session_id)
+                elif event == "end":
+                    # Turns only change on this thread, so the next turn id is known before transcribing.
+                    # The turn only advances once there is a transcript, so noise does not cancel the bot's answer.
+                    turn_trace = self._start_trace(self.turn + 1)
+                    with turn_trace.activate():
+                        text = self.stt.process_audio(audio, self.sample_rate)
+                    if text:
+                        turn = self.new_turn()
+                        self._track_trace(turn, turn_trace)
+                        if self.voice_context is not None:
+                            self.voice_context.add_turn(self.learner_speaker, text, audio, sample_rate=self.sample_rate)
+                        self._put(self.transcript_queue, (turn, text), turn)
+                    else:
+                        turn_trace.end()
+
+    def _generation_loop(self):
+        while self.running.is_set():
+            item = self._get(self.transcript_queue)
+            if item is None:
+                continue
+            turn, question = item
+            if not self.is_current(turn):
+                continue
+
+            logger.info(f"Question received: {question}")
+            print(f"User: {question}")
+            self.bot_active.set()
+            start_time = time.time()
+
+            with self._activate(turn):
+                sentences = self.rag.rag_stream_sentences(question, session_id=self.session_id)
+                try:
+                    for sentence in sentences:
+                        if not self.is_current(turn):
+                            logger.info(f"Generation for turn {turn} cancelled")
+                            break
+                        print(f"Bot: {sentence}")
+                        self._put(self.sentence_queue, (turn, sentence), turn)
+                except Exception as e:
+                    logger.error(f"Error when generating response: {e}")
+                finally:
+                    sentences.close()
+
+            logger.info(f"LLM response took {time.time() - start_time:.2f} seconds")
+            self._put(self.sentence_queue, (turn, None), turn)
+
+    def _synthesis_loop(self):
+        while self.running.is_set():
+            item = self._get(self.sentence_queue)
+            if item is None:
+                continue
+            turn, sentence = item
+            if not self.is_current(turn):
+                continue
+            if sentence is None:
+                self._put(self.playback_queue, (turn, None, None), turn)
+                continue
+
+            try:
+                with self._activate(turn):
+                    audio = self.tts.generate_audio(
+                        text=sentence,
+                        speaker=self.speaker,
+                        context=self.context,
+                        should_stop=lambda: not self.is_current(turn)
+                    )
+            except Exception as e:
+                logger.error(f"Error when synthesizing audio: {e}")
+                continue
+            if audio.numel() and self.is_current(turn):
+                self._put(self.playback_queue, (turn, audio.detach().cpu().float().numpy(), sentence), turn)
+
+    def _playback_loop(self):
+        sample_rate = self.tts.generator.sample_rate
+        block_samples = int(sample_rate * self.playback_block_ms / 1000)
+
+        with sd.OutputStream(samplerate=sample_rate, channels=1, dtype="float32") as stream:
+            while self.running.is_set():
+                item = self._get(self.playback_queue)
+                if item is None:
+                    continue
+                turn, audio, sentence = item
+                if not self.is_current(turn):
+                    continue
+                if audio is None:
+                    self.bot_active.clear()
+                    self._end_trace(turn)
+                    continue
+
+                turn_trace = self.traces.get(turn)
+                if turn_trace is not None:
+                    turn_trace.mark_first_audio()
+                with self._activate(turn), tracer.start_as_current_span("playback"):
+                    # Write in small blocks so a barge-in stops playback within one block.
+                    for start in range(0, len(audio), block_samples):
+                        if not self.is_current(turn) or not self.running.is_set():
+                            break
+                        stream.write(audio[start: start + block_samples].reshape(-1, 1))
+                    else:
+                        # Only sentences the learner actually heard become part of the voice context.
+                        if self.voice_context is not None and self.is_current(turn):
+                            self.voice_context.add_turn(self.speaker, sentence, audio)
+
+    def start(self):
+        """
+        Start all stages and open the microphone.
+        """
+        self.running.set()
+        for name, target in [
+            ("transcription", self._transcription_loop),
+            ("generation", self._generation_loop),
+            ("synthesis", self._synthesis_loop),
+            ("playback", self._playback_loop),
+        ]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+        self.input_stream = sd.InputStream(
+            samplerate=self.sample_rate,
+            channels=1,
+            dtype="float32",
+            blocksize=self.block_samples,
+            callback=self._capture_callback,
+        )
+        self.input_stream.start()
+        logger.info("Voice pipeline started, listening...")
+
+    def stop(self):
+        """
+        Close the microphone and stop all stages.
+        """
+        self.running.clear()
+        self.new_turn()
+        if self.input_stream is not None:
+            self.input_stream.stop()
+            self.input_stream.close()
+            self.input_stream = None
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+        if self.dropped_blocks:
+            logger.warning(f"Dropped {self.dropped_blocks} audio blocks because transcription fell behind")
+        logger.info("Voice pipeline stopped")
+
+    def run_forever(self):
+        """
+        Run the pipeline until interrupted with Ctrl+C.
+        """
+        self.start()
+        try:
+            while True:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
@@ -0,0 +1,157 @@
+import re
+import math
+import heapq
+from collections import Counter
+
+from langchain_core.documents import Document
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+def tokenize(text):
+    """
+    Split text into lowercased word tokens.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: Word tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        In-process inverted index scored with Okapi BM25.
+
+        The index is updated incrementally, so it can be kept in sync with the
+        vectorstore without rebuilding.
+
+        Args:
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Document length normalization. Defaults to 0.75.
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = {}
+        self.documents = {}
+        self.total_length = 0
+
+    def add(self, doc_id, document):
+        """
+        Index a document, replacing any previous version with the same id.
+
+        Args:
+            doc_id (str): Id of the document in the vectorstore.
+            document (Document): Document to index.
+        """
+        if doc_id in self.documents:
+            self.remove([doc_id])
+
+        term_counts = Counter(tokenize(document.page_content))
+        for term, count in term_counts.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+        length = sum(term_counts.values())
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self.documents[doc_id] = document
+
+    def add_documents(self, doc_ids, documents):
+        """
+        Index a batch of documents.
+
+        Args:
+            doc_ids (List[str]): Ids of the documents in the vectorstore.
+            documents (List[Document]): Documents in the same order as doc_ids.
+        """
+        for doc_id, document in zip(doc_ids, documents):
+            self.add(doc_id, document)
+
+    def remove(self, doc_ids):
+        """
+        Remove documents from the index.
+
+        Args:
+            doc_ids (List[str]): Ids of the documents to remove.
+        """
+        for doc_id in doc_ids:
+            document = self.documents.pop(doc_id, None)
+            if document is None:
+                continue
+            for term in set(tokenize(document.page_content)):
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+            self.total_length -= self.doc_lengths.pop(doc_id)
+
+    def search(self, query, k=10):
+        """
+        Score the documents matching any query term.
+
+        Args:
+            query (str): Query text.
+            k (int, optional): Number of results. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, float]]: (doc_id, score) pairs, best first.
+        """
+        num_docs = len(self.documents)
+        if not num_docs:
+            return []
+
+        avg_length = self.total_length / num_docs
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    def get_document(self, doc_id):
+        """
+        Get an indexed document with its id set.
+
+        Args:
+            doc_id (str): Id of the document.
+
+        Returns:
+            Document: The indexed document.
+        """
+        document = self.documents[doc_id]
+        return Document(page_content=document.page_content, metadata=document.metadata, id=doc_id)
+
+    def __len__(self):
+        return len(self.documents)
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several rankings with reciprocal rank fusion.
+
+    Args:
+        rankings (List[List[str]]): Rankings of document keys, best first.
+        k (int, optional): Rank smoothing constant. Defaults to 60.
+
+    Returns:
+        List[str]: Document keys ordered by fused score.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
@@ -0,0 +1,84 @@
+import os
+import json
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+
+class ChangeLog:
+    def __init__(self, path):
+        """
+        Append-only JSON-lines log of the changes made to an index since its JSON file was last written.
+
+        Saving appends only the changes, so small updates of a large index cost O(changes) instead of
+        rewriting the whole file; the owner rewrites its file and clears the log once the log outgrows it.
+        Every change sets or deletes one id, so replaying the log in order is idempotent.
+
+        Args:
+            path (str): File of the log, next to the index file.
+        """
+        self.path = path
+        self.pending = []
+        self.logged = 0
+        self.truncated = False
+
+    def record(self, change):
+        """
+        Args:
+            change (dict): Change to append on the next flush.
+        """
+        self.pending.append(change)
+
+    def __len__(self):
+        """
+        Returns:
+            int: Changes in the log, written or pending.
+        """
+        return self.logged + len(self.pending)
+
+    def flush(self):
+        """
+        Append the pending changes to the log file.
+        """
+        if not self.pending:
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(change, ensure_ascii=False) + "\n" for change in self.pending))
+        self.logged += len(self.pending)
+        self.pending = []
+
+    def read(self):
+        """
+        Read the changes logged so far. A line cut short by a crash ends the log, and sets truncated
+        so the owner rewrites its file before anything is appended after that line.
+
+        Returns:
+            List[dict]: Logged changes, oldest first.
+        """
+        self.pending = []
+        self.logged = 0
+        self.truncated = False
+        if not os.path.exists(self.path):
+            return []
+        changes = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    changes.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Ignoring truncated change log entries in {self.path}")
+                    self.truncated = True
+                    break
+        self.logged = len(changes)
+        return changes
+
+    def clear(self):
+        """
+        Drop the log, once the index file holds every change.
+        """
+        self.pending = []
+        self.logged = 0
+        self.truncated = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
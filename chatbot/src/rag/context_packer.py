@@ -0,0 +1,195 @@
+import os
+import re
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+CHUNK_INDEX_PATTERN = re.compile(r"^(?P<prefix>.+)_(?P<index>\d+)$")
+WORD_PATTERN = re.compile(r"[\w']+")
+
+
+def load_tokenizer(name, cache_dir=None):
+    """
+    Load the tokenizer used to measure the prompt budget.
+
+    Args:
+        name (str): A Hugging Face tokenizer id (e.g. "google/gemma-3-4b-it") or a tiktoken encoding name.
+        cache_dir (str, optional): Directory tiktoken caches its BPE files in, so they are only
+                                   downloaded once. Defaults to tiktoken's temporary directory.
+
+    Returns:
+        Tuple[Callable, Callable]: encode(text) -> List[int] and decode(List[int]) -> str functions.
+    """
+    if "/" in name:
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(name)
+        return (
+            lambda text: tokenizer.encode(text, add_special_tokens=False),
+            lambda tokens: tokenizer.decode(tokens),
+        )
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        os.environ.setdefault("TIKTOKEN_CACHE_DIR", cache_dir)
+    import tiktoken
+
+    encoding = tiktoken.get_encoding(name)
+    return encoding.encode, encoding.decode
+
+
+def shingles(text, size=3):
+    """
+    Get the word shingles of a text.
+
+    Args:
+        text (str): Text to shingle.
+        size (int, optional): Number of words per shingle. Defaults to 3.
+
+    Returns:
+        Set[Tuple[str]]: Word shingles, or single words for texts shorter than size.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < size:
+        return {(word,) for word in words}
+    return {tuple(words[i: i + size]) for i in range(len(words) - size + 1)}
+
+
+def merge_overlap(left, right, min_overlap=5):
+    """
+    Join two consecutive chunks, dropping the text they share.
+
+    Args:
+        left (str): Earlier chunk.
+        right (str): Following chunk.
+        min_overlap (int, optional): Shortest shared text treated as overlap. Defaults to 5.
+
+    Returns:
+        str: The merged text.
+    """
+    for size in range(min(len(left), len(right)), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return f"{left} {right}"
+
+
+class ContextPacker:
+    def __init__(self, config):
+        """
+        Pack retrieved documents into a deduplicated context that fits a token budget.
+
+        Args:
+            config (dict): Application config, the "rag.context" section is used.
+        """
+        context_config = config["rag"].get("context", {})
+        self.max_tokens = context_config.get("max_tokens", 768)
+        self.dedupe_threshold = context_config.get("dedupe_threshold", 0.8)
+        tokenizer = context_config.get("tokenizer", "google/gemma-3-4b-it")
+        fallback = context_config.get("fallback_tokenizer", "cl100k_base")
+        cache_dir = context_config.get("tiktoken_cache_dir", "cache/tiktoken")
+        try:
+            self.encode, self.decode = load_tokenizer(tokenizer, cache_dir)
+        except Exception as e:
+            # e.g. offline, or the gated Gemma repo without a Hugging Face login.
+            logger.warning(f"Failed to load tokenizer {tokenizer}, measuring the budget with {fallback}: {e}")
+            self.encode, self.decode = load_tokenizer(fallback, cache_dir)
+
+    def merge_adjacent(self, documents):
+        """
+        Merge chunks that are neighbours in the same source file.
+
+        Args:
+            documents (List[Document]): Retrieved documents, best first.
+
+        Returns:
+            List[str]: Passages in order of their best-ranked chunk.
+        """
+        groups = {}
+        for rank, doc in enumerate(documents):
+            match = CHUNK_INDEX_PATTERN.match(str(doc.metadata.get("chunk_id", "")))
+            if match:
+                key = match.group("prefix")
+                index = int(match.group("index"))
+            else:
+                key = f"__rank_{rank}"
+                index = 0
+            groups.setdefault(key, []).append((index, rank, doc.page_content))
+
+        ranked_passages = []
+        for chunks in groups.values():
+            chunks.sort(key=lambda chunk: chunk[0])
+            prev_index, best_rank, text = chunks[0]
+            for index, rank, content in chunks[1:]:
+                if index == prev_index:
+                    best_rank = min(best_rank, rank)
+                    continue
+                if index == prev_index + 1:
+                    text = merge_overlap(text, content)
+                    best_rank = min(best_rank, rank)
+                else:
+                    ranked_passages.append((best_rank, text))
+                    best_rank, text = rank, content
+                prev_index = index
+            ranked_passages.append((best_rank, text))
+
+        passages = [text for _, text in sorted(ranked_passages, key=lambda passage: passage[0])]
+        return passages
+
+    def deduplicate(self, passages):
+        """
+        Drop passages that are near-duplicates of a better-ranked passage.
+
+        Args:
+            passages (List[str]): Passages, best first.
+
+        Returns:
+            List[str]: Passages without near-duplicates.
+        """
+        kept = []
+        kept_shingles = []
+        for passage in passages:
+            passage_shingles = shingles(passage)
+            if not passage_shingles:
+                continue
+            duplicate = False
+            for other in kept_shingles:
+                overlap = len(passage_shingles & other)
+                if overlap / len(passage_shingles | other) >= self.dedupe_threshold or overlap == len(passage_shingles):
+                    duplicate = True
+                    break
+            if not duplicate:
+                kept.append(passage)
+                kept_shingles.append(passage_shingles)
+        return kept
+
+    def pack(self, documents):
+        """
+        Build the prompt context from retrieved documents.
+
+        Args:
+            documents (List[Document]): Retrieved documents, best first.
+
+        Returns:
+            str: Context text within the token budget.
+        """
+        passages = self.deduplicate(self.merge_adjacent(documents))
+
+        packed = []
+        used_tokens = 0
+        for passage in passages:
+            tokens = self.encode(passage + "\n")
+            remaining = self.max_tokens - used_tokens
+            if len(tokens) > remaining:
+                if packed:
+                    continue
+                packed.append(self.decode(tokens[:remaining]).strip())
+                used_tokens += remaining
+                break
+            packed.append(passage)
+            used_tokens += len(tokens)
+
+        logger.info(
+            f"Packed {len(documents)} documents into {len(packed)} passages ({used_tokens}/{self.max_tokens} tokens)"
+        )
+        return "\n".join(packed)
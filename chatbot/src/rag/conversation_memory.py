@@ -0,0 +1,107 @@
+import threading
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+
+class ConversationMemory:
+    def __init__(self, summarizer, count_tokens, max_tokens=512, keep_turns=4):
+        """
+        Bounded memory of one conversation: a rolling summary plus the most recent turns.
+
+        The rendered history only ever grows at its end, except when older turns
+        are folded into the summary, so consecutive prompts share a long stable
+        prefix that Ollama can reuse.
+
+        Args:
+            summarizer (Callable[[str, str], str]): Function (summary, turns_text) -> new summary.
+            count_tokens (Callable[[str], int]): Function counting the tokens of a text.
+            max_tokens (int, optional): Token budget of the recent turns before they are summarized. Defaults to 512.
+            keep_turns (int, optional): Number of latest turns never folded into the summary. Defaults to 4.
+        """
+        self.summarizer = summarizer
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary = ""
+        self.turns = []
+        self.lock = threading.Lock()
+        self.summary_thread = None
+
+    @staticmethod
+    def format_turns(turns):
+        """
+        Format turns as a dialogue transcript.
+
+        Args:
+            turns (List[Tuple[str, str]]): (question, answer) pairs.
+
+        Returns:
+            str: The transcript.
+        """
+        return "\n".join(f"Learner: {question}\nEnglishBuddy: {answer}" for question, answer in turns)
+
+    def render(self):
+        """
+        Render the history for the prompt, ordered summary then recent turns.
+
+        Returns:
+            str: History text, empty for a new conversation.
+        """
+        with self.lock:
+            summary = self.summary
+            turns = list(self.turns)
+
+        parts = []
+        if summary:
+            parts.append(f"Summary of the earlier conversation:\n{summary}")
+        if turns:
+            parts.append(f"Recent conversation:\n{self.format_turns(turns)}")
+        return "\n\n".join(parts)
+
+    def add_turn(self, question, answer):
+        """
+        Record a finished turn and summarize older turns in the background once over budget.
+
+        Args:
+            question (str): User's question.
+            answer (str): Generated response.
+        """
+        with self.lock:
+            self.turns.append((question, answer))
+            self._maybe_summarize()
+
+    def _maybe_summarize(self):
+        # Must be called with self.lock held.
+        if self.summary_thread is not None or len(self.turns) <= self.keep_turns:
+            return
+        if self.count_tokens(self.format_turns(self.turns)) <= self.max_tokens:
+            return
+        folded = self.turns[:-self.keep_turns]
+        self.summary_thread = threading.Thread(target=self._summarize, args=(self.summary, folded), daemon=True)
+        self.summary_thread.start()
+
+    def _summarize(self, summary, folded):
+        try:
+            new_summary = self.summarizer(summary, self.format_turns(folded))
+        except Exception as e:
+            logger.error(f"Failed to summarize conversation history: {e}")
+            with self.lock:
+                self.summary_thread = None
+            return
+
+        with self.lock:
+            self.summary = new_summary.strip()
+            self.turns = self.turns[len(folded):]
+            self.summary_thread = None
+            self._maybe_summarize()
+        logger.info(f"Folded {len(folded)} turns into the conversation summary")
+
+    def clear(self):
+        """
+        Forget the conversation.
+        """
+        with self.lock:
+            self.summary = ""
+            self.turns = []
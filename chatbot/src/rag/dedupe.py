@@ -0,0 +1,306 @@
+import os
+import re
+import json
+import base64
+
+import mmh3
+import numpy as np
+import xxhash
+from src.rag.change_log import ChangeLog
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+MERSENNE_PRIME = (1 << 61) - 1
+# a and b are drawn below 2**32 so a * h + b, with 32-bit shingle hashes h, never wraps around in uint64.
+COEFFICIENT_LIMIT = 1 << 32
+# Bumped whenever signatures change, so indexes saved with older ones are rebuilt.
+SIGNATURE_VERSION = 2
+NON_WORD_PATTERN = re.compile(r"[^\w\s]")
+
+
+def normalize(text):
+    """
+    Normalize chunk text before hashing, so case, punctuation and spacing differences do not count.
+
+    Args:
+        text (str): Chunk text.
+
+    Returns:
+        str: Lowercased text without punctuation and with collapsed whitespace.
+    """
+    return " ".join(NON_WORD_PATTERN.sub(" ", text.lower()).split())
+
+
+class NearDuplicateFilter:
+    def __init__(self, threshold=0.85, num_perm=64, bands=16, shingle_size=5, seed=0, persist_path=None):
+        """
+        Drop near-duplicate chunks with MinHash signatures and LSH banding.
+
+        Exact duplicates are caught by an xxhash of the normalized text; the rest are compared
+        by MinHash over character shingles, which suits the short chunks the PDF splitter produces.
+        The hashes and signatures of the indexed chunks are kept and saved next to the vectorstore,
+        so chunks of a new file are also checked against everything ingested before. Changes are
+        appended to a log next to the JSON file, which is only rewritten once the log outgrows it.
+
+        Args:
+            threshold (float, optional): Estimated Jaccard similarity above which chunks are duplicates. Defaults to 0.85.
+            num_perm (int, optional): MinHash permutations. Defaults to 64.
+            bands (int, optional): LSH bands; num_perm must be divisible by it. Defaults to 16.
+            shingle_size (int, optional): Characters per shingle. Defaults to 5.
+            seed (int, optional): Seed of the permutations. Defaults to 0.
+            persist_path (str, optional): JSON file the index of stored chunks is saved to. Defaults to None.
+        """
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.seed = seed
+        self.persist_path = persist_path
+        self.changes = ChangeLog(f"{persist_path}.log") if persist_path else None
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, COEFFICIENT_LIMIT, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, COEFFICIENT_LIMIT, num_perm, dtype=np.uint64)
+
+        # Index of the stored chunks: id -> (group, digest, signature), plus lookups by digest and band.
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def signature(self, text):
+        """
+        Args:
+            text (str): Normalized text.
+
+        Returns:
+            np.ndarray: MinHash signature of num_perm values.
+        """
+        size = self.shingle_size
+        shingles = {text[i:i + size] for i in range(max(1, len(text) - size + 1))}
+        hashes = np.array([mmh3.hash(shingle, signed=False) for shingle in shingles], dtype=np.uint64)
+        # Universal hashing (a * h + b) mod p, exact since a * h + b < 2**64, stands in for
+        # num_perm independent hash functions.
+        permuted = (np.outer(hashes, self.a) + self.b) % np.uint64(MERSENNE_PRIME)
+        return permuted.min(axis=0)
+
+    def filter(self, documents, group_key="word", exclude_ids=()):
+        """
+        Keep the first of every group of near-duplicate documents, and drop documents that
+        duplicate a chunk already indexed.
+
+        Only documents with the same group_key metadata are compared, so dictionary rows of
+        different headwords are never merged. A kept document records in its "duplicates"
+        metadata how many documents of the same batch were merged into it.
+
+        Args:
+            documents (List[Document]): Documents to filter, in ingestion order.
+            group_key (str, optional): Metadata key documents must share to be compared. Defaults to "word".
+            exclude_ids (Iterable[str], optional): Indexed chunks not to compare with, e.g. the old chunks
+                                                   of a file being re-ingested. Defaults to ().
+
+        Returns:
+            Tuple[List[Document], dict]: Kept documents and counts of exact and near duplicates removed,
+                                         and of those removed as duplicates of indexed chunks.
+        """
+        exclude_ids = set(exclude_ids)
+        kept = []
+        exact = {}
+        buckets = {}
+        signatures = []
+        stats = {"input": len(documents), "exact": 0, "near": 0, "indexed": 0}
+        for doc in documents:
+            group = doc.metadata.get(group_key)
+            text = normalize(doc.page_content)
+            digest = (group, xxhash.xxh64_intdigest(text.encode("utf-8")))
+            if digest in exact:
+                self._merge(kept[exact[digest]])
+                stats["exact"] += 1
+                continue
+            if any(doc_id not in exclude_ids for doc_id in self.exact.get(digest, ())):
+                stats["exact"] += 1
+                stats["indexed"] += 1
+                continue
+
+            signature = self.signature(text)
+            keys = self._band_keys(group, signature)
+            candidates = {index for key in keys for index in buckets.get(key, ())}
+            duplicate_of = next(
+                (
+                    index for index in sorted(candidates)
+                    if np.mean(signatures[index] == signature) >= self.threshold
+                ),
+                None
+            )
+            if duplicate_of is not None:
+                self._merge(kept[duplicate_of])
+                stats["near"] += 1
+                continue
+            if self._indexed_duplicate(keys, signature, exclude_ids):
+                stats["near"] += 1
+                stats["indexed"] += 1
+                continue
+
+            index = len(kept)
+            kept.append(doc)
+            signatures.append(signature)
+            exact[digest] = index
+            for key in keys:
+                buckets.setdefault(key, []).append(index)
+
+        stats["kept"] = len(kept)
+        return kept, stats
+
+    def add(self, ids, documents, group_key="word"):
+        """
+        Index stored chunks, so later batches are checked against them.
+
+        Args:
+            ids (List[str]): Ids of the chunks in the vectorstore.
+            documents (List[Document]): The chunks.
+            group_key (str, optional): Metadata key documents must share to be compared. Defaults to "word".
+        """
+        for doc_id, doc in zip(ids, documents):
+            group = doc.metadata.get(group_key)
+            text = normalize(doc.page_content)
+            digest = xxhash.xxh64_intdigest(text.encode("utf-8"))
+            signature = self.signature(text)
+            self._index(doc_id, group, digest, signature)
+            if self.changes is not None:
+                self.changes.record({"id": doc_id, "entry": [group, digest, self._encode(signature)]})
+
+    def remove(self, ids):
+        """
+        Args:
+            ids (Iterable[str]): Ids of chunks deleted from the vectorstore.
+        """
+        for doc_id in ids:
+            if self._unindex(doc_id) and self.changes is not None:
+                self.changes.record({"id": doc_id})
+
+    def clear(self):
+        self.entries = {}
+        self.exact = {}
+        self.buckets = {}
+        # Changes are only appended to a file this index was loaded from or last wrote in full.
+        self.synced = False
+
+    def save(self):
+        """
+        Persist the changes since the last save next to the vectorstore; a no-op when nothing changed.
+        """
+        if not self.persist_path:
+            return
+        if self.synced and not self.changes.truncated:
+            if not self.changes.pending:
+                return
+            if len(self.changes) <= len(self):
+                self.changes.flush()
+                return
+
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "params": self._params(),
+                "entries": {
+                    doc_id: [group, digest, self._encode(signature)]
+                    for doc_id, (group, digest, signature) in self.entries.items()
+                },
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.persist_path)
+        self.changes.clear()
+        self.synced = True
+        logger.info(f"Saved dedupe index with {len(self)} chunks to {self.persist_path}")
+
+    def load(self):
+        """
+        Load the index from disk.
+
+        Returns:
+            bool: True if an index built with the same parameters was found and loaded.
+        """
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return False
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load dedupe index from {self.persist_path}: {e}")
+            return False
+        if data.get("params") != self._params():
+            logger.info(f"Dedupe index at {self.persist_path} was built with other parameters, rebuilding")
+            return False
+        self.clear()
+        for doc_id, (group, digest, signature) in data["entries"].items():
+            self._index(doc_id, group, digest, self._decode(signature))
+        for change in self.changes.read():
+            if "entry" in change:
+                group, digest, signature = change["entry"]
+                self._index(change["id"], group, digest, self._decode(signature))
+            else:
+                self._unindex(change["id"])
+        self.synced = True
+        if self.changes.truncated:
+            self.save()
+        logger.info(f"Loaded dedupe index with {len(self)} chunks from {self.persist_path}")
+        return True
+
+    def _params(self):
+        return {
+            "version": SIGNATURE_VERSION,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "shingle_size": self.shingle_size,
+            "seed": self.seed,
+        }
+
+    def _band_keys(self, group, signature):
+        return [
+            (group, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _indexed_duplicate(self, keys, signature, exclude_ids):
+        candidates = {doc_id for key in keys for doc_id in self.buckets.get(key, ())} - exclude_ids
+        return any(np.mean(self.entries[doc_id][2] == signature) >= self.threshold for doc_id in candidates)
+
+    @staticmethod
+    def _encode(signature):
+        return base64.b64encode(signature.tobytes()).decode("ascii")
+
+    @staticmethod
+    def _decode(signature):
+        return np.frombuffer(base64.b64decode(signature), dtype=np.uint64)
+
+    def _index(self, doc_id, group, digest, signature):
+        self._unindex(doc_id)
+        self.entries[doc_id] = (group, digest, signature)
+        self.exact.setdefault((group, digest), set()).add(doc_id)
+        for key in self._band_keys(group, signature):
+            self.buckets.setdefault(key, set()).add(doc_id)
+
+    def _unindex(self, doc_id):
+        entry = self.entries.pop(doc_id, None)
+        if entry is None:
+            return False
+        group, digest, signature = entry
+        self._discard(self.exact, (group, digest), doc_id)
+        for key in self._band_keys(group, signature):
+            self._discard(self.buckets, key, doc_id)
+        return True
+
+    @staticmethod
+    def _discard(lookup, key, doc_id):
+        members = lookup.get(key)
+        if members is not None:
+            members.discard(doc_id)
+            if not members:
+                del lookup[key]
+
+    @staticmethod
+    def _merge(document):
+        document.metadata["duplicates"] = document.metadata.get("duplicates", 0) + 1
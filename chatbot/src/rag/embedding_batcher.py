@@ -0,0 +1,149 @@
+import time
+import queue
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+QUEUE_WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100]
+
+
+class BatchedEmbeddings(Embeddings):
+    def __init__(self, embeddings, max_batch_size=32, max_wait_ms=5, stats_interval_s=30):
+        """
+        Embed the queries of concurrent sessions in shared forward passes.
+
+        Callers of embed_query block on a future while one worker thread collects the pending queries
+        into a batch, embeds them with a single embed_documents call and fans the vectors back out.
+        A query arriving while the worker is idle is embedded right away; the worker only waits up to
+        max_wait_ms for more queries when the previous batch showed concurrent load, so a single
+        learner does not pay for the batching window.
+
+        Queries and documents must embed the same way, which holds for the sentence-transformers
+        and ONNX models used here. embed_documents calls are already batched and bypass the queue.
+
+        Args:
+            embeddings (Embeddings): Wrapped embedding model.
+            max_batch_size (int, optional): Most queries per forward pass. Defaults to 32.
+            max_wait_ms (float, optional): Longest wait for more queries under load. Defaults to 5.
+            stats_interval_s (int, optional): Seconds between stats log lines. Defaults to 30.
+        """
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.stats_interval_s = stats_interval_s
+
+        self.incoming = queue.Queue()
+        self.batch_sizes = Counter()
+        self.queue_waits = Counter()
+        self.recent_waits = deque(maxlen=1000)
+        self.batches = 0
+        self.last_batch_size = 0
+        self.last_stats_at = time.perf_counter()
+
+        self.running = threading.Event()
+        self.running.set()
+        # Held while submitting and stopping, so no query is queued after stop() has drained the queue.
+        self.submit_lock = threading.Lock()
+        self.worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self.worker.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        future = Future()
+        with self.submit_lock:
+            if not self.running.is_set():
+                raise RuntimeError("Embedding batcher is stopped.")
+            self.incoming.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def stop(self):
+        """
+        Stop the worker and fail the queries it did not embed, so no caller waits forever.
+        """
+        with self.submit_lock:
+            self.running.clear()
+        self.worker.join(timeout=5)
+        error = RuntimeError("Embedding batcher stopped before the query was embedded.")
+        while True:
+            try:
+                _, future, _ = self.incoming.get_nowait()
+            except queue.Empty:
+                break
+            if not future.done():
+                future.set_exception(error)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Batch count, batch size and queue wait histograms, and queue wait percentiles.
+        """
+        waits = list(self.recent_waits)
+        return {
+            "batches": self.batches,
+            "queued": self.incoming.qsize(),
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "queue_wait_ms_histogram": {
+                (f"<={bucket}" if bucket != float("inf") else f">{QUEUE_WAIT_BUCKETS_MS[-1]}"): self.queue_waits[bucket]
+                for bucket in QUEUE_WAIT_BUCKETS_MS + [float("inf")]
+            },
+            "queue_wait_ms_p50": round(float(np.percentile(waits, 50)) * 1000, 2) if waits else None,
+            "queue_wait_ms_p95": round(float(np.percentile(waits, 95)) * 1000, 2) if waits else None,
+        }
+
+    def _collect(self):
+        try:
+            batch = [self.incoming.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + (self.max_wait_s if self.last_batch_size > 1 else 0)
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self.incoming.get_nowait())
+            except queue.Empty:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.incoming.get(timeout=remaining))
+                except queue.Empty:
+                    break
+        return batch
+
+    def _run(self):
+        while self.running.is_set():
+            batch = self._collect()
+            if batch:
+                self._embed(batch)
+            if time.perf_counter() - self.last_stats_at >= self.stats_interval_s:
+                self.last_stats_at = time.perf_counter()
+                if self.batches:
+                    logger.info(f"Embedding batcher stats: {self.stats()}")
+
+    def _embed(self, batch):
+        started_at = time.perf_counter()
+        for _, _, submitted_at in batch:
+            wait_s = started_at - submitted_at
+            self.recent_waits.append(wait_s)
+            self.queue_waits[next((b for b in QUEUE_WAIT_BUCKETS_MS if wait_s * 1000 <= b), float("inf"))] += 1
+        self.batches += 1
+        self.batch_sizes[len(batch)] += 1
+        self.last_batch_size = len(batch)
+
+        try:
+            vectors = self.embeddings.embed_documents([text for text, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Error when embedding a batch of {len(batch)} queries: {e}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), vector in zip(batch, vectors):
+            future.set_result(vector)
@@ -0,0 +1,27 @@
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from src.utils.tracing import get_tracer
+
+tracer = get_tracer(__name__)
+
+
+class TracedEmbeddings(Embeddings):
+    def __init__(self, embeddings):
+        """
+        Embeddings wrapper recording a span for every embedding call, so the time spent
+        embedding shows up separately from the vector search that triggered it.
+
+        Args:
+            embeddings (Embeddings): Wrapped embedding model.
+        """
+        self.embeddings = embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with tracer.start_as_current_span("embedding.documents") as span:
+            span.set_attribute("embedding.count", len(texts))
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with tracer.start_as_current_span("embedding.query"):
+            return self.embeddings.embed_query(text)
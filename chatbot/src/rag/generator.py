@@ -1,25 +1,55 @@
+import asyncio
+import threading
+
+import httpx
+from opentelemetry import trace
 from langchain_ollama import OllamaLLM
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from src.utils.log_config import setup_logging
 from src.utils.load_config import load_config
+from src.utils.tracing import get_tracer
 
 logger = setup_logging()
+tracer = get_tracer(__name__)
 
 class Generator:
-    def __init__(self):
+    def __init__(self, host=None):
         """
         A class to generate responses using a language model.
+
+        Args:
+            host (str, optional): Ollama URL, e.g. a local stand-in for benchmarks. Defaults to ollama.host from the config.
         """
         self.config = load_config("config.yaml")
+        ollama_config = self.config["ollama"]
+        max_concurrency = ollama_config.get("max_concurrency", 8)
+        max_connections = ollama_config.get("max_connections", max_concurrency * 2)
+        
+        # One OllamaLLM holds one sync and one async httpx pool, so every call made
+        # through this Generator reuses the same keep-alive connections.
         self.llm = OllamaLLM(
-            model=self.config["ollama"]["model"],
-            base_url="http://127.0.0.1:11434"
+            model=ollama_config["model"],
+            base_url=host or ollama_config["host"],
+            keep_alive=ollama_config.get("keep_alive"),
+            client_kwargs={
+                "timeout": httpx.Timeout(ollama_config.get("request_timeout", 120)),
+                "limits": httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_connections
+                ),
+            }
         )
+        self.limiter = threading.BoundedSemaphore(max_concurrency)
+        self.async_limiter = asyncio.Semaphore(max_concurrency)
+        # History comes before the retrieved context so the prompt prefix stays the same
+        # from turn to turn and Ollama can reuse it instead of prefilling it again.
         self.prompt_template = PromptTemplate(
-            input_variables=["context", "question"],
+            input_variables=["history", "context", "question"],
             template=
             """
+            {history}
+
             Answer the question based on the following context:
             {context}
 
@@ -30,18 +60,158 @@ class Generator:
             """ 
         )
         self.chain = self.prompt_template | self.llm | StrOutputParser()
+        self.summary_prompt_template = PromptTemplate(
+            input_variables=["summary", "turns"],
+            template=
+            """
+            Update the summary of an English practice conversation between a learner and EnglishBuddy.
+            Keep the learner's name if given, their level, topics discussed and mistakes corrected.
+            Answer with the new summary only, in at most five sentences.
+
+            Current summary:
+            {summary}
+
+            New lines of conversation:
+            {turns}
+            """
+        )
+        self.summary_chain = self.summary_prompt_template | self.llm | StrOutputParser()
         
-    def generate(self, context, question):
+    def generate(self, context, question, history=""):
         """
         Generate a response for the user's question.
 
         Args:
             context (str): Conversation context from retriever.
             question (str): User's question
+            history (str, optional): Conversation history from ConversationMemory. Defaults to "".
+
+        Returns:
+            str: The generated response.
+        """
+        logger.info(f"Answer the question: {question}")
+        with tracer.start_as_current_span("llm.generate"), self.limiter:
+            response = self.chain.invoke({"history": history, "context": context, "question": question})
+        return response
+
+    async def agenerate(self, context, question, history=""):
+        """
+        Asynchronously generate a response for the user's question.
+
+        Args:
+            context (str): Conversation context from retriever.
+            question (str): User's question
+            history (str, optional): Conversation history from ConversationMemory. Defaults to "".
 
         Returns:
             str: The generated response.
         """
         logger.info(f"Answer the question: {question}")
-        response = self.chain.invoke({"context": context, "question": question})
-        return response
\ No newline at end of file
+        with tracer.start_as_current_span("llm.generate"):
+            async with self.async_limiter:
+                response = await self.chain.ainvoke({"history": history, "context": context, "question": question})
+        return response
+
+    def stream(self, context, question, history=""):
+        """
+        Stream the response for the user's question token by token.
+
+        Args:
+            context (str): Conversation context from retriever.
+            question (str): User's question
+            history (str, optional): Conversation history from ConversationMemory. Defaults to "".
+
+        Yields:
+            str: Response tokens as the model produces them.
+        """
+        logger.info(f"Stream the answer to the question: {question}")
+        # Spans are not made current here: the context would leak into the caller between yields.
+        span = tracer.start_span("llm.stream")
+        ttft_span = tracer.start_span("llm.ttft", context=trace.set_span_in_context(span))
+        tokens = 0
+        try:
+            with self.limiter:
+                for token in self.chain.stream({"history": history, "context": context, "question": question}):
+                    if tokens == 0:
+                        ttft_span.end()
+                    tokens += 1
+                    yield token
+        finally:
+            if ttft_span.is_recording():
+                ttft_span.end()
+            span.set_attribute("llm.tokens", tokens)
+            span.end()
+
+    async def agenerate_stream(self, context, question, history=""):
+        """
+        Asynchronously stream the response for the user's question token by token.
+
+        Args:
+            context (str): Conversation context from retriever.
+            question (str): User's question
+            history (str, optional): Conversation history from ConversationMemory. Defaults to "".
+
+        Yields:
+            str: Response tokens as the model produces them.
+        """
+        logger.info(f"Stream the answer to the question: {question}")
+        span = tracer.start_span("llm.stream")
+        ttft_span = tracer.start_span("llm.ttft", context=trace.set_span_in_context(span))
+        tokens = 0
+        try:
+            async with self.async_limiter:
+                async for token in self.chain.astream({"history": history, "context": context, "question": question}):
+                    if tokens == 0:
+                        ttft_span.end()
+                    tokens += 1
+                    yield token
+        finally:
+            if ttft_span.is_recording():
+                ttft_span.end()
+            span.set_attribute("llm.tokens", tokens)
+            span.end()
+
+    def summarize(self, summary, turns):
+        """
+        Fold conversation turns into the rolling summary.
+
+        Args:
+            summary (str): Current summary, empty if there is none yet.
+            turns (str): Transcript of the turns to fold in.
+
+        Returns:
+            str: The updated summary.
+        """
+        with tracer.start_as_current_span("llm.summarize"), self.limiter:
+            return self.summary_chain.invoke({"summary": summary or "(none)", "turns": turns})
+
+    def warmup(self):
+        """
+        Load the model into Ollama and pin it with keep_alive so the first request does not pay the load time.
+
+        Returns:
+            bool: True if the model was loaded.
+        """
+        logger.info(f"Preloading Ollama model {self.llm.model} (keep_alive={self.llm.keep_alive})")
+        try:
+            # An empty prompt makes Ollama load the model without generating.
+            self.llm.invoke("")
+        except Exception as e:
+            logger.warning(f"Failed to preload Ollama model {self.llm.model}: {e}")
+            return False
+        return True
+
+    async def awarmup(self):
+        """
+        Asynchronously load the model into Ollama and pin it with keep_alive.
+
+        Returns:
+            bool: True if the model was loaded.
+        """
+        logger.info(f"Preloading Ollama model {self.llm.model} (keep_alive={self.llm.keep_alive})")
+        try:
+            await self.llm.ainvoke("")
+        except Exception as e:
+            logger.warning(f"Failed to preload Ollama model {self.llm.model}: {e}")
+            return False
+        return True
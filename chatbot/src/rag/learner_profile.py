@@ -0,0 +1,84 @@
+from .tagger import CEFR_LEVELS
+
+
+class LearnerProfile:
+    def __init__(self, level=None, topics=None, level_range=1):
+        """
+        What is known about a learner, turned into a metadata filter so retrieval only searches
+        the chunks that suit them.
+
+        Args:
+            level (str, optional): CEFR level, e.g. "B1". Defaults to None (any level).
+            topics (List[str], optional): Topics the learner is practising, e.g. ["travel"]. Defaults to None.
+            level_range (int, optional): Levels above the learner's still searched. Defaults to 1.
+        """
+        if level is not None and level not in CEFR_LEVELS:
+            raise ValueError(f"Unknown CEFR level: {level}")
+        self.level = level
+        self.topics = sorted({topic.strip().lower() for topic in topics or [] if topic.strip()})
+        self.level_range = level_range
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Args:
+            data (dict): "level", "topics" and "level_range" keys, e.g. the rag.profile config.
+
+        Returns:
+            LearnerProfile: The profile.
+        """
+        data = data or {}
+        return cls(data.get("level"), data.get("topics"), data.get("level_range", 1))
+
+    @property
+    def key(self):
+        return self.level, tuple(self.topics), self.level_range
+
+    def is_empty(self):
+        return self.level is None and not self.topics
+
+    def levels(self):
+        """
+        Returns:
+            List[str]: Levels searched: everything up to level_range above the learner's, and untagged chunks.
+        """
+        if self.level is None:
+            return None
+        top = min(CEFR_LEVELS.index(self.level) + self.level_range, len(CEFR_LEVELS) - 1)
+        return CEFR_LEVELS[:top + 1] + ["unknown"]
+
+    def where(self, topic_ids=None):
+        """
+        Build the Chroma metadata filter of the profile.
+
+        Args:
+            topic_ids (List[str], optional): Topic clusters matching the learner's topics.
+
+        Returns:
+            dict: The "where" filter, or None to search everything.
+        """
+        conditions = []
+        if self.level is not None:
+            conditions.append({"level": {"$in": self.levels()}})
+        if topic_ids:
+            conditions.append({"topic": {"$in": list(topic_ids)}})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def matches(self, metadata, topic_ids=None):
+        """
+        Same test as where(), for indexes that filter in Python such as BM25.
+
+        Args:
+            metadata (dict): Chunk metadata.
+            topic_ids (List[str], optional): Topic clusters matching the learner's topics.
+
+        Returns:
+            bool: Whether the chunk is in the learner's partition.
+        """
+        if self.level is not None and metadata.get("level", "unknown") not in self.levels():
+            return False
+        if topic_ids and metadata.get("topic") not in topic_ids:
+            return False
+        return True
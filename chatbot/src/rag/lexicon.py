@@ -0,0 +1,241 @@
+import os
+import re
+import json
+
+from langchain_core.documents import Document
+from src.rag.change_log import ChangeLog
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+HEADWORD_PATTERNS = [
+    re.compile(r"^what (?:does|do) (?P<word>.+?) mean$"),
+    re.compile(r"^what(?: is|'s) the (?:meaning|definition|pronunciation) of (?P<word>.+)$"),
+    re.compile(r"^(?:the )?(?:meaning|definition|pronunciation) of (?P<word>.+)$"),
+    re.compile(r"^(?:define|explain|spell) (?:the word )?(?P<word>.+)$"),
+    re.compile(r"^how (?:do|can|should) (?:you|i|we) (?:pronounce|say|spell) (?P<word>.+)$"),
+    re.compile(r"^how to (?:pronounce|say|spell) (?P<word>.+)$"),
+    # Only a single word: "what is the weather" is a question for retrieval, not a dictionary lookup.
+    re.compile(r"^what(?: is|'s) (?:a |an )?(?P<word>[\w'-]+)$"),
+]
+QUOTED_PATTERN = re.compile(r"[\"“'‘]([^\"”'’]+)[\"”'’]")
+
+
+class LexiconIndex:
+    def __init__(self, persist_path=None):
+        """
+        Exact-lookup index over the headwords of the CSV dictionary rows.
+
+        Changes are saved to an append-only log next to the JSON file, which is only rewritten
+        once the log outgrows the index.
+
+        Args:
+            persist_path (str, optional): JSON file the index is saved to. Defaults to None.
+        """
+        self.persist_path = persist_path
+        self.changes = ChangeLog(f"{persist_path}.log") if persist_path else None
+        # Changes are only appended to a file this index was loaded from or last wrote in full.
+        self.synced = False
+        self.entries = {}
+        self.ids = {}
+
+    @staticmethod
+    def normalize(word):
+        """
+        Normalize a headword or query fragment for lookup.
+
+        Args:
+            word (str): Raw word or phrase.
+
+        Returns:
+            str: Lowercased word with collapsed whitespace and no surrounding punctuation.
+        """
+        return " ".join(str(word).lower().split()).strip(".,!?;:\"'“”‘’")
+
+    @staticmethod
+    def headword_of(document):
+        """
+        Get the dictionary headword of a document, if it is a dictionary row.
+
+        Args:
+            document (Document): Document produced by the CSV processor.
+
+        Returns:
+            str: The headword, or None for non-dictionary documents.
+        """
+        word = document.metadata.get("word")
+        if word:
+            return word
+        if document.page_content.startswith("Word: "):
+            return document.page_content.split("\n", 1)[0][len("Word: "):]
+        return None
+
+    def add(self, doc_id, document):
+        """
+        Index a document under its headword.
+
+        Args:
+            doc_id (str): Id of the document in the vectorstore.
+            document (Document): Dictionary document.
+
+        Returns:
+            bool: True if the document was indexed.
+        """
+        word = self.headword_of(document)
+        if not word:
+            return False
+        key = self.normalize(word)
+        if not key:
+            return False
+
+        entry = {"id": doc_id, "page_content": document.page_content, "metadata": document.metadata}
+        self._add_entry(key, entry)
+        if self.changes is not None:
+            self.changes.record({"id": doc_id, "key": key, "entry": entry})
+        return True
+
+    def add_documents(self, doc_ids, documents):
+        """
+        Index a batch of documents.
+
+        Args:
+            doc_ids (List[str]): Ids of the documents in the vectorstore.
+            documents (List[Document]): Documents in the same order as doc_ids.
+
+        Returns:
+            int: Number of documents indexed.
+        """
+        return sum(self.add(doc_id, doc) for doc_id, doc in zip(doc_ids, documents))
+
+    def remove(self, doc_ids):
+        """
+        Remove documents from the index.
+
+        Args:
+            doc_ids (List[str]): Ids of the documents to remove.
+        """
+        for doc_id in doc_ids:
+            if self._remove_entry(doc_id) and self.changes is not None:
+                self.changes.record({"id": doc_id})
+
+    def _add_entry(self, key, entry):
+        self._remove_entry(entry["id"])
+        self.entries.setdefault(key, []).append(entry)
+        self.ids[entry["id"]] = key
+
+    def _remove_entry(self, doc_id):
+        key = self.ids.pop(doc_id, None)
+        if key is None:
+            return False
+        remaining = [entry for entry in self.entries.get(key, []) if entry["id"] != doc_id]
+        if remaining:
+            self.entries[key] = remaining
+        else:
+            self.entries.pop(key, None)
+        return True
+
+    def lookup(self, word):
+        """
+        Get the dictionary entries for a headword.
+
+        Args:
+            word (str): Headword to look up.
+
+        Returns:
+            List[Document]: Matching entries, empty if the word is unknown.
+        """
+        return [
+            Document(page_content=entry["page_content"], metadata=entry["metadata"], id=entry["id"])
+            for entry in self.entries.get(self.normalize(word), [])
+        ]
+
+    def find_headwords(self, query):
+        """
+        Find the dictionary headwords a query asks about.
+
+        Only whole-query matches, quoted terms and explicit dictionary questions
+        ("what does X mean", "how to pronounce X", ...) count, so ordinary
+        sentences that merely contain a headword still go to vector search.
+
+        Args:
+            query (str): User's question.
+
+        Returns:
+            List[str]: Normalized headwords present in the index.
+        """
+        if not len(self):
+            return []
+
+        candidates = [match.group(1) for match in QUOTED_PATTERN.finditer(query)]
+        text = self.normalize(query)
+        candidates.append(text)
+        for pattern in HEADWORD_PATTERNS:
+            match = pattern.match(text)
+            if match:
+                candidates.append(match.group("word"))
+
+        headwords = []
+        for candidate in candidates:
+            key = self.normalize(candidate)
+            for variant in (key, re.sub(r"^(?:a|an|the|to) ", "", key)):
+                if variant in self and variant not in headwords:
+                    headwords.append(variant)
+        return headwords
+
+    def __contains__(self, word):
+        return self.normalize(word) in self.entries
+
+    def __len__(self):
+        return len(self.ids)
+
+    def save(self):
+        """
+        Persist the changes since the last save next to the vectorstore; a no-op when nothing changed.
+        """
+        if not self.persist_path:
+            return
+        if self.synced and not self.changes.truncated:
+            if not self.changes.pending:
+                return
+            if len(self.changes) <= len(self):
+                self.changes.flush()
+                return
+
+        os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.persist_path)
+        self.changes.clear()
+        self.synced = True
+        logger.info(f"Saved lexicon index with {len(self)} entries to {self.persist_path}")
+
+    def load(self):
+        """
+        Load the index from disk.
+
+        Returns:
+            bool: True if an index file was found and loaded.
+        """
+        if not self.persist_path or not os.path.exists(self.persist_path):
+            return False
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load lexicon index from {self.persist_path}: {e}")
+            self.entries = {}
+            self.ids = {}
+            return False
+
+        self.ids = {entry["id"]: key for key, entries in self.entries.items() for entry in entries}
+        for change in self.changes.read():
+            if "entry" in change:
+                self._add_entry(change["key"], change["entry"])
+            else:
+                self._remove_entry(change["id"])
+        self.synced = True
+        if self.changes.truncated:
+            self.save()
+        logger.info(f"Loaded lexicon index with {len(self)} entries from {self.persist_path}")
+        return True
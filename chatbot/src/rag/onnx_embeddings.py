@@ -0,0 +1,143 @@
+import os
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_huggingface import HuggingFaceEmbeddings
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+
+class OnnxEmbeddings(Embeddings):
+    def __init__(self, model_name, cache_dir="cache/onnx", quantize=True, batch_size=32, max_length=256, threads=None):
+        """
+        Sentence embeddings computed with ONNX Runtime instead of PyTorch.
+
+        The transformer is exported to ONNX on first use, optionally with int8 dynamic quantization,
+        and cached; embeddings are mean-pooled and L2-normalized like the sentence-transformers pipeline.
+
+        Args:
+            model_name (str): Hugging Face model name, e.g. "sentence-transformers/all-MiniLM-L6-v2".
+            cache_dir (str, optional): Directory of the exported models. Defaults to "cache/onnx".
+            quantize (bool, optional): Use the int8 dynamically quantized model. Defaults to True.
+            batch_size (int, optional): Texts per inference call. Defaults to 32.
+            max_length (int, optional): Maximum tokens per text. Defaults to 256.
+            threads (int, optional): Intra-op threads, ONNX Runtime's default when None.
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.model_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        model_path = self._export(quantize)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+        logger.info(f"Loaded ONNX embedding model {model_path}")
+
+    def _export(self, quantize):
+        """
+        Export the model to ONNX (and its int8 variant) unless it is already cached.
+
+        Returns:
+            str: Path of the model to load.
+        """
+        fp32_path = os.path.join(self.model_dir, "model.onnx")
+        int8_path = os.path.join(self.model_dir, "model_int8.onnx")
+        if not os.path.exists(fp32_path):
+            import torch
+            from transformers import AutoModel, AutoTokenizer
+
+            logger.info(f"Exporting {self.model_name} to {fp32_path}")
+            os.makedirs(self.model_dir, exist_ok=True)
+            tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            model = AutoModel.from_pretrained(self.model_name).eval()
+            sample = tokenizer(["export"], return_tensors="pt")
+            input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+            dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+            dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+            tmp_path = f"{fp32_path}.tmp"
+            with torch.no_grad():
+                torch.onnx.export(
+                    model,
+                    tuple(sample[name] for name in input_names),
+                    tmp_path,
+                    input_names=input_names,
+                    output_names=["last_hidden_state"],
+                    dynamic_axes=dynamic_axes,
+                    opset_version=14,
+                )
+            tokenizer.save_pretrained(self.model_dir)
+            os.replace(tmp_path, fp32_path)
+
+        if not quantize:
+            return fp32_path
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            logger.info(f"Quantizing {fp32_path} to int8")
+            tmp_path = f"{int8_path}.tmp"
+            quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        return int8_path
+
+    def _embed(self, texts):
+        inputs = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np"
+        )
+        feed = {name: inputs[name].astype(np.int64) for name in self.input_names}
+        hidden = self.session.run(None, feed)[0]
+        mask = inputs["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Batching texts of similar length keeps padding, and wasted compute, to a minimum.
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for i, vector in zip(batch, self._embed([texts[i] for i in batch])):
+                embeddings[i] = vector.tolist()
+        return embeddings
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+
+def load_embeddings(model_name, embedding_config=None):
+    """
+    Load the sentence embedding model with the configured backend.
+
+    The "onnx" backend falls back to PyTorch when onnxruntime is missing or the export fails.
+
+    Args:
+        model_name (str): Hugging Face model name.
+        embedding_config (dict, optional): The rag.embedding config. Defaults to PyTorch.
+
+    Returns:
+        Embeddings: The embedding model.
+    """
+    embedding_config = embedding_config or {}
+    if embedding_config.get("backend", "torch") == "onnx":
+        try:
+            return OnnxEmbeddings(
+                model_name,
+                cache_dir=embedding_config.get("cache_dir", "cache/onnx"),
+                quantize=embedding_config.get("quantize", True),
+                batch_size=embedding_config.get("batch_size", 32),
+                max_length=embedding_config.get("max_length", 256),
+                threads=embedding_config.get("threads"),
+            )
+        except Exception as e:
+            logger.warning(f"ONNX embeddings unavailable, falling back to PyTorch: {e}")
+    return HuggingFaceEmbeddings(model_name=model_name)
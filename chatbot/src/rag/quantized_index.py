@@ -0,0 +1,582 @@
+import os
+import json
+import math
+import mmap
+import time
+import shutil
+from collections import Counter
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from src.rag.bm25 import tokenize
+from src.rag.lexicon import LexiconIndex
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+SNAPSHOT_VERSION = 2
+SEARCH_BLOCK_ROWS = 65536
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, dtype="int8"):
+    """
+    Quantize unit-length vectors for storage.
+
+    int8 keeps one float32 scale per row (symmetric, max-abs), which keeps the dot-product
+    error well below the gap between neighbouring MiniLM scores.
+
+    Args:
+        vectors (np.ndarray): float32 vectors of shape (n, dim).
+        dtype (str, optional): "int8" or "float16". Defaults to "int8".
+
+    Returns:
+        Tuple[np.ndarray, Optional[np.ndarray]]: Stored vectors and the per-row scales (None for float16).
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+    if dtype != "int8":
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def train_ivf(vectors, nlist, iterations=20, sample_size=50000, seed=0):
+    """
+    Spherical k-means over unit-length vectors, used as the coarse quantizer of the IVF index.
+
+    Args:
+        vectors (np.ndarray): float32 unit vectors of shape (n, dim).
+        nlist (int): Number of inverted lists.
+        iterations (int, optional): Lloyd iterations. Defaults to 20.
+        sample_size (int, optional): Rows used for training. Defaults to 50000.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Centroids of shape (nlist, dim) and the list of every row.
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    sample = vectors
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for list_id in range(nlist):
+            members = sample[assignment == list_id]
+            if len(members):
+                centroids[list_id] = members.sum(axis=0)
+        centroids = _normalize(centroids)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+def write_strings(path, name, strings):
+    """
+    Write strings as one UTF-8 blob ({name}.bin) with their byte offsets ({name}_offsets.npy)
+    and the permutation sorting them ({name}_order.npy), to be opened with StringTable.
+
+    Args:
+        path (str): Snapshot directory.
+        name (str): Name of the table.
+        strings (List[str]): Strings, in row order.
+    """
+    encoded = [string.encode("utf-8") for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(value) for value in encoded])
+    with open(os.path.join(path, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(path, f"{name}_offsets.npy"), offsets)
+    order = sorted(range(len(encoded)), key=encoded.__getitem__)
+    np.save(os.path.join(path, f"{name}_order.npy"), np.array(order, dtype=np.int64))
+
+
+def write_postings(path, name, lists):
+    """
+    Write one list of (row, value) pairs per key as flat arrays: {name}_rows.npy, {name}_values.npy
+    and {name}_offsets.npy with the start of every key's list.
+
+    Args:
+        path (str): Snapshot directory.
+        name (str): Name of the postings.
+        lists (List[List[Tuple[int, int]]]): Pairs of every key, in key order.
+    """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(pairs) for pairs in lists])
+    pairs = [pair for key_pairs in lists for pair in key_pairs]
+    np.save(os.path.join(path, f"{name}_offsets.npy"), offsets)
+    np.save(os.path.join(path, f"{name}_rows.npy"), np.array([row for row, _ in pairs], dtype=np.int32))
+    np.save(os.path.join(path, f"{name}_values.npy"), np.array([value for _, value in pairs], dtype=np.int32))
+
+
+def export_text_indexes(path, ids, texts, metadatas):
+    """
+    Write the ids, the BM25 postings and the lexicon of the snapshot rows, so workers serve
+    keyword and dictionary lookups from the page cache instead of rebuilding them in RAM.
+
+    Args:
+        path (str): Snapshot directory.
+        ids (List[str]): Ids, in row order.
+        texts (List[str]): Texts, in row order.
+        metadatas (List[dict]): Metadata, in row order.
+
+    Returns:
+        dict: Manifest entries of the BM25 index and the lexicon.
+    """
+    write_strings(path, "ids", ids)
+
+    postings = {}
+    doc_lengths = np.zeros(len(texts), dtype=np.int32)
+    for row, text in enumerate(texts):
+        term_counts = Counter(tokenize(text))
+        for term, count in term_counts.items():
+            postings.setdefault(term, []).append((row, count))
+        doc_lengths[row] = sum(term_counts.values())
+    terms = list(postings)
+    write_strings(path, "bm25_terms", terms)
+    write_postings(path, "bm25_postings", [postings[term] for term in terms])
+    np.save(os.path.join(path, "bm25_doc_lengths.npy"), doc_lengths)
+
+    lexicon = {}
+    for row, (text, metadata) in enumerate(zip(texts, metadatas)):
+        word = LexiconIndex.headword_of(Document(page_content=text, metadata=metadata))
+        key = LexiconIndex.normalize(word) if word else ""
+        if key:
+            lexicon.setdefault(key, []).append((row, 0))
+    keys = list(lexicon)
+    write_strings(path, "lexicon_keys", keys)
+    write_postings(path, "lexicon", [lexicon[key] for key in keys])
+
+    return {
+        "bm25": {"terms": len(terms), "total_length": int(doc_lengths.sum())},
+        "lexicon": {"headwords": len(keys), "entries": sum(len(rows) for rows in lexicon.values())},
+    }
+
+
+def export_snapshot(vectorstore, path, dtype="int8", nlist=0, embedding_model=None, batch_size=5000):
+    """
+    Export a Chroma collection to a read-only snapshot directory.
+
+    The directory holds the quantized vectors (vectors.npy, plus scales.npy for int8), the ids,
+    texts and metadata as one JSON line per row (records.jsonl with byte offsets in offsets.npy),
+    the BM25 postings and lexicon of the rows (see export_text_indexes) and, with IVF, the centroids
+    and the row range of every list. Rows are stored grouped by list.
+    The previous snapshot is only replaced once the new one is fully written.
+
+    Args:
+        vectorstore (Chroma): Collection to export.
+        path (str): Snapshot directory.
+        dtype (str, optional): "int8" or "float16". Defaults to "int8".
+        nlist (int, optional): Number of IVF lists, 0 for brute-force search. Defaults to 0.
+        embedding_model (str, optional): Name of the embedding model, recorded in the manifest.
+        batch_size (int, optional): Rows fetched from Chroma per request. Defaults to 5000.
+
+    Returns:
+        dict: The snapshot manifest.
+    """
+    ids, texts, metadatas, embeddings = [], [], [], []
+    offset = 0
+    while True:
+        batch = vectorstore.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not batch["ids"]:
+            break
+        ids.extend(batch["ids"])
+        texts.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        offset += len(batch["ids"])
+    if not ids:
+        raise ValueError("Vectorstore contains no data to export.")
+
+    vectors = _normalize(np.concatenate(embeddings))
+    order = np.arange(len(ids))
+    centroids = None
+    list_offsets = None
+    if nlist > 0:
+        centroids, assignment = train_ivf(vectors, nlist)
+        order = np.argsort(assignment, kind="stable")
+        list_offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1)).astype(np.int64)
+        vectors = vectors[order]
+
+    tmp_path = f"{path.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    quantized, scales = quantize(vectors, dtype)
+    np.save(os.path.join(tmp_path, "vectors.npy"), quantized)
+    if scales is not None:
+        np.save(os.path.join(tmp_path, "scales.npy"), scales)
+    if centroids is not None:
+        np.save(os.path.join(tmp_path, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp_path, "list_offsets.npy"), list_offsets)
+
+    offsets = [0]
+    with open(os.path.join(tmp_path, "records.jsonl"), "wb") as f:
+        for row in order:
+            line = json.dumps(
+                {"id": ids[row], "text": texts[row], "metadata": metadatas[row] or {}}, ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(os.path.join(tmp_path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+    text_indexes = export_text_indexes(
+        tmp_path,
+        [ids[row] for row in order],
+        [texts[row] for row in order],
+        [metadatas[row] or {} for row in order]
+    )
+
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "count": len(ids),
+        "dim": int(vectors.shape[1]),
+        "dtype": dtype,
+        "nlist": 0 if centroids is None else len(centroids),
+        "embedding_model": embedding_model,
+        **text_indexes,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_path = f"{path.rstrip(os.sep)}.old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    logger.info(
+        f"Exported {manifest['count']} vectors ({dtype}, nlist={manifest['nlist']}) to {path}: "
+        f"{quantized.nbytes / 2**20:.1f} MiB of vectors"
+    )
+    return manifest
+
+
+class StringTable:
+    def __init__(self, path, name):
+        """
+        Memory-mapped strings written by write_strings, looked up by row or by binary search.
+
+        Args:
+            path (str): Snapshot directory.
+            name (str): Name of the table.
+        """
+        self.offsets = np.load(os.path.join(path, f"{name}_offsets.npy"), mmap_mode="r")
+        self.order = np.load(os.path.join(path, f"{name}_order.npy"), mmap_mode="r")
+        self.file = open(os.path.join(path, f"{name}.bin"), "rb")
+        # An empty file cannot be mapped.
+        self.blob = b""
+        if os.fstat(self.file.fileno()).st_size:
+            self.blob = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row):
+        return self._bytes(row).decode("utf-8")
+
+    def _bytes(self, row):
+        return self.blob[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def find(self, string):
+        """
+        Args:
+            string (str): String to look up.
+
+        Returns:
+            int: Row of the string, or -1 if it is not in the table.
+        """
+        key = string.encode("utf-8")
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self._bytes(int(self.order[middle])) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self._bytes(int(self.order[low])) == key:
+            return int(self.order[low])
+        return -1
+
+    def close(self):
+        if isinstance(self.blob, mmap.mmap):
+            self.blob.close()
+        self.file.close()
+
+
+class QuantizedIndex:
+    def __init__(self, path, nprobe=8):
+        """
+        Read-only, memory-mapped view of a snapshot written by export_snapshot.
+
+        Nothing is read eagerly: the vectors and records are mapped from disk, so every process
+        opening the same snapshot shares one copy in the page cache.
+
+        Args:
+            path (str): Snapshot directory.
+            nprobe (int, optional): IVF lists searched per query. Defaults to 8.
+        """
+        self.path = path
+        self.nprobe = nprobe
+        with open(os.path.join(path, "manifest.json")) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {path}: {self.manifest.get('version')}")
+
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self.scales = None
+        if self.manifest["dtype"] == "int8":
+            self.scales = np.load(os.path.join(path, "scales.npy"), mmap_mode="r")
+        self.centroids = None
+        self.list_offsets = None
+        if self.manifest["nlist"]:
+            self.centroids = np.load(os.path.join(path, "centroids.npy"))
+            self.list_offsets = np.load(os.path.join(path, "list_offsets.npy"))
+        self.offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+
+        self.records_file = open(os.path.join(path, "records.jsonl"), "rb")
+        self.records = mmap.mmap(self.records_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.ids = StringTable(path, "ids")
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def _score(self, start, end, query):
+        scores = np.empty(end - start, dtype=np.float32)
+        for block_start in range(start, end, SEARCH_BLOCK_ROWS):
+            block_end = min(block_start + SEARCH_BLOCK_ROWS, end)
+            block_scores = self.vectors[block_start:block_end].astype(np.float32) @ query
+            if self.scales is not None:
+                block_scores *= self.scales[block_start:block_end]
+            scores[block_start - start:block_end - start] = block_scores
+        return scores
+
+    def search(self, query_vector, k=4):
+        """
+        Find the rows most similar to a query vector by cosine similarity.
+
+        Args:
+            query_vector (List[float]): Query embedding.
+            k (int, optional): Number of results. Defaults to 4.
+
+        Returns:
+            List[Tuple[int, float]]: Row numbers and cosine similarities, best first.
+        """
+        query = _normalize(query_vector)
+        if self.centroids is None:
+            ranges = [(0, len(self))]
+        else:
+            lists = np.argsort(-(self.centroids @ query))[:self.nprobe]
+            ranges = [(int(self.list_offsets[i]), int(self.list_offsets[i + 1])) for i in lists]
+            ranges = [(start, end) for start, end in ranges if end > start]
+        if not ranges:
+            return []
+
+        rows = np.concatenate([np.arange(start, end) for start, end in ranges])
+        scores = np.concatenate([self._score(start, end, query) for start, end in ranges])
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    def record(self, row):
+        """
+        Args:
+            row (int): Row number.
+
+        Returns:
+            dict: id, text and metadata of the row.
+        """
+        return json.loads(self.records[int(self.offsets[row]):int(self.offsets[row + 1])])
+
+    def document(self, row):
+        """
+        Args:
+            row (int): Row number.
+
+        Returns:
+            Document: The row as a document with its id set.
+        """
+        record = self.record(row)
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+    def close(self):
+        self.records.close()
+        self.records_file.close()
+        self.ids.close()
+
+
+class SnapshotBM25Index:
+    def __init__(self, index, k1=1.5, b=0.75):
+        """
+        Read-only BM25 index over the postings exported with a snapshot, scored like BM25Index.
+
+        Args:
+            index (QuantizedIndex): Opened snapshot.
+            k1 (float, optional): Term frequency saturation. Defaults to 1.5.
+            b (float, optional): Document length normalization. Defaults to 0.75.
+        """
+        self.index = index
+        self.k1 = k1
+        self.b = b
+        self.terms = StringTable(index.path, "bm25_terms")
+        self.offsets = np.load(os.path.join(index.path, "bm25_postings_offsets.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(index.path, "bm25_postings_rows.npy"), mmap_mode="r")
+        self.term_frequencies = np.load(os.path.join(index.path, "bm25_postings_values.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(index.path, "bm25_doc_lengths.npy"), mmap_mode="r")
+        self.avg_length = index.manifest["bm25"]["total_length"] / max(len(index), 1)
+
+    def search(self, query, k=10):
+        """
+        Score the documents matching any query term.
+
+        Args:
+            query (str): Query text.
+            k (int, optional): Number of results. Defaults to 10.
+
+        Returns:
+            List[Tuple[str, float]]: (doc_id, score) pairs, best first.
+        """
+        num_docs = len(self.index)
+        matched_rows, matched_scores = [], []
+        for term in set(tokenize(query)):
+            term_row = self.terms.find(term)
+            if term_row < 0:
+                continue
+            start, end = int(self.offsets[term_row]), int(self.offsets[term_row + 1])
+            rows = np.asarray(self.rows[start:end])
+            tf = self.term_frequencies[start:end].astype(np.float64)
+            idf = math.log(1 + (num_docs - (end - start) + 0.5) / (end - start + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[rows] / self.avg_length)
+            matched_rows.append(rows)
+            matched_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not matched_rows:
+            return []
+
+        rows, inverse = np.unique(np.concatenate(matched_rows), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(matched_scores))
+        top = np.argsort(-scores, kind="stable")[:k]
+        return [(self.index.ids[int(rows[i])], float(scores[i])) for i in top]
+
+    def get_document(self, doc_id):
+        """
+        Args:
+            doc_id (str): Id of the document.
+
+        Returns:
+            Document: The document with its id set.
+        """
+        row = self.index.ids.find(doc_id)
+        if row < 0:
+            raise KeyError(doc_id)
+        return self.index.document(row)
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        self.terms.close()
+
+
+class SnapshotLexicon(LexiconIndex):
+    def __init__(self, index):
+        """
+        Read-only lexicon over the headwords exported with a snapshot.
+
+        Args:
+            index (QuantizedIndex): Opened snapshot.
+        """
+        super().__init__()
+        self.index = index
+        self.keys = StringTable(index.path, "lexicon_keys")
+        self.offsets = np.load(os.path.join(index.path, "lexicon_offsets.npy"), mmap_mode="r")
+        self.rows = np.load(os.path.join(index.path, "lexicon_rows.npy"), mmap_mode="r")
+
+    def __contains__(self, word):
+        return self.keys.find(self.normalize(word)) >= 0
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, word):
+        key_row = self.keys.find(self.normalize(word))
+        if key_row < 0:
+            return []
+        start, end = int(self.offsets[key_row]), int(self.offsets[key_row + 1])
+        return [self.index.document(int(row)) for row in self.rows[start:end]]
+
+    def close(self):
+        self.keys.close()
+
+
+class QuantizedVectorStore(VectorStore):
+    def __init__(self, index, embedding):
+        """
+        LangChain vectorstore over a snapshot, so it can replace Chroma behind the retrievers.
+
+        Args:
+            index (QuantizedIndex): Opened snapshot.
+            embedding (Embeddings): Model embedding the queries; must be the one the snapshot was built with.
+        """
+        self.index = index
+        self.embedding = embedding
+
+    @classmethod
+    def load(cls, path, embedding, nprobe=8):
+        """
+        Open a snapshot directory.
+
+        Args:
+            path (str): Snapshot directory.
+            embedding (Embeddings): Query embedding model.
+            nprobe (int, optional): IVF lists searched per query. Defaults to 8.
+
+        Returns:
+            QuantizedVectorStore: The opened vectorstore.
+        """
+        start = time.perf_counter()
+        index = QuantizedIndex(path, nprobe=nprobe)
+        logger.info(
+            f"Opened snapshot {path} with {len(index)} vectors ({index.manifest['dtype']}) "
+            f"in {(time.perf_counter() - start) * 1000:.1f} ms"
+        )
+        return cls(index, embedding)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [(self.index.document(row), score) for row, score in self.index.search(embedding, k)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def _select_relevance_score_fn(self):
+        return lambda score: score
+
+    def add_texts(self, texts, metadatas=None, **kwargs: Any) -> List[str]:
+        logger.error("Vectorstore snapshot is read-only.")
+        raise ValueError("Vectorstore snapshot is read-only: update the Chroma collection and export again.")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs: Any):
+        logger.error("Vectorstore snapshots are not built from texts.")
+        raise ValueError("Build the Chroma collection first, then create a snapshot with export_snapshot.")
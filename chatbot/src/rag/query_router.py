@@ -0,0 +1,53 @@
+import re
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+CHITCHAT_WORDS = {
+    "hi", "hello", "hey", "hiya", "yo", "thanks", "thank", "you", "thx", "ok", "okay", "cool",
+    "great", "nice", "good", "fine", "morning", "afternoon", "evening", "night", "bye", "goodbye",
+    "see", "later", "yes", "yeah", "yep", "no", "nope", "sure", "alright", "right", "wow", "awesome",
+    "how", "are", "i'm", "am", "so", "very", "much", "too", "and", "me", "well", "lol", "haha", "got", "it",
+}
+COMPLEX_MARKERS = [
+    "difference between", "compare", "explain", "why", "example", "examples", "how do i", "how can i",
+    "when should", "what's the rule", "grammar", "role-play", "role play", "practice", "conversation about",
+]
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+class QueryRouter:
+    def __init__(self, config):
+        """
+        Route each question to no retrieval, simple retrieval or complex retrieval.
+
+        Args:
+            config (dict): Application config, the "rag.router" section is used.
+        """
+        router_config = config["rag"].get("router", {})
+        self.chitchat_max_words = router_config.get("chitchat_max_words", 5)
+        self.complex_min_words = router_config.get("complex_min_words", 12)
+
+    def route(self, question):
+        """
+        Decide how much retrieval a question needs.
+
+        Args:
+            question (str): User's question.
+
+        Returns:
+            str: "none" for small talk, otherwise the retriever query type ("simple" or "complex").
+        """
+        text = question.lower().strip()
+        words = TOKEN_PATTERN.findall(text)
+
+        if not words:
+            return "none"
+        if len(words) <= self.chitchat_max_words and all(word in CHITCHAT_WORDS for word in words):
+            return "none"
+        if len(words) >= self.complex_min_words or text.count("?") > 1:
+            return "complex"
+        if any(marker in text for marker in COMPLEX_MARKERS):
+            return "complex"
+        return "simple"
@@ -1,35 +1,328 @@
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from src.rag.retriever import Retriever
 from src.rag.generator import Generator
+from src.rag.query_router import QueryRouter
+from src.rag.context_packer import ContextPacker
+from src.rag.sentence_aggregator import iter_sentences, aiter_sentences
+from src.rag.conversation_memory import ConversationMemory
+from src.rag.speculative_retriever import SpeculativeRetriever
+from src.rag.learner_profile import LearnerProfile
 from src.utils.log_config import setup_logging
+from src.utils.tracing import get_tracer
+from src.utils.startup import startup_profile
 
 logger = setup_logging()
+tracer = get_tracer(__name__)
 
 class RAGPipeline:
-    def __init__(self):
-        self.retriever = Retriever().get_retriever()
-        self.generator = Generator()
-        self.chain = (
-            RunnableParallel({"context": self.retriever, "question": RunnablePassthrough()})
-            | (lambda x: {
-                "context": "\n".join([doc.page_content for doc in x["context"]]),
-                "question": x["question"]
-            })
-            | self.generator.chain
+    def __init__(self, generator=None):
+        """
+        Retrieval-augmented generation over the knowledge base.
+
+        Args:
+            generator (Generator, optional): Shared generator, so several pipelines can reuse
+                                             one pooled Ollama client. Defaults to a new Generator.
+        """
+        self.retriever = Retriever()
+        self.router = QueryRouter(self.retriever.config)
+        self.context_packer = ContextPacker(self.retriever.config)
+        self.generator = generator or Generator()
+        if generator is None and self.retriever.config["ollama"].get("preload", False):
+            # Ollama loads the model on its side; nothing here has to wait for it.
+            threading.Thread(target=self._warmup, name="ollama-warmup", daemon=True).start()
+
+        memory_config = self.retriever.config["rag"].get("memory", {})
+        self.memory_max_tokens = memory_config.get("max_tokens", 512)
+        self.memory_keep_turns = memory_config.get("keep_turns", 4)
+        self.sessions = {}
+        self.sessions_lock = threading.Lock()
+        self.default_profile = LearnerProfile.from_dict(self.retriever.config["rag"].get("profile"))
+        self.profiles = {}
+
+        speculative_config = self.retriever.config["rag"].get("speculative", {})
+        self.speculative_enabled = speculative_config.get("enabled", False)
+        self.speculative_min_words = speculative_config.get("min_words", 3)
+        self.speculative_threshold = speculative_config.get("similarity_threshold", 0.85)
+        self.speculative_executor = ThreadPoolExecutor(
+            max_workers=speculative_config.get("max_workers", 2),
+            thread_name_prefix="speculative-retrieval"
         )
-        
-    def rag_invoke(self, question):
+        self.speculators = {}
+
+    def _warmup(self):
+        with startup_profile.measure("rag.ollama_warmup"):
+            self.generator.warmup()
+
+    def get_memory(self, session_id):
+        """
+        Get the conversation memory of a session, creating it on first use.
+
+        Args:
+            session_id (str): Id of the conversation.
+
+        Returns:
+            ConversationMemory: Memory of the session.
+        """
+        with self.sessions_lock:
+            if session_id not in self.sessions:
+                self.sessions[session_id] = ConversationMemory(
+                    summarizer=self.generator.summarize,
+                    count_tokens=lambda text: len(self.context_packer.encode(text)),
+                    max_tokens=self.memory_max_tokens,
+                    keep_turns=self.memory_keep_turns
+                )
+            return self.sessions[session_id]
+
+    def end_session(self, session_id):
+        """
+        Drop the conversation memory of a session.
+
+        Args:
+            session_id (str): Id of the conversation.
+        """
+        with self.sessions_lock:
+            self.sessions.pop(session_id, None)
+            self.speculators.pop(session_id, None)
+            self.profiles.pop(session_id, None)
+
+    def set_profile(self, session_id, profile):
+        """
+        Narrow the retrieval of a session to the learner's level and topics.
+
+        Args:
+            session_id (str): Id of the conversation.
+            profile (LearnerProfile): The learner's profile.
+        """
+        with self.sessions_lock:
+            self.profiles[session_id] = profile
+
+    def get_profile(self, session_id):
+        """
+        Args:
+            session_id (str): Id of the conversation.
+
+        Returns:
+            LearnerProfile: The session's profile, or the rag.profile default.
+        """
+        with self.sessions_lock:
+            return self.profiles.get(session_id, self.default_profile)
+
+    def speculate(self, partial_question, session_id=None):
+        """
+        Start retrieval for a partial transcript while the learner is still speaking.
+
+        Args:
+            partial_question (str): Transcript so far.
+            session_id (str, optional): Conversation the transcript belongs to. Defaults to None.
+        """
+        if not self.speculative_enabled:
+            return
+        with self.sessions_lock:
+            if session_id not in self.speculators:
+                self.speculators[session_id] = SpeculativeRetriever(
+                    retrieve=lambda question: self.retrieve(question, self.get_profile(session_id)),
+                    executor=self.speculative_executor,
+                    min_words=self.speculative_min_words,
+                    similarity_threshold=self.speculative_threshold
+                )
+            speculator = self.speculators[session_id]
+        speculator.update(partial_question)
+
+    def _speculative_result(self, question, session_id):
+        with self.sessions_lock:
+            speculator = self.speculators.get(session_id)
+        return speculator.resolve(question) if speculator is not None else None
+
+    def _documents(self, question, session_id):
+        with tracer.start_as_current_span("rag.documents") as span:
+            future = self._speculative_result(question, session_id)
+            span.set_attribute("rag.speculative_hit", future is not None)
+            if future is not None:
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+            return self.retrieve(question, self.get_profile(session_id))
+
+    async def _adocuments(self, question, session_id):
+        with tracer.start_as_current_span("rag.documents") as span:
+            future = self._speculative_result(question, session_id)
+            span.set_attribute("rag.speculative_hit", future is not None)
+            if future is not None:
+                try:
+                    return await asyncio.wrap_future(future)
+                except Exception as e:
+                    logger.warning(f"Speculative retrieval failed, retrieving again: {e}")
+            return await self.aretrieve(question, self.get_profile(session_id))
+
+    def _pack(self, documents):
+        with tracer.start_as_current_span("rag.pack_context") as span:
+            span.set_attribute("rag.documents", len(documents))
+            return self.context_packer.pack(documents)
+
+    def _history(self, session_id):
+        return self.get_memory(session_id).render() if session_id is not None else ""
+
+    def _remember(self, session_id, question, response):
+        if session_id is not None:
+            self.get_memory(session_id).add_turn(question, response)
+
+    def retrieve(self, question, profile=None):
+        """
+        Route the question and retrieve its context documents.
+
+        Args:
+            question (str): User's question
+            profile (LearnerProfile, optional): Learner whose partition is searched. Defaults to rag.profile.
+
+        Returns:
+            List[Document]: Retrieved documents, empty when the question needs no retrieval.
+        """
+        route = self.router.route(question)
+        logger.info(f"Route '{route}' for question: {question}")
+
+        if route == "none":
+            return []
+        profile = profile or self.default_profile
+        with tracer.start_as_current_span("rag.retrieve") as span:
+            span.set_attribute("rag.route", route)
+            span.set_attribute("rag.partitioned", not profile.is_empty())
+            documents = self.retriever.get_retriever(route, profile).invoke(question)
+            if not documents and not profile.is_empty():
+                logger.info("Nothing found in the learner's partition, searching every chunk")
+                documents = self.retriever.get_retriever(route).invoke(question)
+            return documents
+
+    async def aretrieve(self, question, profile=None):
+        """
+        Asynchronously route the question and retrieve its context documents.
+
+        Args:
+            question (str): User's question
+            profile (LearnerProfile, optional): Learner whose partition is searched. Defaults to rag.profile.
+
+        Returns:
+            List[Document]: Retrieved documents, empty when the question needs no retrieval.
+        """
+        route = self.router.route(question)
+        logger.info(f"Route '{route}' for question: {question}")
+
+        if route == "none":
+            return []
+        profile = profile or self.default_profile
+        with tracer.start_as_current_span("rag.retrieve") as span:
+            span.set_attribute("rag.route", route)
+            span.set_attribute("rag.partitioned", not profile.is_empty())
+            documents = await self.retriever.get_retriever(route, profile).ainvoke(question)
+            if not documents and not profile.is_empty():
+                logger.info("Nothing found in the learner's partition, searching every chunk")
+                documents = await self.retriever.get_retriever(route).ainvoke(question)
+            return documents
+
+    def rag_invoke(self, question, session_id=None):
         """
         Process the question and generate a response using the RAG pipeline.
 
         Args:
             question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
+
+        Returns:
+            str: The generated response
+        """
+        logger.info(f"Process the question: {question}")
+
+        context = self._pack(self._documents(question, session_id))
+        response = self.generator.generate(context, question, self._history(session_id))
+        self._remember(session_id, question, response)
+
+        return response
+
+    async def ainvoke(self, question, session_id=None):
+        """
+        Asynchronously process the question and generate a response.
+
+        Args:
+            question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
 
         Returns:
             str: The generated response
         """
         logger.info(f"Process the question: {question}")
-    
-        response = self.chain.invoke(question)
-        
-        return response
\ No newline at end of file
+
+        context = self._pack(await self._adocuments(question, session_id))
+        response = await self.generator.agenerate(context, question, self._history(session_id))
+        self._remember(session_id, question, response)
+
+        return response
+
+    def rag_stream(self, question, session_id=None):
+        """
+        Process the question and stream the response tokens as the LLM produces them.
+
+        Args:
+            question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
+
+        Yields:
+            str: Response tokens
+        """
+        logger.info(f"Stream the question: {question}")
+
+        context = self._pack(self._documents(question, session_id))
+        tokens = []
+        for token in self.generator.stream(context, question, self._history(session_id)):
+            tokens.append(token)
+            yield token
+        self._remember(session_id, question, "".join(tokens))
+
+    async def astream(self, question, session_id=None):
+        """
+        Asynchronously process the question and stream the response tokens.
+
+        Args:
+            question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
+
+        Yields:
+            str: Response tokens
+        """
+        logger.info(f"Stream the question: {question}")
+
+        context = self._pack(await self._adocuments(question, session_id))
+        tokens = []
+        async for token in self.generator.agenerate_stream(context, question, self._history(session_id)):
+            tokens.append(token)
+            yield token
+        self._remember(session_id, question, "".join(tokens))
+
+    def rag_stream_sentences(self, question, session_id=None):
+        """
+        Process the question and stream the response as complete sentences.
+
+        Args:
+            question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
+
+        Yields:
+            str: Response sentences as soon as they close
+        """
+        yield from iter_sentences(self.rag_stream(question, session_id))
+
+    async def astream_sentences(self, question, session_id=None):
+        """
+        Asynchronously process the question and stream the response as complete sentences.
+
+        Args:
+            question (str): User's question
+            session_id (str, optional): Conversation to read and extend the history of. Defaults to None (stateless).
+
+        Yields:
+            str: Response sentences as soon as they close
+        """
+        async for sentence in aiter_sentences(self.astream(question, session_id)):
+            yield sentence
@@ -1,24 +1,175 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
 from src.utils.log_config import setup_logging
 from src.utils.load_config import load_config
 from src.rag.vector_store import VectorStoreManager
+from src.rag.bm25 import reciprocal_rank_fusion
+from src.utils.tracing import get_tracer
 
 logger = setup_logging()
+tracer = get_tracer(__name__)
+
+
+class LexiconRetriever(BaseRetriever):
+    """
+    Retriever that answers dictionary questions from the exact-lookup lexicon
+    and falls back to another retriever for everything else.
+    """
+    lexicon: Any
+    fallback: BaseRetriever
+    k: int = 3
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with tracer.start_as_current_span("retrieval.lexicon") as span:
+            headwords = self.lexicon.find_headwords(query)
+            span.set_attribute("retrieval.lexicon_hit", bool(headwords))
+        if headwords:
+            documents = [doc for word in headwords for doc in self.lexicon.lookup(word)][:self.k]
+            logger.info(f"Lexicon hit for {headwords}: {len(documents)} entries")
+            return documents
+        with tracer.start_as_current_span("retrieval.search"):
+            return self.fallback.invoke(query, config={"callbacks": run_manager.get_child()})
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever that fuses dense vector search with BM25 keyword search by reciprocal rank fusion.
+    """
+    dense: BaseRetriever
+    bm25_index: Any
+    k: int = 3
+    fetch_k: int = 10
+    rrf_k: int = 60
+    metadata_filter: Optional[Callable[[dict], bool]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        with tracer.start_as_current_span("retrieval.dense"):
+            dense_docs = self.dense.invoke(query, config={"callbacks": run_manager.get_child()})
+        with tracer.start_as_current_span("retrieval.bm25"):
+            if self.metadata_filter is None:
+                keyword_hits = self.bm25_index.search(query, k=self.fetch_k)
+            else:
+                # BM25 has no metadata index, so over-fetch and keep the hits in the partition.
+                keyword_hits = [
+                    hit for hit in self.bm25_index.search(query, k=self.fetch_k * 4)
+                    if self.metadata_filter(self.bm25_index.get_document(hit[0]).metadata)
+                ][:self.fetch_k]
+
+        documents = {}
+        dense_ranking = []
+        for doc in dense_docs:
+            key = doc.id or doc.page_content
+            documents.setdefault(key, doc)
+            dense_ranking.append(key)
+        keyword_ranking = []
+        for doc_id, _ in keyword_hits:
+            if doc_id not in documents:
+                documents[doc_id] = self.bm25_index.get_document(doc_id)
+            keyword_ranking.append(doc_id)
+
+        fused = reciprocal_rank_fusion([dense_ranking, keyword_ranking], k=self.rrf_k)
+        return [documents[key] for key in fused[:self.k]]
+
 
 class Retriever:
     def __init__(self):
         """
         Initialize the Retriever for RAG system with supports for multiple retrievers.
+
+        Retrievers are cached per query type and metadata filter, not per learner, so the cache only
+        holds as many entries as there are distinct level and topic-cluster partitions, and is an LRU
+        bounded by rag.profile.max_retrievers on top of that.
         """
         self.config = load_config("config.yaml")
         self.vector_store_manager = VectorStoreManager()
-        self.retrievers = {}
-        
-    def initialize_retriever(self, query_type="simple"):
+        profile_config = self.config["rag"].get("profile", {})
+        self.max_retrievers = profile_config.get("max_retrievers", 32)
+        self.max_topics = profile_config.get("max_cached_topics", 256)
+        self.retrievers = OrderedDict()
+        self.topic_cache = OrderedDict()
+        self.topic_cache_model = None
+        self.lock = threading.Lock()
+
+    def topic_ids(self, topics):
+        """
+        Map the topics a learner named to the topic clusters found at ingestion.
+
+        Args:
+            topics (List[str]): Topics, e.g. ["travel"].
+
+        Returns:
+            List[str]: Ids of the matching clusters, empty when the chunks were not tagged.
+        """
+        topic_model = self.vector_store_manager.topic_model
+        if not topics or topic_model is None:
+            return []
+        topic_ids = []
+        for topic in topics:
+            for topic_id in self._match_topic(topic_model, topic):
+                if topic_id not in topic_ids:
+                    topic_ids.append(topic_id)
+        return sorted(topic_ids)
+
+    def _match_topic(self, topic_model, topic):
+        """
+        Clusters of one topic, from a bounded LRU so repeated topics are not embedded again.
+        """
+        with self.lock:
+            if self.topic_cache_model is not topic_model:
+                # Re-tagging refits the clusters, which makes every cached match stale.
+                self.topic_cache.clear()
+                self.topic_cache_model = topic_model
+            if topic in self.topic_cache:
+                self.topic_cache.move_to_end(topic)
+                return self.topic_cache[topic]
+
+        profile_config = self.config["rag"].get("profile", {})
+        matches = topic_model.match(
+            self.vector_store_manager.embedding_model.embed_query(topic),
+            top_n=profile_config.get("topic_matches", 2),
+            min_similarity=profile_config.get("min_topic_similarity", 0.2)
+        )
+        with self.lock:
+            if self.topic_cache_model is topic_model:
+                self.topic_cache[topic] = matches
+                while len(self.topic_cache) > self.max_topics:
+                    self.topic_cache.popitem(last=False)
+        return matches
+
+    def resolve_filter(self, profile):
+        """
+        Turn a learner profile into the metadata filter retrieval uses.
+
+        Args:
+            profile (LearnerProfile, optional): Learner whose level and topics narrow the search.
+
+        Returns:
+            Tuple[dict, List[str]]: The "where" filter (None to search everything) and the topic ids in it.
+        """
+        if profile is None or profile.is_empty():
+            return None, []
+        topic_ids = self.topic_ids(profile.topics)
+        where = profile.where(topic_ids)
+        if where is not None and self.vector_store_manager.backend == "snapshot":
+            logger.warning("The snapshot backend has no metadata filters, searching every chunk")
+            return None, []
+        return where, topic_ids
+
+    def initialize_retriever(self, query_type="simple", profile=None, where=None, topic_ids=None):
         """
         Initialize a retriever for the specified query type.
 
         Args:
             query_type (str): Type of query ("simple" or "complex"). Defaults to "simple".
+            profile (LearnerProfile, optional): Learner whose level and topics narrow the search. Defaults to None.
+            where (dict, optional): Filter resolved from the profile by resolve_filter. Defaults to None.
+            topic_ids (List[str], optional): Topic ids in the filter. Defaults to None.
 
         Returns:
             Retriever: The initialized retriever object
@@ -27,23 +178,55 @@ class Retriever:
         
         vectorstore = self.vector_store_manager.get_vectorstore()
         k = self.config["rag"]["retriever_k"][query_type]
-        retriever = vectorstore.as_retriever(
-            search_kwargs = {"k": k}
+        search_kwargs = {}
+        metadata_filter = None
+        if where is not None:
+            search_kwargs["filter"] = where
+            # Profiles resolving to the same filter share this retriever, and match the same chunks.
+            metadata_filter = lambda metadata: profile.matches(metadata, topic_ids)
+            logger.info(f"Retriever for level={profile.level} topics={profile.topics} uses filter {where}")
+
+        hybrid_config = self.config["rag"].get("hybrid", {})
+        if hybrid_config.get("enabled", False):
+            fetch_k = max(k, hybrid_config.get("fetch_k", 10))
+            base_retriever = HybridRetriever(
+                dense=vectorstore.as_retriever(search_kwargs={"k": fetch_k, **search_kwargs}),
+                bm25_index=self.vector_store_manager.get_bm25_index(),
+                k=k,
+                fetch_k=fetch_k,
+                rrf_k=hybrid_config.get("rrf_k", 60),
+                metadata_filter=metadata_filter
+            )
+        else:
+            base_retriever = vectorstore.as_retriever(search_kwargs={"k": k, **search_kwargs})
+            
+        return LexiconRetriever(
+            lexicon=self.vector_store_manager.lexicon,
+            fallback=base_retriever,
+            k=k
         )
-        self.retrievers[query_type] = retriever
-        return retriever
     
-    def get_retriever(self, query_type="simple"):
+    def get_retriever(self, query_type="simple", profile=None):
         """
-        Get the retriever for the specified query type, initializing it if not already done.
+        Get the retriever for the specified query type and learner, initializing it if not already done.
 
         Args:
             query_type (str): Type of query ("simple" or "complex"). Defaults to "simple".
+            profile (LearnerProfile, optional): Learner whose level and topics narrow the search. Defaults to None.
 
         Returns:
             Retriever: The retriever object
         """
-        if query_type not in self.retrievers:
-            self.initialize_retriever(query_type)
-        return self.retrievers[query_type]
-        
\ No newline at end of file
+        where, topic_ids = self.resolve_filter(profile)
+        key = (query_type, json.dumps(where, sort_keys=True) if where is not None else None)
+        with self.lock:
+            if key in self.retrievers:
+                self.retrievers.move_to_end(key)
+                return self.retrievers[key]
+
+        retriever = self.initialize_retriever(query_type, profile, where, topic_ids)
+        with self.lock:
+            self.retrievers[key] = retriever
+            while len(self.retrievers) > self.max_retrievers:
+                self.retrievers.popitem(last=False)
+        return retriever
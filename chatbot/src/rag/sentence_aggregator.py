@@ -0,0 +1,89 @@
+import re
+
+SENTENCE_END = re.compile(r"[.!?…]+[\"')\]”’]*(?=\s)|\n+")
+ABBREVIATIONS = {"mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.", "e.g.", "i.e.", "a.m.", "p.m."}
+
+
+class SentenceAggregator:
+    def __init__(self):
+        """
+        Aggregate streamed tokens into complete sentences.
+
+        A sentence is emitted as soon as its closing punctuation is followed by
+        whitespace, so a consumer can start on it while later text is still
+        being generated.
+        """
+        self.buffer = ""
+
+    def feed(self, token):
+        """
+        Add a token and collect the sentences it completes.
+
+        Args:
+            token (str): Next chunk of streamed text.
+
+        Returns:
+            List[str]: Sentences completed by this token, in order.
+        """
+        self.buffer += token
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self.buffer):
+            candidate = self.buffer[start: match.end()]
+            last_word = candidate.split()[-1].lower() if candidate.split() else ""
+            if last_word in ABBREVIATIONS:
+                continue
+            sentence = candidate.strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self.buffer = self.buffer[start:].lstrip() if start else self.buffer
+        return sentences
+
+    def flush(self):
+        """
+        Return the remaining text once the stream has ended.
+
+        Returns:
+            str: The trailing sentence, or None if nothing is left.
+        """
+        sentence = self.buffer.strip()
+        self.buffer = ""
+        return sentence or None
+
+
+def iter_sentences(tokens):
+    """
+    Turn a token iterator into a sentence iterator.
+
+    Args:
+        tokens (Iterable[str]): Streamed tokens.
+
+    Yields:
+        str: Complete sentences as soon as they close.
+    """
+    aggregator = SentenceAggregator()
+    for token in tokens:
+        yield from aggregator.feed(token)
+    sentence = aggregator.flush()
+    if sentence:
+        yield sentence
+
+
+async def aiter_sentences(tokens):
+    """
+    Turn an async token iterator into an async sentence iterator.
+
+    Args:
+        tokens (AsyncIterable[str]): Streamed tokens.
+
+    Yields:
+        str: Complete sentences as soon as they close.
+    """
+    aggregator = SentenceAggregator()
+    async for token in tokens:
+        for sentence in aggregator.feed(token):
+            yield sentence
+    sentence = aggregator.flush()
+    if sentence:
+        yield sentence
@@ -0,0 +1,96 @@
+import re
+import threading
+from difflib import SequenceMatcher
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+
+def query_similarity(left, right):
+    """
+    Word-level similarity of two queries.
+
+    Args:
+        left (str): First query.
+        right (str): Second query.
+
+    Returns:
+        float: Similarity between 0 and 1.
+    """
+    left_words = TOKEN_PATTERN.findall(left.lower())
+    right_words = TOKEN_PATTERN.findall(right.lower())
+    if not left_words and not right_words:
+        return 1.0
+    return SequenceMatcher(None, left_words, right_words).ratio()
+
+
+class SpeculativeRetriever:
+    def __init__(self, retrieve, executor, min_words=3, similarity_threshold=0.85):
+        """
+        Run retrieval on partial transcripts while the learner is still speaking.
+
+        Every new partial transcript supersedes the previous speculative query.
+        When the final transcript is close enough to the latest speculative
+        query, its already computed documents are reused.
+
+        Args:
+            retrieve (Callable[[str], List[Document]]): Retrieval function.
+            executor (concurrent.futures.Executor): Executor running speculative retrievals.
+            min_words (int, optional): Shortest partial transcript worth retrieving for. Defaults to 3.
+            similarity_threshold (float, optional): Minimum similarity for reuse. Defaults to 0.85.
+        """
+        self.retrieve = retrieve
+        self.executor = executor
+        self.min_words = min_words
+        self.similarity_threshold = similarity_threshold
+        self.query = None
+        self.future = None
+        self.lock = threading.Lock()
+
+    def update(self, partial_text):
+        """
+        Start retrieval for a new partial transcript, cancelling the previous one.
+
+        Args:
+            partial_text (str): Transcript so far.
+        """
+        partial_text = partial_text.strip()
+        if len(TOKEN_PATTERN.findall(partial_text)) < self.min_words:
+            return
+
+        with self.lock:
+            if self.query is not None and query_similarity(self.query, partial_text) == 1.0:
+                return
+            if self.future is not None:
+                self.future.cancel()
+            self.query = partial_text
+            self.future = self.executor.submit(self.retrieve, partial_text)
+        logger.info(f"Speculative retrieval for: {partial_text}")
+
+    def resolve(self, final_text):
+        """
+        Take the speculative result for the final transcript, if it can be reused.
+
+        Args:
+            final_text (str): Final transcript.
+
+        Returns:
+            concurrent.futures.Future: Future of the reusable documents, or None if retrieval must run again.
+        """
+        with self.lock:
+            query, future = self.query, self.future
+            self.query = None
+            self.future = None
+
+        if future is None:
+            return None
+        similarity = query_similarity(query, final_text)
+        if similarity < self.similarity_threshold or future.cancelled():
+            future.cancel()
+            logger.info(f"Speculative retrieval discarded (similarity {similarity:.2f})")
+            return None
+        logger.info(f"Speculative retrieval reused (similarity {similarity:.2f})")
+        return future
@@ -0,0 +1,260 @@
+import os
+import re
+import json
+from collections import Counter
+
+import numpy as np
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+CEFR_LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+# Upper Flesch-Kincaid grade of each CEFR level.
+LEVEL_GRADES = [2.0, 4.0, 6.0, 8.0, 11.0]
+WORD_PATTERN = re.compile(r"[a-zA-Z']+")
+SENTENCE_PATTERN = re.compile(r"[.!?]+")
+VOWEL_GROUP_PATTERN = re.compile(r"[aeiouy]+")
+VIETNAMESE_PATTERN = re.compile(
+    r"[ăâđêôơưàảãáạằẳẵắặầẩẫấậèẻẽéẹềểễếệìỉĩíịòỏõóọồổỗốộờởỡớợùủũúụừửữứựỳỷỹýỵ]", re.IGNORECASE
+)
+STOPWORDS = {
+    "a", "about", "after", "again", "all", "also", "am", "an", "and", "any", "are", "as", "at", "be", "because",
+    "been", "before", "but", "by", "can", "could", "did", "do", "does", "don't", "for", "from", "get", "go",
+    "going", "good", "had", "has", "have", "he", "her", "here", "him", "his", "how", "i", "i'm", "if", "in", "is",
+    "it", "it's", "its", "just", "know", "like", "me", "my", "no", "not", "now", "of", "oh", "ok", "on", "one",
+    "or", "our", "out", "really", "she", "so", "some", "sure", "that", "that's", "the", "their", "them", "then",
+    "there", "they", "think", "this", "to", "too", "up", "very", "want", "was", "we", "well", "were", "what",
+    "what's", "when", "where", "which", "who", "why", "will", "with", "would", "yeah", "yes", "you", "you're",
+    "your", "word", "definition", "pronunciation", "lesson",
+}
+
+
+def count_syllables(word):
+    groups = VOWEL_GROUP_PATTERN.findall(word.lower())
+    count = len(groups) - (1 if word.lower().endswith("e") and len(groups) > 1 else 0)
+    return max(1, count)
+
+
+def estimate_level(text):
+    """
+    Estimate a CEFR-style level from the Flesch-Kincaid grade of the text.
+
+    It is a readability proxy, not a calibrated CEFR classifier, but it separates short everyday
+    dialogues from long, dense passages well enough to narrow the search.
+
+    Args:
+        text (str): Text of a page or dictionary row.
+
+    Returns:
+        str: "A1" to "C2", or "unknown" for text without words.
+    """
+    words = WORD_PATTERN.findall(text)
+    if not words:
+        return "unknown"
+    sentences = max(1, len([s for s in SENTENCE_PATTERN.split(text) if WORD_PATTERN.search(s)]))
+    syllables = sum(count_syllables(word) for word in words)
+    grade = 0.39 * len(words) / sentences + 11.8 * syllables / len(words) - 15.59
+    for level, upper in zip(CEFR_LEVELS, LEVEL_GRADES):
+        if grade <= upper:
+            return level
+    return CEFR_LEVELS[-1]
+
+
+def detect_language(text):
+    """
+    Tell English from Vietnamese, the two languages learners use.
+
+    Args:
+        text (str): Text to classify.
+
+    Returns:
+        str: "en", "vi" or "unknown".
+    """
+    letters = [char for char in text if char.isalpha()]
+    if not letters:
+        return "unknown"
+    if len(VIETNAMESE_PATTERN.findall(text)) / len(letters) > 0.05:
+        return "vi"
+    words = [word.lower() for word in WORD_PATTERN.findall(text)]
+    if words and sum(char.isascii() for char in letters) / len(letters) > 0.95:
+        return "en"
+    return "unknown"
+
+
+class TopicModel:
+    def __init__(self, centroids=None, labels=None):
+        """
+        Topic clusters found by spherical k-means over chunk embeddings.
+
+        Args:
+            centroids (np.ndarray, optional): Unit-length cluster centroids of shape (n_topics, dim).
+            labels (List[str], optional): Human-readable label of every cluster.
+        """
+        self.centroids = centroids
+        self.labels = labels or []
+
+    def __len__(self):
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @staticmethod
+    def topic_id(index):
+        return f"topic_{index}"
+
+    def fit(self, vectors, texts, n_topics=12, iterations=25, seed=0):
+        """
+        Cluster the vectors and label every cluster with its most distinctive words.
+
+        Args:
+            vectors (np.ndarray): Embeddings of shape (n, dim).
+            texts (List[str]): Texts of the vectors, for the labels.
+            n_topics (int, optional): Number of clusters. Defaults to 12.
+            iterations (int, optional): k-means iterations. Defaults to 25.
+            seed (int, optional): Random seed. Defaults to 0.
+
+        Returns:
+            np.ndarray: Cluster of every vector.
+        """
+        vectors = self._normalize(vectors)
+        n_topics = min(n_topics, len(vectors))
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(len(vectors), n_topics, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(vectors @ centroids.T, axis=1)
+            for topic in range(n_topics):
+                members = vectors[assignment == topic]
+                if len(members):
+                    centroids[topic] = members.sum(axis=0)
+            centroids = self._normalize(centroids)
+        self.centroids = centroids
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        self.labels = self._label(assignment, texts, n_topics)
+        return assignment
+
+    def assign(self, vectors):
+        """
+        Args:
+            vectors (np.ndarray): Embeddings of shape (n, dim).
+
+        Returns:
+            np.ndarray: Nearest cluster of every vector.
+        """
+        return np.argmax(self._normalize(vectors) @ self.centroids.T, axis=1)
+
+    def match(self, vector, top_n=2, min_similarity=0.2):
+        """
+        Find the clusters closest to a topic the learner named, e.g. the embedding of "travel".
+
+        Args:
+            vector (List[float]): Embedding of the topic.
+            top_n (int, optional): Maximum clusters to return. Defaults to 2.
+            min_similarity (float, optional): Minimum cosine similarity to a centroid. Defaults to 0.2.
+
+        Returns:
+            List[str]: Topic ids, most similar first.
+        """
+        similarities = self.centroids @ self._normalize(np.asarray(vector, dtype=np.float32))
+        ranked = np.argsort(-similarities)[:top_n]
+        return [self.topic_id(index) for index in ranked if similarities[index] >= min_similarity]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"labels": self.labels, "centroids": self.centroids.tolist()}, f)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(self)} topics to {path}")
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns:
+            TopicModel: The saved model, or None if there is none.
+        """
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(np.array(data["centroids"], dtype=np.float32), data["labels"])
+
+    @staticmethod
+    def _normalize(vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+    @staticmethod
+    def _label(assignment, texts, n_topics, n_words=3):
+        counts = [Counter() for _ in range(n_topics)]
+        for topic, text in zip(assignment, texts):
+            counts[topic].update(
+                word for word in (w.lower() for w in WORD_PATTERN.findall(text))
+                if word not in STOPWORDS and len(word) > 2
+            )
+        total = sum(counts, Counter())
+        labels = []
+        for counter in counts:
+            # Words frequent in this cluster relative to the whole corpus.
+            ranked = sorted(counter, key=lambda word: -counter[word] ** 2 / total[word])
+            labels.append("-".join(ranked[:n_words]) or "misc")
+        return labels
+
+
+class ChunkTagger:
+    def __init__(self, topic_model_path, n_topics=12):
+        """
+        Tag chunks with level, language and topic metadata at ingestion.
+
+        Chunks are tagged by unit (a PDF page or a dictionary row): a 90-character chunk says little about
+        its level or topic on its own, but the page it comes from does.
+
+        Args:
+            topic_model_path (str): JSON file the topic clusters are saved to.
+            n_topics (int, optional): Number of topic clusters. Defaults to 12.
+        """
+        self.topic_model_path = topic_model_path
+        self.n_topics = n_topics
+        self.topic_model = TopicModel.load(topic_model_path)
+
+    @staticmethod
+    def unit_of(metadata):
+        return metadata.get("file_name"), metadata.get("page", metadata.get("chunk_id"))
+
+    def tag(self, documents, embeddings, refit=False):
+        """
+        Set "level", "language", "topic" and "topic_label" metadata on the documents.
+
+        The topic clusters are fitted on the first batch (or when refit is set) and reused afterwards,
+        so topic ids stay stable as files are added.
+
+        Args:
+            documents (List[Document]): Chunks to tag.
+            embeddings (List[List[float]]): Their embeddings.
+            refit (bool, optional): Re-cluster instead of assigning to the saved clusters. Defaults to False.
+        """
+        if not documents:
+            return
+        units = {}
+        for index, doc in enumerate(documents):
+            units.setdefault(self.unit_of(doc.metadata), []).append(index)
+        unit_texts = [" ".join(documents[i].page_content for i in indexes) for indexes in units.values()]
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        unit_vectors = np.stack([vectors[indexes].mean(axis=0) for indexes in units.values()])
+
+        if refit or self.topic_model is None:
+            self.topic_model = TopicModel()
+            topics = self.topic_model.fit(unit_vectors, unit_texts, self.n_topics)
+            self.topic_model.save(self.topic_model_path)
+        else:
+            topics = self.topic_model.assign(unit_vectors)
+
+        levels = Counter()
+        for indexes, text, topic in zip(units.values(), unit_texts, topics):
+            metadata = {
+                "level": estimate_level(text),
+                "language": detect_language(text),
+                "topic": TopicModel.topic_id(int(topic)),
+                "topic_label": self.topic_model.labels[int(topic)],
+            }
+            levels[metadata["level"]] += len(indexes)
+            for i in indexes:
+                documents[i].metadata.update(metadata)
+        logger.info(f"Tagged {len(documents)} chunks in {len(units)} units, levels: {dict(levels)}")
@@ -1,4 +1,5 @@
 import os
+import uuid
 import pandas as pd
 import chardet
 import csv
@@ -8,25 +9,98 @@ from langchain_community.document_loaders import PyPDFLoader
 from langchain_community.document_loaders.csv_loader import CSVLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
+from .lexicon import LexiconIndex
+from .bm25 import BM25Index
+from .embeddings import TracedEmbeddings
+from .onnx_embeddings import load_embeddings
+from .embedding_batcher import BatchedEmbeddings
+from .dedupe import NearDuplicateFilter
+from .tagger import ChunkTagger
+from .quantized_index import QuantizedVectorStore, SnapshotBM25Index, SnapshotLexicon, export_snapshot
 from ..utils.log_config import setup_logging
 from ..utils.load_config import load_config
+from ..utils.startup import startup_profile
 
 logger = setup_logging()
 
+WRITE_BATCH_SIZE = 5000
+
 class VectorStoreManager:
-    def __init__(self, config_path="config.yaml"):
+    def __init__(self, config_path="config.yaml", backend=None):
+        """
+        Args:
+            config_path (str, optional): Path to the config file. Defaults to "config.yaml".
+            backend (str, optional): "chroma" or "snapshot", overriding rag.backend. Defaults to None.
+        """
         self.config = load_config(config_path)
-        self.embedding_model = HuggingFaceEmbeddings(model_name=self.config["rag"]["embedding_model"])
+        self.backend = backend or self.config["rag"].get("backend", "chroma")
+        self.snapshot_config = self.config["rag"].get("snapshot", {})
+        embedding_config = self.config["rag"].get("embedding", {})
+        with startup_profile.measure("rag.embeddings"):
+            embeddings = load_embeddings(self.config["rag"]["embedding_model"], embedding_config)
+        self.embedding_batcher = None
+        batching_config = embedding_config.get("batching", {})
+        if batching_config.get("enabled", False):
+            self.embedding_batcher = embeddings = BatchedEmbeddings(
+                embeddings,
+                max_batch_size=batching_config.get("max_batch_size", 32),
+                max_wait_ms=batching_config.get("max_wait_ms", 5),
+                stats_interval_s=batching_config.get("stats_interval_s", 30)
+            )
+        self.embedding_model = TracedEmbeddings(embeddings)
         self.persist_directory = self.config["data"]["vector_store"]
         self.chunk_size = self.config["rag"]["chunk_size"]
         self.chunk_overlap = self.config["rag"]["chunk_overlap"]
-        self.vectorstore = Chroma(
-                    collection_name=self.config["rag"]["chroma_collection"],
-                    embedding_function=self.embedding_model,
-                    persist_directory=self.persist_directory
+        if self.backend == "snapshot":
+            with startup_profile.measure("rag.snapshot"):
+                self.vectorstore = QuantizedVectorStore.load(
+                    self.snapshot_config["path"],
+                    self.embedding_model,
+                    nprobe=self.snapshot_config.get("nprobe", 8)
                 )
+        else:
+            with startup_profile.measure("rag.chroma"):
+                self.vectorstore = Chroma(
+                            collection_name=self.config["rag"]["chroma_collection"],
+                            embedding_function=self.embedding_model,
+                            persist_directory=self.persist_directory
+                        )
+        with startup_profile.measure("rag.lexicon"):
+            if self.backend == "snapshot":
+                # Exported with the snapshot and memory-mapped, so workers share it in the page cache.
+                self.lexicon = SnapshotLexicon(self.vectorstore.index)
+            else:
+                self.lexicon = LexiconIndex(os.path.join(self.persist_directory, "lexicon.json"))
+                if not self.lexicon.load():
+                    self.rebuild_lexicon()
+        self.bm25_index = None
+        dedupe_config = self.config["rag"].get("dedupe", {})
+        self.dedupe_filter = None
+        if dedupe_config.get("enabled", False):
+            self.dedupe_filter = NearDuplicateFilter(
+                threshold=dedupe_config.get("threshold", 0.85),
+                num_perm=dedupe_config.get("num_perm", 64),
+                bands=dedupe_config.get("bands", 16),
+                shingle_size=dedupe_config.get("shingle_size", 5),
+                persist_path=os.path.join(self.persist_directory, "dedupe.json")
+            )
+            # The snapshot backend is read-only, so nothing is ever checked against the index.
+            if self.backend == "chroma":
+                with startup_profile.measure("rag.dedupe"):
+                    if not self.dedupe_filter.load():
+                        self.rebuild_dedupe_index()
+        tagging_config = self.config["rag"].get("tagging", {})
+        self.tagger = None
+        if tagging_config.get("enabled", False):
+            self.tagger = ChunkTagger(
+                os.path.join(self.persist_directory, "topics.json"),
+                n_topics=tagging_config.get("n_topics", 12)
+            )
+
+    @property
+    def topic_model(self):
+        return self.tagger.topic_model if self.tagger is not None else None
         
     def initialize_vectorstore(self, pdf_paths=None, csv_paths=None):
         """Initialize vectorstore from PDF and CSV files.
@@ -39,6 +113,7 @@ class VectorStoreManager:
             Chroma: Vectorstore is initialized
         """
         logger.info("Initialize Vectorstore...")
+        self._check_writable()
         
         self.vectorstore = Chroma(
             collection_name=self.config["rag"]["chroma_collection"],
@@ -55,11 +130,7 @@ class VectorStoreManager:
                 documents.extend(self._process_csv(csv_path))
                 
         if documents:
-            batch_size = 5000
-            for i in range(0, len(documents), batch_size):
-                batch = documents[i: i + batch_size]
-                logger.info(f"Adding batch {i // batch_size + 1}: {len(batch)} documents")
-                self.vectorstore.add_documents(batch)
+            self._add_documents(documents, refit_topics=True)
             
         return self.vectorstore
     
@@ -75,48 +146,28 @@ class VectorStoreManager:
             Chroma: Updated vectorstore.
         """
         logger.info(f"Add new documents: {file_path} ({file_type})")
+        self._check_writable()
         
         if not self.vectorstore:
             logger.error(f"Vectorstore is not initialized.")
             raise ValueError("Vectorstore is not initialized.")
             
-        if file_type not in ["csv", "pdf"]:
-            logger.error(f"File type is not support: {file_type}")
-            raise ValueError(f"File type is not support: {file_type}")
-        
-        existing_docs = self.vectorstore.get()
-        existing_sources = {doc.get('file_name') for doc in existing_docs['metadatas'] if doc.get('file_name')}
         file_name = os.path.basename(file_path)
-        
-        if file_name in existing_sources:
+        if self.get_ids_by_source(file_name):
             logger.info(f"Skipping {file_type} file {file_name}: already processed")
             return self.vectorstore
         
-        if file_type == "csv":
-            documents = self._process_csv(file_path)
-        elif file_type == "pdf":
-            documents = self._process_pdf(file_path)
+        documents = self._process_file(file_path, file_type)
             
         if documents:
             if file_type == "csv":
-                existing_words = {
-                    doc.get("word")
-                    for doc in existing_docs['metadatas']
-                    if doc.get("source") == "csv" and doc.get("word")
-                }
-                documents = [
-                    doc for doc in documents
-                    if doc.metadata.get("source") != "csv" or doc.metadata.get("word") not in existing_words
-                ]
+                existing_words = self._existing_words([doc.metadata["word"] for doc in documents])
+                documents = [doc for doc in documents if doc.metadata.get("word") not in existing_words]
                 logger.info(f"After filtering duplicates, {len(documents)} documents remain from {file_path}")
                 
             if documents:
-                batch_size = 5000
-                for i in range(0, len(documents), batch_size):
-                    batch = documents[i: i + batch_size]
-                    logger.info(f"Adding batch {i // batch_size + 1}: {len(batch)} documents")
-                    self.vectorstore.add_documents(batch)
-                logger.info(f"Added {len(documents)} new documents from {file_path}")
+                ids = self._add_documents(documents)
+                logger.info(f"Added {len(ids)} new documents from {file_path}")
             else:
                 logger.info(f"No new documents to add from {file_path} after filtering")
         else:
@@ -125,32 +176,405 @@ class VectorStoreManager:
         return self.vectorstore
     
     def update_documents(self, chunk_id=None, file_name=None, new_content=None, new_metadata=None):
+        """
+        Replace one chunk, or merge new metadata into every chunk of a source file.
+
+        Args:
+            chunk_id (str, optional): Id of the chunk to replace with new_content; new_metadata is merged into its metadata.
+            file_name (str, optional): Source file whose chunks get new_metadata, when chunk_id is None.
+            new_content (str, optional): New text of the chunk. Defaults to its current text.
+            new_metadata (dict, optional): Metadata to merge.
+
+        Returns:
+            Chroma: Updated vectorstore.
+        """
         logger.info(f"Updating documents: chunk_id={chunk_id}, file_name={file_name}")
+        self._check_writable()
         
         if not self.vectorstore:
             logger.error("Vectorstore is not initialized.")
             raise ValueError("Vectorstore is not initialized.")
-        
-        updated_document = Document(
-            page_content=new_content,
-            metadata = new_metadata,
-        )
-        
-        self.vectorstore.update_documents(document_id=chunk_id, document=updated_document)
+
+        if chunk_id is not None:
+            existing_docs = self.vectorstore.get(ids=[chunk_id], include=["documents", "metadatas"])
+            if not existing_docs["ids"]:
+                logger.error(f"Chunk {chunk_id} not found.")
+                raise ValueError(f"Chunk {chunk_id} not found.")
+            # Merge like update_metadata_by_source, so file_name, word, chunk_id and tags survive.
+            metadata = {**(existing_docs["metadatas"][0] or {}), **(new_metadata or {})}
+            content = new_content if new_content is not None else existing_docs["documents"][0]
+            self.upsert_many([Document(page_content=content, metadata=metadata)], ids=[chunk_id])
+        elif file_name is not None:
+            self.update_metadata_by_source(file_name, new_metadata or {})
+        else:
+            raise ValueError("Either chunk_id or file_name is required.")
         
         return self.vectorstore
     
     def delete_documents(self, chunk_id=None, file_name=None):
+        """
+        Delete chunks by id, or every chunk of a source file.
+
+        Args:
+            chunk_id (str | List[str], optional): Id or ids of the chunks to delete.
+            file_name (str, optional): Source file whose chunks are deleted.
+
+        Returns:
+            Chroma: Updated vectorstore.
+        """
         logger.info(f"Deleting documents: chunk_id={chunk_id}, file_name={file_name}")
+        self._check_writable()
         
         if not self.vectorstore:
             logger.error("Vectorstore is not initialized.")
             raise ValueError("Vectorstore is not initialized.")
-        
-        self.vectorstore.delete(ids=chunk_id)
-        
+
+        if chunk_id is not None:
+            self.delete_many(chunk_id if isinstance(chunk_id, list) else [chunk_id])
+        if file_name is not None:
+            self.delete_by_source(file_name)
+
         return self.vectorstore
-        
+
+    def get_ids_by_source(self, file_name):
+        """
+        Get the ids of every chunk of a source file with a metadata filter, without scanning the collection.
+
+        Args:
+            file_name (str): Base name of the source file.
+
+        Returns:
+            List[str]: Ids of the file's chunks.
+        """
+        return self.vectorstore.get(where={"file_name": file_name}, include=[])["ids"]
+
+    def delete_many(self, ids):
+        """
+        Delete chunks in batches and keep the lexicon and BM25 indexes in sync.
+
+        Args:
+            ids (List[str]): Ids of the chunks to delete.
+
+        Returns:
+            int: Number of ids deleted.
+        """
+        self._check_writable()
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            self.vectorstore.delete(ids=ids[i: i + WRITE_BATCH_SIZE])
+        self._sync_indexes(removed_ids=ids)
+        logger.info(f"Deleted {len(ids)} chunks")
+        return len(ids)
+
+    def delete_by_source(self, file_name):
+        """
+        Delete every chunk of a source file.
+
+        Args:
+            file_name (str): Base name of the source file.
+
+        Returns:
+            int: Number of chunks deleted.
+        """
+        self._check_writable()
+        ids = self.get_ids_by_source(file_name)
+        logger.info(f"Deleting {len(ids)} chunks of {file_name}")
+        return self.delete_many(ids)
+
+    def upsert_many(self, documents, ids=None):
+        """
+        Insert or replace chunks in batches, keyed by id, and keep the lexicon and BM25 indexes in sync.
+        With tagging enabled the chunks are tagged like newly added ones, so profile filters still match them.
+
+        Args:
+            documents (List[Document]): Chunks to write.
+            ids (List[str], optional): Their ids. Defaults to each document's id.
+
+        Returns:
+            List[str]: Ids of the written chunks.
+        """
+        self._check_writable()
+        ids = ids or [doc.id for doc in documents]
+        if len(ids) != len(documents) or any(doc_id is None for doc_id in ids):
+            raise ValueError("upsert_many needs one id per document.")
+        self._write_documents(documents, ids)
+        self._sync_indexes(removed_ids=ids, added_ids=ids, added_documents=documents)
+        logger.info(f"Upserted {len(ids)} chunks")
+        return ids
+
+    def update_metadata_by_source(self, file_name, metadata):
+        """
+        Merge metadata into every chunk of a source file. The texts are unchanged, so nothing is re-embedded.
+
+        Args:
+            file_name (str): Base name of the source file.
+            metadata (dict): Metadata to merge.
+
+        Returns:
+            int: Number of chunks updated.
+        """
+        self._check_writable()
+        existing_docs = self.vectorstore.get(where={"file_name": file_name}, include=["documents", "metadatas"])
+        ids = existing_docs["ids"]
+        metadatas = [{**(old or {}), **metadata} for old in existing_docs["metadatas"]]
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            self.vectorstore._collection.update(
+                ids=ids[i: i + WRITE_BATCH_SIZE], metadatas=metadatas[i: i + WRITE_BATCH_SIZE]
+            )
+        documents = [
+            Document(page_content=content, metadata=metadata)
+            for content, metadata in zip(existing_docs["documents"], metadatas)
+        ]
+        self._sync_indexes(removed_ids=ids, added_ids=ids, added_documents=documents)
+        logger.info(f"Updated metadata of {len(ids)} chunks of {file_name}")
+        return len(ids)
+
+    def reingest_file(self, file_path, file_type=""):
+        """
+        Replace every chunk of a source file with freshly processed ones.
+
+        The new chunks are written before the old ones are deleted, so the file never disappears from search.
+
+        Args:
+            file_path (str): Path to the file to process.
+            file_type (str, optional): Type of file ("csv" or "pdf"). Defaults to "".
+
+        Returns:
+            dict: Numbers of chunks added and removed.
+        """
+        logger.info(f"Re-ingesting {file_path} ({file_type})")
+        self._check_writable()
+        old_ids = self.get_ids_by_source(os.path.basename(file_path))
+        documents = self._process_file(file_path, file_type)
+        # The old chunks are about to be deleted, so new chunks are not dropped as their duplicates.
+        new_ids = self._add_documents(documents, exclude_ids=old_ids) if documents else []
+        self.delete_many(old_ids)
+        logger.info(f"Re-ingested {file_path}: {len(new_ids)} chunks added, {len(old_ids)} removed")
+        return {"added": len(new_ids), "removed": len(old_ids)}
+
+    def retag(self, refit=True):
+        """
+        Tag the chunks already stored, e.g. a collection built before tagging existed.
+        Stored embeddings are reused, so nothing is re-embedded.
+
+        Args:
+            refit (bool, optional): Re-cluster the topics over the whole collection. Defaults to True.
+
+        Returns:
+            int: Number of chunks tagged.
+        """
+        self._check_writable()
+        if self.tagger is None:
+            raise ValueError("Tagging is disabled in rag.tagging.")
+        ids, documents, embeddings = [], [], []
+        offset = 0
+        while True:
+            batch = self.vectorstore.get(
+                include=["embeddings", "documents", "metadatas"], limit=WRITE_BATCH_SIZE, offset=offset
+            )
+            if not batch["ids"]:
+                break
+            ids.extend(batch["ids"])
+            documents.extend(
+                Document(page_content=content, metadata=metadata or {})
+                for content, metadata in zip(batch["documents"], batch["metadatas"])
+            )
+            embeddings.extend(batch["embeddings"])
+            offset += len(batch["ids"])
+
+        self.tagger.tag(documents, embeddings, refit=refit)
+        for i in range(0, len(ids), WRITE_BATCH_SIZE):
+            self.vectorstore._collection.update(
+                ids=ids[i: i + WRITE_BATCH_SIZE],
+                metadatas=[doc.metadata for doc in documents[i: i + WRITE_BATCH_SIZE]]
+            )
+        self._sync_indexes(removed_ids=ids, added_ids=ids, added_documents=documents)
+        return len(ids)
+
+    def _write_documents(self, documents, ids, refit_topics=False):
+        """
+        Write documents under the given ids in batches, inserting or replacing them, and tag them
+        first when tagging is enabled.
+
+        Args:
+            documents (List[Document]): Documents to write.
+            ids (List[str]): Their ids.
+            refit_topics (bool, optional): Re-cluster topics on these documents. Defaults to False.
+        """
+        if self.tagger is not None and documents:
+            # Topics are clustered on the chunk embeddings, so embed once and write them as they are.
+            embeddings = self.embedding_model.embed_documents([doc.page_content for doc in documents])
+            self.tagger.tag(documents, embeddings, refit=refit_topics)
+            for i in range(0, len(documents), WRITE_BATCH_SIZE):
+                logger.info(f"Writing batch {i // WRITE_BATCH_SIZE + 1}: {len(documents[i: i + WRITE_BATCH_SIZE])} documents")
+                self.vectorstore._collection.upsert(
+                    ids=ids[i: i + WRITE_BATCH_SIZE],
+                    embeddings=embeddings[i: i + WRITE_BATCH_SIZE],
+                    documents=[doc.page_content for doc in documents[i: i + WRITE_BATCH_SIZE]],
+                    metadatas=[doc.metadata for doc in documents[i: i + WRITE_BATCH_SIZE]]
+                )
+        else:
+            for i in range(0, len(documents), WRITE_BATCH_SIZE):
+                batch = documents[i: i + WRITE_BATCH_SIZE]
+                logger.info(f"Writing batch {i // WRITE_BATCH_SIZE + 1}: {len(batch)} documents")
+                self.vectorstore.add_documents(batch, ids=ids[i: i + WRITE_BATCH_SIZE])
+
+    def _process_file(self, file_path, file_type):
+        if file_type == "csv":
+            return self._process_csv(file_path)
+        if file_type == "pdf":
+            return self._process_pdf(file_path)
+        logger.error(f"File type is not support: {file_type}")
+        raise ValueError(f"File type is not support: {file_type}")
+
+    def _existing_words(self, words):
+        """
+        Find which dictionary headwords are already stored, with batched metadata filters.
+
+        Args:
+            words (List[str]): Headwords to check.
+
+        Returns:
+            Set[str]: The headwords already in the vectorstore.
+        """
+        words = list(set(words))
+        existing = set()
+        for i in range(0, len(words), WRITE_BATCH_SIZE):
+            batch = self.vectorstore.get(where={"word": {"$in": words[i: i + WRITE_BATCH_SIZE]}}, include=["metadatas"])
+            existing.update(metadata.get("word") for metadata in batch["metadatas"])
+        return existing
+
+    def _sync_indexes(self, removed_ids=(), added_ids=(), added_documents=()):
+        """
+        Apply a vectorstore write to the lexicon, dedupe and BM25 indexes, saving each once.
+        """
+        self.lexicon.remove(removed_ids)
+        self.lexicon.add_documents(added_ids, added_documents)
+        self.lexicon.save()
+        if self.dedupe_filter is not None:
+            self.dedupe_filter.remove(removed_ids)
+            self.dedupe_filter.add(added_ids, added_documents)
+            self.dedupe_filter.save()
+        if self.bm25_index is not None:
+            self.bm25_index.remove(removed_ids)
+            self.bm25_index.add_documents(added_ids, added_documents)
+
+    def export_snapshot(self, path=None):
+        """
+        Export the Chroma collection to a read-only, memory-mapped snapshot for the "snapshot" backend.
+
+        Args:
+            path (str, optional): Snapshot directory. Defaults to rag.snapshot.path.
+
+        Returns:
+            dict: The snapshot manifest.
+        """
+        if self.backend != "chroma":
+            raise ValueError("Snapshots are exported from the Chroma backend.")
+        return export_snapshot(
+            self.vectorstore,
+            path or self.snapshot_config["path"],
+            dtype=self.snapshot_config.get("dtype", "int8"),
+            nlist=self.snapshot_config.get("nlist", 0),
+            embedding_model=self.config["rag"]["embedding_model"]
+        )
+
+    def _check_writable(self):
+        if self.backend == "snapshot":
+            logger.error("Vectorstore snapshot is read-only.")
+            raise ValueError("Vectorstore snapshot is read-only: update the Chroma collection and export again.")
+
+    def rebuild_lexicon(self):
+        """
+        Rebuild the lexicon index from the dictionary rows already stored in the vectorstore.
+
+        Returns:
+            LexiconIndex: The rebuilt lexicon index.
+        """
+        existing_docs = self.vectorstore.get(include=["documents", "metadatas"])
+        self.lexicon = LexiconIndex(self.lexicon.persist_path)
+        for doc_id, content, metadata in zip(existing_docs["ids"], existing_docs["documents"], existing_docs["metadatas"]):
+            self.lexicon.add(doc_id, Document(page_content=content, metadata=metadata or {}))
+
+        logger.info(f"Rebuilt lexicon index with {len(self.lexicon)} entries")
+        self.lexicon.save()
+        return self.lexicon
+
+    def rebuild_dedupe_index(self):
+        """
+        Rebuild the dedupe index from the chunks already stored in the vectorstore.
+
+        Returns:
+            NearDuplicateFilter: The dedupe filter with the rebuilt index.
+        """
+        self.dedupe_filter.clear()
+        offset = 0
+        while True:
+            batch = self.vectorstore.get(include=["documents", "metadatas"], limit=WRITE_BATCH_SIZE, offset=offset)
+            if not batch["ids"]:
+                break
+            self.dedupe_filter.add(
+                batch["ids"],
+                [Document(page_content=content, metadata=metadata or {})
+                 for content, metadata in zip(batch["documents"], batch["metadatas"])]
+            )
+            offset += len(batch["ids"])
+
+        logger.info(f"Rebuilt dedupe index with {len(self.dedupe_filter)} chunks")
+        self.dedupe_filter.save()
+        return self.dedupe_filter
+
+    def get_bm25_index(self):
+        """
+        Get the BM25 index over the stored chunks, building it on first use.
+        The snapshot backend opens the postings exported with the snapshot instead.
+
+        Returns:
+            BM25Index | SnapshotBM25Index: Keyword index kept in sync with the vectorstore.
+        """
+        if self.bm25_index is None and self.backend == "snapshot":
+            self.bm25_index = SnapshotBM25Index(self.vectorstore.index)
+            logger.info(f"Opened snapshot BM25 index over {len(self.bm25_index)} documents")
+        elif self.bm25_index is None:
+            existing_docs = self.vectorstore.get(include=["documents", "metadatas"])
+            self.bm25_index = BM25Index()
+            for doc_id, content, metadata in zip(existing_docs["ids"], existing_docs["documents"], existing_docs["metadatas"]):
+                self.bm25_index.add(doc_id, Document(page_content=content, metadata=metadata or {}))
+            logger.info(f"Built BM25 index over {len(self.bm25_index)} documents")
+        return self.bm25_index
+
+    def _add_documents(self, documents, refit_topics=False, exclude_ids=()):
+        """
+        Add documents to the vectorstore in batches and keep the lexicon, dedupe and BM25 indexes in sync.
+        Near duplicates of each other or of stored chunks are dropped first, so they are never embedded.
+
+        Args:
+            documents (List[Document]): Documents to add.
+            refit_topics (bool, optional): Re-cluster topics on these documents instead of
+                                           assigning them to the saved clusters. Defaults to False.
+            exclude_ids (Iterable[str], optional): Stored chunks duplicates are not checked against. Defaults to ().
+
+        Returns:
+            List[str]: Ids of the added documents.
+        """
+        if self.dedupe_filter is not None:
+            documents, stats = self.dedupe_filter.filter(documents, exclude_ids=exclude_ids)
+            logger.info(
+                f"Removed {stats['exact'] + stats['near']} of {stats['input']} chunks as duplicates "
+                f"({stats['exact']} exact, {stats['near']} near, {stats['indexed']} already stored)"
+            )
+
+        ids = [str(uuid.uuid4()) for _ in documents]
+        self._write_documents(documents, ids, refit_topics=refit_topics)
+
+        if self.lexicon.add_documents(ids, documents):
+            self.lexicon.save()
+        if self.dedupe_filter is not None and ids:
+            self.dedupe_filter.add(ids, documents)
+            self.dedupe_filter.save()
+        if self.bm25_index is not None:
+            self.bm25_index.add_documents(ids, documents)
+        return ids
+
     
     def _process_pdf(self, pdf_path):
         """
@@ -190,6 +614,7 @@ class VectorStoreManager:
         for i, doc in enumerate(tqdm(documents, desc=f"Adding metadata for {file_name}")):
             doc.metadata.update({
                 "chunk_id": f"pdf_{file_name}_{i}",
+                "file_name": file_name,
                 "topic": "unknown",
                 "level": "unknown",
                 "language": "unknown"
@@ -228,6 +653,8 @@ class VectorStoreManager:
                 metadata={
                     "source": csv_path,
                     "chunk_id": f"csv_{file_name}_{row.Index}",
+                    "file_name": file_name,
+                    "word": str(row.word),
                     "topic": "unknown",
                     "level": "unknown",
                     "language": "unknown"
@@ -0,0 +1,214 @@
+import json
+import time
+import argparse
+import platform
+from pathlib import Path
+
+import numpy as np
+import torch
+import torchaudio
+
+from src.stt.stt_processor import STTProcessor
+from src.tts.tts_processor import TTSProcessor
+from src.scripts.benchmark_turn import git_commit, load_tiny_generator
+from src.utils.load_config import load_config
+from src.utils.log_config import setup_logging
+
+config = load_config("config.yaml")
+logger = setup_logging()
+
+DEFAULT_SENTENCES = [
+    "Hello, how are you today?",
+    "Let's practice ordering food at a restaurant.",
+    "Could you tell me the way to the train station, please?",
+    "The word apologize means to say that you are sorry.",
+    "That's a great answer, but try to use the past tense.",
+    "What did you do last weekend with your friends?",
+]
+
+
+def normalize_words(text):
+    return "".join(char if char.isalnum() or char.isspace() else " " for char in text.lower()).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """
+    Word-level edit distance divided by the reference length.
+
+    Args:
+        reference (str): Text that was synthesized.
+        hypothesis (str): Whisper's transcript of the audio.
+
+    Returns:
+        float: WER, 0.0 for a perfect transcript.
+    """
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return float(bool(hyp))
+    distances = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        previous, distances[0] = distances[0], i
+        for j, hyp_word in enumerate(hyp, start=1):
+            previous, distances[j] = distances[j], min(
+                distances[j] + 1, distances[j - 1] + 1, previous + (ref_word != hyp_word)
+            )
+    return distances[-1] / len(ref)
+
+
+class MelDistance:
+    def __init__(self, sample_rate, n_mels=80):
+        """
+        Mean absolute difference of log-mel spectrograms in dB, a simple proxy of how far
+        reduced-codebook audio is from full-codebook audio.
+
+        Args:
+            sample_rate (int): Sample rate of the audio.
+            n_mels (int, optional): Mel bands. Defaults to 80.
+        """
+        self.mel = torchaudio.transforms.MelSpectrogram(sample_rate, n_fft=1024, hop_length=256, n_mels=n_mels)
+        self.to_db = torchaudio.transforms.AmplitudeToDB(top_db=80)
+
+    def __call__(self, reference, degraded):
+        length = min(reference.numel(), degraded.numel())
+        ref = self.to_db(self.mel(reference[:length].float().cpu()))
+        deg = self.to_db(self.mel(degraded[:length].float().cpu()))
+        return float((ref - deg).abs().mean())
+
+
+def codec_fidelity(tts, clips, num_codebooks, mel_distance):
+    """
+    Round-trip real speech through Mimi and compare decoding from num_codebooks codebooks
+    with decoding from all 32, isolating what the codec loses.
+
+    Returns:
+        float: Mean log-mel distance in dB.
+    """
+    distances = []
+    with torch.inference_mode():
+        for audio in clips:
+            full = tts.generator.codec_roundtrip(audio, 32)
+            reduced = tts.generator.codec_roundtrip(audio, num_codebooks)
+            distances.append(mel_distance(full, reduced))
+    return round(float(np.mean(distances)), 3) if distances else None
+
+
+def synthesize(tts, stt, sentences, voice_context, speaker, seed):
+    """
+    Synthesize every sentence and score the speed and intelligibility of the audio.
+
+    Returns:
+        dict: Per-sentence seconds, audio seconds, real-time factor and WER.
+    """
+    results = []
+    for sentence in sentences:
+        torch.manual_seed(seed)
+        start = time.perf_counter()
+        audio = tts.generate_audio(text=sentence, speaker=speaker, context=voice_context)
+        if tts.device == "cuda":
+            torch.cuda.synchronize()
+        synth_s = time.perf_counter() - start
+        audio_s = audio.numel() / tts.generator.sample_rate
+        result = {
+            "sentence": sentence,
+            "synth_s": round(synth_s, 3),
+            "audio_s": round(audio_s, 3),
+            "rtf": round(synth_s / audio_s, 3) if audio_s else None,
+        }
+        if stt is not None and audio.numel():
+            wav = torchaudio.functional.resample(
+                audio.detach().float().cpu(), orig_freq=tts.generator.sample_rate, new_freq=stt.sample_rate
+            )
+            transcript = stt.process_audio(wav.numpy(), stt.sample_rate)
+            result["transcript"] = transcript
+            result["wer"] = round(word_error_rate(sentence, transcript), 3)
+        results.append(result)
+    return results
+
+
+def summarize(results):
+    def mean(key):
+        values = [result[key] for result in results if result.get(key) is not None]
+        return round(float(np.mean(values)), 3) if values else None
+
+    audio_s = sum(result["audio_s"] for result in results)
+    synth_s = sum(result["synth_s"] for result in results)
+    rtfs = [result["rtf"] for result in results if result["rtf"] is not None]
+    return {
+        "rtf": round(synth_s / audio_s, 3) if audio_s else None,
+        "rtf_p50": round(float(np.median(rtfs)), 3) if rtfs else None,
+        "ms_per_frame": round(synth_s * 1000 / (audio_s / 0.08), 1) if audio_s else None,
+        "wer": mean("wer"),
+    }
+
+
+def main(args):
+    sentences = DEFAULT_SENTENCES
+    if args.sentences:
+        with open(args.sentences, encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+
+    tts_config = config["tts"]
+    if args.tiny_tts:
+        device = args.device or ("cuda" if torch.cuda.is_available() else "cpu")
+        tts = TTSProcessor(device=device, generator=load_tiny_generator(device))
+    else:
+        tts = TTSProcessor(device=args.device)
+    voice_context = []
+    if not args.no_voice_context:
+        voice_context = tts.load_voice_prompts(tts_config["voice_prompts"], tts_config["speaker"])
+    stt = None if args.no_stt else STTProcessor()
+    clips = [tts.load_audio(prompt["audio"]) for prompt in tts_config["voice_prompts"]]
+    mel_distance = MelDistance(tts.generator.sample_rate)
+
+    modes = []
+    for num_codebooks in args.codebooks:
+        logger.info(f"Benchmarking synthesis with {num_codebooks} codebooks")
+        tts.generator.set_num_codebooks(num_codebooks)
+        # Untimed pass, so torch.compile graphs for this codebook count are built first.
+        tts.generate_audio(text=sentences[0], speaker=tts_config["speaker"], context=voice_context)
+
+        results = synthesize(tts, stt, sentences, voice_context, tts_config["speaker"], args.seed)
+        mode = {
+            "num_codebooks": num_codebooks,
+            **summarize(results),
+            "codec_mel_distance_db": codec_fidelity(tts, clips, num_codebooks, mel_distance),
+            "sentences": results,
+        }
+        logger.info(f"Codebook benchmark: {json.dumps({k: v for k, v in mode.items() if k != 'sentences'})}")
+        modes.append(mode)
+
+    baseline = next((mode for mode in modes if mode["num_codebooks"] == max(args.codebooks)), None)
+    for mode in modes:
+        if baseline is not None and baseline["rtf"] and mode["rtf"]:
+            mode["speedup"] = round(baseline["rtf"] / mode["rtf"], 2)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "device": tts.device,
+        "settings": vars(args),
+        "modes": modes,
+    }
+    print(json.dumps([{k: v for k, v in mode.items() if k != "sentences"} for mode in modes], indent=2))
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Codebook benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare real-time factor and audio quality of CSM synthesis with fewer codebooks per frame."
+    )
+    parser.add_argument("--codebooks", type=int, nargs="+", default=[32, 16, 8])
+    parser.add_argument("--sentences", help="Text file with one sentence per line, built-in tutor sentences by default.")
+    parser.add_argument("--seed", type=int, default=0, help="Sampling seed, the same for every mode.")
+    parser.add_argument("--tiny-tts", action="store_true", help="Random-weight llama-100M CSM instead of csm-1b (speed only).")
+    parser.add_argument("--no-voice-context", action="store_true", help="Synthesize without the voice prompts.")
+    parser.add_argument("--no-stt", action="store_true", help="Skip the Whisper WER check.")
+    parser.add_argument("--device", default=None, help="TTS device, detected by default.")
+    parser.add_argument("--output", default="codebook_benchmark.json")
+    main(parser.parse_args())
@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import yaml
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+
+from src.rag.vector_store import VectorStoreManager
+from src.rag.bm25 import BM25Index
+from src.rag.retriever import HybridRetriever
+from src.utils.load_config import load_config
+from src.utils.log_config import setup_logging
+
+config = load_config("config.yaml")
+logger = setup_logging()
+
+DEFAULT_SWEEP = [
+    {"chunk_size": 90, "chunk_overlap": 20},
+    {"chunk_size": 90, "chunk_overlap": 0},
+    {"chunk_size": 200, "chunk_overlap": 40},
+    {"chunk_size": 400, "chunk_overlap": 80},
+    {"chunk_size": 90, "chunk_overlap": 20, "hnsw": {"M": 32, "construction_ef": 200, "search_ef": 100}},
+]
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, embeddings):
+        """
+        Cache document embeddings by text, so parameter sets sharing chunks are only embedded once.
+        Queries are not cached, so query latency stays comparable across parameter sets.
+
+        Args:
+            embeddings (Embeddings): Wrapped embedding model.
+        """
+        self.embeddings = embeddings
+        self.cache = {}
+
+    def embed_documents(self, texts):
+        missing = list({text for text in texts if text not in self.cache})
+        if missing:
+            self.cache.update(zip(missing, self.embeddings.embed_documents(missing)))
+        return [self.cache[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+def is_relevant(document, label):
+    """
+    Judge a chunk against a labelled query. Labels name the page (PDF) or headword (CSV) holding
+    the answer, optionally narrowed to chunks containing one of the "contains" phrases, so the
+    same labels work for every chunking.
+
+    Args:
+        document (Document): Retrieved chunk.
+        label (dict): Query with "page" or "word" and optional "contains".
+
+    Returns:
+        bool: Whether the chunk answers the query.
+    """
+    metadata = document.metadata
+    if "word" in label and normalize(str(metadata.get("word", ""))) != normalize(label["word"]):
+        return False
+    if "page" in label and metadata.get("page") != label["page"]:
+        return False
+    text = normalize(document.page_content)
+    return not label.get("contains") or any(normalize(phrase) in text for phrase in label["contains"])
+
+
+def directory_size(path):
+    return sum(file.stat().st_size for file in Path(path).rglob("*") if file.is_file())
+
+
+def load_queries(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def build_index(manager, embeddings, params, pdf_paths, csv_paths, directory):
+    """
+    Chunk the sources with the given parameters and index them in a fresh Chroma collection.
+
+    Returns:
+        Tuple[Chroma, List[Document], List[str], dict]: The collection, chunks, their ids and build timings.
+    """
+    manager.chunk_size = params["chunk_size"]
+    manager.chunk_overlap = params["chunk_overlap"]
+    start = time.perf_counter()
+    documents = []
+    for pdf_path in pdf_paths:
+        documents.extend(manager._process_pdf(pdf_path))
+    for csv_path in csv_paths:
+        documents.extend(manager._process_csv(csv_path))
+    chunk_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings.embed_documents([doc.page_content for doc in documents])
+    embed_s = time.perf_counter() - start
+
+    collection_metadata = {f"hnsw:{key}": value for key, value in params.get("hnsw", {}).items()}
+    vectorstore = Chroma(
+        collection_name="benchmark",
+        embedding_function=embeddings,
+        persist_directory=directory,
+        collection_metadata=collection_metadata or None
+    )
+    start = time.perf_counter()
+    ids = []
+    batch_size = 5000
+    for i in range(0, len(documents), batch_size):
+        ids.extend(vectorstore.add_documents(documents[i: i + batch_size]))
+    index_s = time.perf_counter() - start
+    return vectorstore, documents, ids, {
+        "chunk_s": round(chunk_s, 3), "embed_s": round(embed_s, 3), "index_s": round(index_s, 3)
+    }
+
+
+def evaluate(search, queries, ks):
+    """
+    Run every labelled query and score the ranking.
+
+    Args:
+        search (Callable[[str], List[Document]]): Returns the ranked chunks for a query.
+        queries (List[dict]): Labelled queries.
+        ks (List[int]): Cut-offs for recall.
+
+    Returns:
+        dict: recall@k, MRR and query latency percentiles.
+    """
+    hits = {k: [] for k in ks}
+    reciprocal_ranks = []
+    latencies = []
+    for label in queries:
+        start = time.perf_counter()
+        documents = search(label["query"])
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = next((i + 1 for i, doc in enumerate(documents) if is_relevant(doc, label)), None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+        for k in ks:
+            hits[k].append(1.0 if rank and rank <= k else 0.0)
+    return {
+        **{f"recall@{k}": round(float(np.mean(hits[k])), 4) for k in ks},
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def run(manager, embeddings, params, queries, ks, pdf_paths, csv_paths, hybrid):
+    directory = tempfile.mkdtemp(prefix="retrieval_benchmark_")
+    try:
+        vectorstore, documents, ids, timings = build_index(manager, embeddings, params, pdf_paths, csv_paths, directory)
+        max_k = max(ks)
+        answerable = sum(any(is_relevant(doc, label) for doc in documents) for label in queries)
+        result = {
+            "params": params,
+            "chunks": len(documents),
+            "answerable_queries": answerable,
+            "index_bytes": directory_size(directory),
+            **timings,
+            "dense": evaluate(lambda query: vectorstore.similarity_search(query, k=max_k), queries, ks),
+        }
+        if hybrid:
+            hybrid_config = config["rag"].get("hybrid", {})
+            bm25_index = BM25Index()
+            bm25_index.add_documents(ids, documents)
+            fetch_k = max(max_k, hybrid_config.get("fetch_k", 10))
+            retriever = HybridRetriever(
+                dense=vectorstore.as_retriever(search_kwargs={"k": fetch_k}),
+                bm25_index=bm25_index,
+                k=max_k,
+                fetch_k=fetch_k,
+                rrf_k=hybrid_config.get("rrf_k", 60)
+            )
+            result["hybrid"] = evaluate(retriever.invoke, queries, ks)
+        vectorstore.delete_collection()
+        return result
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def main(args):
+    pdf_paths = [str(file) for file in Path(args.pdf_dir).glob("*.pdf")]
+    csv_paths = [str(file) for file in Path(args.csv_dir).glob("*.csv")]
+    if not pdf_paths and not csv_paths:
+        raise SystemExit(f"No PDF or CSV files found in {args.pdf_dir} or {args.csv_dir}")
+    sweep = DEFAULT_SWEEP
+    if args.sweep:
+        with open(args.sweep) as f:
+            sweep = yaml.safe_load(f)
+    queries = load_queries(args.queries)
+    ks = sorted(set(args.k))
+
+    manager = VectorStoreManager()
+    embeddings = CachedEmbeddings(manager.embedding_model)
+    results = []
+    for params in sweep:
+        logger.info(f"Benchmarking retrieval with {params}")
+        result = run(manager, embeddings, params, queries, ks, pdf_paths, csv_paths, not args.no_hybrid)
+        logger.info(f"Retrieval benchmark: {json.dumps(result)}")
+        results.append(result)
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "embedding_model": config["rag"]["embedding_model"],
+        "sources": pdf_paths + csv_paths,
+        "queries": len(queries),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Retrieval benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build indexes under several chunking and HNSW settings and score them on labelled queries."
+    )
+    parser.add_argument("--pdf-dir", default="data/pdf")
+    parser.add_argument("--csv-dir", default="data/csv")
+    parser.add_argument("--queries", default="data/benchmark/retrieval_queries.jsonl", help="Labelled queries, one JSON object per line.")
+    parser.add_argument("--sweep", help="YAML list of parameter sets (chunk_size, chunk_overlap, hnsw), a built-in grid by default.")
+    parser.add_argument("--k", type=int, nargs="+", default=sorted(set(config["rag"]["retriever_k"].values()) | {1}))
+    parser.add_argument("--no-hybrid", action="store_true", help="Only score dense search, not dense + BM25.")
+    parser.add_argument("--output", default="retrieval_benchmark.json")
+    main(parser.parse_args())
@@ -0,0 +1,228 @@
+import json
+import time
+import queue
+import argparse
+import platform
+import threading
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import torch
+from scipy.signal import resample_poly
+
+from src.stt.stt_processor import STTProcessor
+from src.rag.generator import Generator
+from src.rag.rag_pipeline import RAGPipeline
+from src.rag.sentence_aggregator import iter_sentences
+from src.tts.tts_processor import TTSProcessor
+from src.tts.csm.generator import Generator as CSMGenerator
+from src.tts.csm.models import Model, ModelArgs
+from src.scripts.mock_ollama import MockOllamaServer
+from src.utils.load_config import load_config
+from src.utils.log_config import setup_logging
+
+config = load_config("config.yaml")
+logger = setup_logging()
+
+METRICS = ["transcript_s", "first_token_s", "first_sentence_s", "first_audio_s", "turn_s"]
+
+
+def load_clip(path, sample_rate):
+    """
+    Load a WAV clip as mono float32 at the STT sample rate.
+
+    Args:
+        path (str): Path to the WAV file.
+        sample_rate (int): Target sample rate.
+
+    Returns:
+        np.ndarray: float32 samples.
+    """
+    audio, original_sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if original_sample_rate != sample_rate:
+        gcd = np.gcd(original_sample_rate, sample_rate)
+        audio = resample_poly(audio, sample_rate // gcd, original_sample_rate // gcd)
+    return audio.astype(np.float32)
+
+
+def load_tiny_generator(device):
+    """
+    CSM with random weights and the llama-100M flavor for both transformers. It keeps the real
+    tokenizers and Mimi, so the decode loop has the same shape at a fraction of the cost.
+
+    Args:
+        device (str): Device to run the model on.
+
+    Returns:
+        Generator: CSM generator.
+    """
+    torch.manual_seed(0)
+    model = Model(ModelArgs(
+        backbone_flavor="llama-100M",
+        decoder_flavor="llama-100M",
+        text_vocab_size=128_256,
+        audio_vocab_size=2051,
+        audio_num_codebooks=32,
+    ))
+    # audio_head is created with torch.empty.
+    torch.nn.init.normal_(model.audio_head, std=0.02)
+    dtype = torch.bfloat16 if device == "cuda" else torch.float32
+    model.to(device=device, dtype=dtype)
+    return CSMGenerator(model)
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = np.array(values)
+    return {
+        "mean": round(float(values.mean()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def run_turn(stt, rag, tts, voice_context, speaker, audio, sample_rate):
+    """
+    Run one clip through transcription, generation and synthesis the way the voice pipeline does,
+    with synthesis consuming sentences on its own thread while the LLM keeps streaming.
+
+    Returns:
+        dict: Transcript and the seconds from the end of the utterance to each milestone.
+    """
+    start = time.perf_counter()
+    question = stt.process_audio(audio, sample_rate)
+    turn = {"transcript": question, "transcript_s": time.perf_counter() - start}
+    if not question:
+        return turn
+
+    sentence_queue = queue.Queue()
+    audio_seconds = []
+
+    def synthesize():
+        while True:
+            sentence = sentence_queue.get()
+            if sentence is None:
+                return
+            wav = tts.generate_audio(text=sentence, speaker=speaker, context=voice_context)
+            turn.setdefault("first_audio_s", time.perf_counter() - start)
+            audio_seconds.append(wav.numel() / tts.generator.sample_rate)
+
+    synthesis = None
+    if tts is not None:
+        synthesis = threading.Thread(target=synthesize, name="benchmark-synthesis")
+        synthesis.start()
+
+    def tokens():
+        for token in rag.rag_stream(question):
+            turn.setdefault("first_token_s", time.perf_counter() - start)
+            yield token
+
+    sentences = 0
+    for sentence in iter_sentences(tokens()):
+        turn.setdefault("first_sentence_s", time.perf_counter() - start)
+        sentences += 1
+        sentence_queue.put(sentence)
+    turn["llm_done_s"] = time.perf_counter() - start
+    turn["sentences"] = sentences
+
+    sentence_queue.put(None)
+    if synthesis is not None:
+        synthesis.join()
+        turn["audio_s"] = round(sum(audio_seconds), 3)
+    turn["turn_s"] = time.perf_counter() - start
+    return turn
+
+
+def main(args):
+    sample_rate = config["stt"]["sample_rate"]
+    clip_paths = sorted(str(path) for path in Path(args.audio_dir).glob("*.wav"))
+    if not clip_paths:
+        raise SystemExit(f"No WAV files found in {args.audio_dir}")
+
+    mock = None
+    host = None
+    if not args.real_ollama:
+        mock = MockOllamaServer(port=args.mock_port, token_rate=args.token_rate, ttft_ms=args.ttft_ms).start()
+        host = mock.url
+        logger.info(f"Mock Ollama at {host}: {args.token_rate} tokens/s, {args.ttft_ms} ms to first token")
+
+    try:
+        stt = STTProcessor()
+        generator = Generator(host=host)
+        generator.warmup()
+        rag = RAGPipeline(generator=generator)
+
+        tts = None
+        voice_context = []
+        tts_config = config["tts"]
+        if not args.no_tts:
+            if args.tiny_tts:
+                device = args.device or ("cuda" if torch.cuda.is_available() else "cpu")
+                tts = TTSProcessor(device=device, generator=load_tiny_generator(device))
+            else:
+                tts = TTSProcessor(device=args.device)
+            if not args.no_voice_context:
+                voice_context = tts.load_voice_prompts(tts_config["voice_prompts"], tts_config["speaker"])
+
+        clips = [(path, load_clip(path, sample_rate)) for path in clip_paths]
+        for _ in range(args.warmup):
+            run_turn(stt, rag, tts, voice_context, tts_config["speaker"], clips[0][1], sample_rate)
+
+        turns = []
+        for run in range(args.runs):
+            for path, audio in clips:
+                turn = run_turn(stt, rag, tts, voice_context, tts_config["speaker"], audio, sample_rate)
+                turn = {"clip": Path(path).name, "run": run, **{
+                    key: round(value, 3) if isinstance(value, float) else value for key, value in turn.items()
+                }}
+                turns.append(turn)
+                logger.info(f"Benchmark turn: {json.dumps(turn)}")
+    finally:
+        if mock is not None:
+            mock.stop()
+
+    report = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "device": tts.device if tts is not None else None,
+        "settings": vars(args),
+        "summary": {metric: summarize([turn[metric] for turn in turns if metric in turn]) for metric in METRICS},
+        "turns": turns,
+    }
+    print(json.dumps(report["summary"], indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        logger.info(f"Benchmark report written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure turn latency by feeding data/audio clips through STT, RAG and TTS."
+    )
+    parser.add_argument("--audio-dir", default="data/audio")
+    parser.add_argument("--runs", type=int, default=1, help="Passes over the clips.")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed turns before measuring.")
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Tokens per second of the mock Ollama.")
+    parser.add_argument("--ttft-ms", type=int, default=200, help="Time to first token of the mock Ollama.")
+    parser.add_argument("--mock-port", type=int, default=11435)
+    parser.add_argument("--real-ollama", action="store_true", help="Use ollama.host from config.yaml instead of the mock.")
+    parser.add_argument("--tiny-tts", action="store_true", help="Random-weight llama-100M CSM instead of csm-1b.")
+    parser.add_argument("--no-tts", action="store_true", help="Skip synthesis.")
+    parser.add_argument("--no-voice-context", action="store_true", help="Synthesize without the voice prompts.")
+    parser.add_argument("--device", default=None, help="TTS device, detected by default.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    main(parser.parse_args())
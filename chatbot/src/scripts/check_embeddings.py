@@ -0,0 +1,105 @@
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+from langchain_huggingface import HuggingFaceEmbeddings
+
+from src.rag.vector_store import VectorStoreManager
+from src.rag.onnx_embeddings import OnnxEmbeddings
+from src.utils.load_config import load_config
+from src.utils.log_config import setup_logging
+
+config = load_config("config.yaml")
+logger = setup_logging()
+
+
+def embed_timed(embeddings, texts, queries):
+    """
+    Returns:
+        Tuple[np.ndarray, np.ndarray, dict]: Document and query embeddings, bulk throughput and query latency.
+    """
+    start = time.perf_counter()
+    documents = np.array(embeddings.embed_documents(texts), dtype=np.float32)
+    bulk_s = time.perf_counter() - start
+
+    query_vectors, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embeddings.embed_query(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return documents, np.array(query_vectors, dtype=np.float32), {
+        "documents_per_s": round(len(texts) / bulk_s, 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+    }
+
+
+def cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def top_k(queries, documents, k):
+    return np.argsort(-(queries @ documents.T), axis=1)[:, :k]
+
+
+def main(args):
+    rag_config = config["rag"]
+    embedding_config = rag_config.get("embedding", {})
+    texts = VectorStoreManager().vectorstore.get(include=["documents"])["documents"]
+    texts = random.Random(0).sample(texts, min(args.documents, len(texts)))
+    # The first half of a chunk, so a chunk is not trivially its own best match.
+    queries = [" ".join(text.split()[:max(1, len(text.split()) // 2)]) for text in texts[:args.queries]]
+
+    torch_embeddings = HuggingFaceEmbeddings(model_name=rag_config["embedding_model"])
+    onnx_embeddings = OnnxEmbeddings(
+        rag_config["embedding_model"],
+        cache_dir=embedding_config.get("cache_dir", "cache/onnx"),
+        quantize=not args.fp32 and embedding_config.get("quantize", True),
+        batch_size=embedding_config.get("batch_size", 32),
+        max_length=embedding_config.get("max_length", 256),
+        threads=embedding_config.get("threads"),
+    )
+    torch_docs, torch_queries, torch_timing = embed_timed(torch_embeddings, texts, queries)
+    onnx_docs, onnx_queries, onnx_timing = embed_timed(onnx_embeddings, texts, queries)
+
+    similarities = cosine(torch_docs, onnx_docs)
+    expected = top_k(torch_queries, torch_docs, args.k)
+    found = top_k(onnx_queries, onnx_docs, args.k)
+    overlaps = [len(set(e) & set(f)) / args.k for e, f in zip(expected, found)]
+    report = {
+        "model": rag_config["embedding_model"],
+        "quantized": not args.fp32 and embedding_config.get("quantize", True),
+        "documents": len(texts),
+        "queries": len(queries),
+        "cosine_mean": round(float(similarities.mean()), 5),
+        "cosine_min": round(float(similarities.min()), 5),
+        f"overlap@{args.k}": round(float(np.mean(overlaps)), 4),
+        "torch": torch_timing,
+        "onnx": onnx_timing,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    min_cosine = embedding_config.get("min_cosine", 0.98)
+    if report["cosine_min"] < min_cosine:
+        logger.error(f"ONNX embeddings drift from torch: min cosine {report['cosine_min']} < {min_cosine}")
+        sys.exit(1)
+    logger.info(f"ONNX embeddings match torch: min cosine {report['cosine_min']} >= {min_cosine}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare the ONNX embedding backend with PyTorch on the stored chunks: similarity, retrieval overlap and speed."
+    )
+    parser.add_argument("--documents", type=int, default=2000, help="Chunks sampled from the vectorstore.")
+    parser.add_argument("--queries", type=int, default=200, help="Queries built from the sampled chunks.")
+    parser.add_argument("--k", type=int, default=config["rag"]["retriever_k"]["complex"])
+    parser.add_argument("--fp32", action="store_true", help="Check the unquantized ONNX model.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    main(parser.parse_args())
@@ -0,0 +1,107 @@
+import sys
+import json
+import time
+import random
+import argparse
+
+import numpy as np
+
+from src.rag.vector_store import VectorStoreManager
+from src.rag.quantized_index import QuantizedVectorStore
+from src.utils.load_config import load_config
+from src.utils.log_config import setup_logging
+
+config = load_config("config.yaml")
+logger = setup_logging()
+
+
+def sample_queries(snapshot, count, seed=0):
+    """
+    Build queries from the first half of randomly chosen chunks, so a chunk is not trivially its own best match.
+
+    Args:
+        snapshot (QuantizedVectorStore): Exported snapshot.
+        count (int): Number of queries.
+        seed (int, optional): Random seed. Defaults to 0.
+
+    Returns:
+        List[str]: Queries.
+    """
+    rows = random.Random(seed).sample(range(len(snapshot.index)), min(count, len(snapshot.index)))
+    queries = []
+    for row in rows:
+        words = snapshot.index.record(row)["text"].split()
+        queries.append(" ".join(words[:max(1, len(words) // 2)]))
+    return queries
+
+
+def measure_recall(chroma, snapshot, queries, k):
+    """
+    Compare the snapshot's top k against Chroma's for the same query embeddings.
+
+    Returns:
+        dict: Mean and worst recall@k and the search latency of both backends.
+    """
+    recalls, chroma_ms, snapshot_ms = [], [], []
+    for query in queries:
+        embedding = snapshot.embedding.embed_query(query)
+        start = time.perf_counter()
+        expected = {doc.id for doc in chroma.similarity_search_by_vector(embedding, k=k)}
+        chroma_ms.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        found = {doc.id for doc in snapshot.similarity_search_by_vector(embedding, k=k)}
+        snapshot_ms.append((time.perf_counter() - start) * 1000)
+        if expected:
+            recalls.append(len(expected & found) / len(expected))
+    return {
+        "recall_mean": round(float(np.mean(recalls)), 4),
+        "recall_min": round(float(np.min(recalls)), 4),
+        "chroma_p50_ms": round(float(np.percentile(chroma_ms, 50)), 3),
+        "snapshot_p50_ms": round(float(np.percentile(snapshot_ms, 50)), 3),
+    }
+
+
+def main(args):
+    snapshot_config = config["rag"].get("snapshot", {})
+    path = args.path or snapshot_config["path"]
+    manager = VectorStoreManager(backend="chroma")
+    manifest = manager.export_snapshot(path)
+
+    start = time.perf_counter()
+    snapshot = QuantizedVectorStore.load(path, manager.embedding_model, nprobe=snapshot_config.get("nprobe", 8))
+    open_ms = (time.perf_counter() - start) * 1000
+
+    if args.queries_file:
+        with open(args.queries_file) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    else:
+        queries = sample_queries(snapshot, args.queries)
+    report = {
+        "manifest": manifest,
+        "open_ms": round(open_ms, 3),
+        "k": args.k,
+        "queries": len(queries),
+        **measure_recall(manager.vectorstore, snapshot, queries, args.k),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    min_recall = snapshot_config.get("min_recall", 0.95)
+    if report["recall_mean"] < min_recall:
+        logger.error(f"Snapshot recall@{args.k} {report['recall_mean']} is below the tolerance {min_recall}")
+        sys.exit(1)
+    logger.info(f"Snapshot recall@{args.k} {report['recall_mean']} is within the tolerance {min_recall}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the Chroma collection to a memory-mapped snapshot and check its recall against Chroma."
+    )
+    parser.add_argument("--path", help="Snapshot directory, rag.snapshot.path by default.")
+    parser.add_argument("--k", type=int, default=config["rag"]["retriever_k"]["complex"])
+    parser.add_argument("--queries", type=int, default=200, help="Queries sampled from the stored chunks.")
+    parser.add_argument("--queries-file", help="One query per line instead of sampled chunks.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    main(parser.parse_args())
@@ -0,0 +1,136 @@
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+import soundfile as sf
+import websockets
+from scipy.signal import resample_poly
+
+
+def load_clip(path, sample_rate):
+    """
+    Load a WAV clip as mono PCM16 at the server's input sample rate.
+
+    Args:
+        path (str): Path to the WAV file.
+        sample_rate (int): Target sample rate.
+
+    Returns:
+        np.ndarray: int16 samples.
+    """
+    audio, original_sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    if original_sample_rate != sample_rate:
+        gcd = np.gcd(original_sample_rate, sample_rate)
+        audio = resample_poly(audio, sample_rate // gcd, original_sample_rate // gcd)
+    return (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+
+
+def percentiles(values):
+    if not values:
+        return None
+    values = np.array(values)
+    return {
+        "count": int(len(values)),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+async def run_session(index, args, clip_paths, results):
+    """
+    Replay clips through one WebSocket session and record per-turn latencies.
+    """
+    try:
+        async with websockets.connect(args.url, max_size=None) as websocket:
+            ready = json.loads(await websocket.recv())
+            sample_rate = ready["input_sample_rate"]
+            chunk_samples = int(sample_rate * args.chunk_ms / 1000)
+            silence = np.zeros(int(sample_rate * args.silence_ms / 1000), dtype=np.int16)
+
+            for turn_index in range(args.turns):
+                clip = load_clip(clip_paths[(index + turn_index) % len(clip_paths)], sample_rate)
+                audio = np.concatenate([clip, silence])
+                for start in range(0, len(audio), chunk_samples):
+                    await websocket.send(audio[start: start + chunk_samples].tobytes())
+                    await asyncio.sleep(args.chunk_ms / 1000 / args.speed)
+                await websocket.send(json.dumps({"type": "end_of_utterance"}))
+                end_of_speech = time.perf_counter()
+
+                turn = {"session": index, "turn": turn_index}
+                audio_bytes = 0
+                while True:
+                    message = await asyncio.wait_for(websocket.recv(), timeout=args.timeout)
+                    elapsed = time.perf_counter() - end_of_speech
+                    if isinstance(message, bytes):
+                        turn.setdefault("first_audio_s", elapsed)
+                        audio_bytes += len(message)
+                        continue
+                    event = json.loads(message)
+                    if event["type"] == "transcript":
+                        turn.setdefault("transcript_s", elapsed)
+                    elif event["type"] == "sentence":
+                        turn.setdefault("first_sentence_s", elapsed)
+                    elif event["type"] == "turn_end":
+                        turn["turn_s"] = elapsed
+                        break
+                turn["audio_s"] = audio_bytes / 2 / ready["output_sample_rate"]
+                results["turns"].append(turn)
+                print(json.dumps(turn))
+    except websockets.exceptions.ConnectionClosed as e:
+        if e.rcvd is not None and e.rcvd.code == 1013:
+            results["rejected"] += 1
+        else:
+            results["errors"].append(f"session {index}: {e}")
+    except Exception as e:
+        results["errors"].append(f"session {index}: {e!r}")
+
+
+async def main(args):
+    clip_paths = sorted(str(path) for path in Path(args.audio_dir).glob("*.wav"))
+    if not clip_paths:
+        raise SystemExit(f"No WAV files found in {args.audio_dir}")
+
+    results = {"turns": [], "rejected": 0, "errors": []}
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_session(index, args, clip_paths, results) for index in range(args.sessions)
+    ])
+    wall_time = time.perf_counter() - start
+
+    turns = results["turns"]
+    report = {
+        "sessions": args.sessions,
+        "completed_turns": len(turns),
+        "rejected_sessions": results["rejected"],
+        "errors": results["errors"],
+        "wall_time_s": round(wall_time, 3),
+        "turns_per_minute": round(len(turns) / wall_time * 60, 2),
+        "transcript_s": percentiles([turn["transcript_s"] for turn in turns if "transcript_s" in turn]),
+        "first_sentence_s": percentiles([turn["first_sentence_s"] for turn in turns if "first_sentence_s" in turn]),
+        "first_audio_s": percentiles([turn["first_audio_s"] for turn in turns if "first_audio_s" in turn]),
+        "turn_s": percentiles([turn["turn_s"] for turn in turns]),
+        "audio_s_per_wall_s": round(sum(turn["audio_s"] for turn in turns) / wall_time, 3),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay data/audio clips through concurrent voice server sessions.")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/ws")
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--audio-dir", default="data/audio")
+    parser.add_argument("--chunk-ms", type=int, default=100)
+    parser.add_argument("--silence-ms", type=int, default=300, help="Silence appended after each clip.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Playback speed relative to real time.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for each server message.")
+    parser.add_argument("--output", help="Write the JSON report to this file.")
+    asyncio.run(main(parser.parse_args()))
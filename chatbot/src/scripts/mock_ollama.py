@@ -0,0 +1,136 @@
+import json
+import time
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RESPONSE = (
+    "That's a great question! "
+    "We use the present perfect for experiences that happened at an unspecified time before now. "
+    "For example, you can say: I have visited London twice. "
+    "Can you make a sentence about something you have done this year?"
+)
+
+
+class MockOllamaServer:
+    def __init__(self, host="127.0.0.1", port=11435, token_rate=30.0, ttft_ms=200, response=DEFAULT_RESPONSE):
+        """
+        Local stand-in for the Ollama HTTP API that streams a canned response at a fixed pace,
+        so turn latency can be measured without a GPU-bound LLM in the loop.
+
+        Args:
+            host (str, optional): Address to bind. Defaults to "127.0.0.1".
+            port (int, optional): Port to bind. Defaults to 11435.
+            token_rate (float, optional): Tokens streamed per second. Defaults to 30.0.
+            ttft_ms (int, optional): Delay before the first token, standing in for prompt prefill. Defaults to 200.
+            response (str, optional): Text every generation answers with. Defaults to a short tutor reply.
+        """
+        self.host = host
+        self.port = port
+        self.token_rate = token_rate
+        self.ttft_ms = ttft_ms
+        # Ollama streams word pieces, each keeping its leading space.
+        words = response.split(" ")
+        self.tokens = [words[0]] + [" " + word for word in words[1:]]
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _write_chunk(self, payload):
+                data = (json.dumps(payload) + "\n").encode()
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"status": "ok"})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                model = request.get("model", "")
+                # An empty prompt only loads the model, like a real Ollama server.
+                tokens = mock.tokens if request.get("prompt") else []
+
+                def message(response, done):
+                    payload = {
+                        "model": model,
+                        "created_at": datetime.now(timezone.utc).isoformat(),
+                        "response": response,
+                        "done": done,
+                    }
+                    if done:
+                        payload["done_reason"] = "stop" if tokens else "load"
+                        payload["eval_count"] = len(tokens)
+                    return payload
+
+                if tokens:
+                    time.sleep(mock.ttft_ms / 1000)
+                if not request.get("stream", True):
+                    time.sleep(len(tokens) / mock.token_rate)
+                    self._send_json(message("".join(tokens), True))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for index, token in enumerate(tokens):
+                    if index:
+                        time.sleep(1 / mock.token_rate)
+                    self._write_chunk(message(token, False))
+                self._write_chunk(message("", True))
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self):
+        self.server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, name="mock-ollama", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve a canned, rate-limited response on the Ollama API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--token-rate", type=float, default=30.0, help="Tokens per second.")
+    parser.add_argument("--ttft-ms", type=int, default=200, help="Delay before the first token.")
+    args = parser.parse_args()
+
+    mock = MockOllamaServer(args.host, args.port, args.token_rate, args.ttft_ms).start()
+    print(f"Mock Ollama listening on {mock.url}")
+    try:
+        mock.thread.join()
+    except KeyboardInterrupt:
+        mock.stop()
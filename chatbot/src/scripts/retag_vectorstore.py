@@ -0,0 +1,7 @@
+from ..rag.vector_store import VectorStoreManager
+
+vector_store_manager = VectorStoreManager()
+count = vector_store_manager.retag(refit=True)
+print(f"Tagged {count} chunks with level, language and topic.")
+for topic_id, label in enumerate(vector_store_manager.topic_model.labels):
+    print(f"topic_{topic_id}: {label}")
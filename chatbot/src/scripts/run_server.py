@@ -0,0 +1,28 @@
+import argparse
+import uvicorn
+from ..utils.startup import startup_profile
+from ..utils.load_config import load_config
+
+config = load_config("config.yaml")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve voice sessions over WebSocket.")
+    parser.add_argument(
+        "--profile-startup",
+        nargs="?",
+        const="logs/startup_profile.json",
+        help="Write the cold-start breakdown to this JSON file (default: %(const)s)."
+    )
+    args = parser.parse_args()
+
+    with startup_profile.measure("imports"):
+        from ..server.app import app
+    app.state.profile_startup = args.profile_startup
+
+    server_config = config["server"]
+    uvicorn.run(app, host=server_config["host"], port=server_config["port"], workers=1)
+
+
+if __name__ == "__main__":
+    main()
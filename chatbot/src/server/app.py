@@ -0,0 +1,359 @@
+import json
+import uuid
+import asyncio
+from functools import partial
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+from src.stt.stt_processor import STTProcessor
+from src.rag.rag_pipeline import RAGPipeline
+from src.rag.learner_profile import LearnerProfile
+from src.tts.tts_processor import TTSProcessor
+from src.tts.voice_context import VoiceContext
+from src.pipeline.utterance_detector import UtteranceDetector
+from src.utils.load_config import load_config
+from src.utils.log_config import dropped_log_records, setup_logging
+from src.utils.tracing import TurnTrace, bind_context, get_tracer, now_ns
+from src.utils.startup import startup_profile
+
+logger = setup_logging()
+tracer = get_tracer(__name__)
+
+
+class SharedModels:
+    def __init__(self, config):
+        """
+        The single set of loaded models (Whisper, embeddings + vectorstore, CSM) shared by every session.
+
+        Args:
+            config (dict): Application config.
+        """
+        server_config = config["server"]
+        tts_config = config["tts"]
+
+        def load_tts():
+            tts = TTSProcessor()
+            return tts, tts.load_voice_prompts(tts_config["voice_prompts"], tts_config["speaker"])
+
+        # The three models do not depend on each other, so they load side by side.
+        models = startup_profile.load_parallel({
+            "stt": STTProcessor,
+            "rag": RAGPipeline,
+            "tts": load_tts,
+        })
+        self.stt = models["stt"]
+        self.rag = models["rag"]
+        self.tts, self.voice_context = models["tts"]
+        self.speaker = tts_config["speaker"]
+
+        self.stt_executor = ThreadPoolExecutor(max_workers=server_config["stt_workers"], thread_name_prefix="stt")
+        batching_config = tts_config["batching"]
+        if batching_config["enabled"]:
+            self.tts.enable_batching(
+                max_batch_size=batching_config["max_batch_size"],
+                max_cache_len=batching_config["max_cache_len"],
+                stats_interval_s=batching_config["stats_interval_s"],
+                decode_workers=batching_config.get("decode_workers", 1)
+            )
+            # Workers only wait on the scheduler, one per batch slot.
+            tts_workers = batching_config["max_batch_size"]
+        else:
+            self.tts.warmup()
+            # CSM keeps one set of KV caches, so unbatched synthesis runs on a single worker.
+            tts_workers = 1
+        self.tts_executor = ThreadPoolExecutor(max_workers=tts_workers, thread_name_prefix="tts")
+
+    def tts_stats(self):
+        return self.tts.scheduler.stats() if self.tts.scheduler is not None else None
+
+    def embedding_stats(self):
+        batcher = self.rag.retriever.vector_store_manager.embedding_batcher
+        return batcher.stats() if batcher is not None else None
+
+    def shutdown(self):
+        if self.tts.scheduler is not None:
+            self.tts.scheduler.stop()
+        if self.rag.retriever.vector_store_manager.embedding_batcher is not None:
+            self.rag.retriever.vector_store_manager.embedding_batcher.stop()
+        self.stt_executor.shutdown(wait=False, cancel_futures=True)
+        self.tts_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class VoiceSession:
+    def __init__(self, websocket, models, config):
+        """
+        State of one learner connected over WebSocket.
+
+        The client streams mono PCM16 audio at stt.sample_rate as binary frames and may send
+        {"type": "end_of_utterance"} as a text frame. The server answers with JSON events
+        ("ready", "transcript", "sentence", "barge_in", "turn_end") and the bot's voice as
+        binary mono PCM16 frames at the TTS sample rate. The learner's level and topics can be
+        passed as query parameters, e.g. /ws?level=B1&topics=travel,food, to narrow retrieval.
+
+        Args:
+            websocket (WebSocket): Accepted connection.
+            models (SharedModels): Shared models.
+            config (dict): Application config.
+        """
+        self.websocket = websocket
+        self.models = models
+        self.session_id = uuid.uuid4().hex
+        level = websocket.query_params.get("level")
+        topics = websocket.query_params.get("topics")
+        if level or topics:
+            try:
+                self.models.rag.set_profile(self.session_id, LearnerProfile(
+                    level=level.upper() if level else None,
+                    topics=topics.split(",") if topics else None
+                ))
+            except ValueError as e:
+                logger.warning(f"Session {self.session_id}: ignoring learner profile: {e}")
+        context_config = config["tts"].get("context", {})
+        self.learner_speaker = context_config.get("learner_speaker", 0)
+        # The voice prompts are shared, so their cached tokens are computed once for every session.
+        self.voice_context = VoiceContext.from_config(models.tts.generator, models.voice_context, context_config)
+        self.sample_rate = config["stt"]["sample_rate"]
+        self.detector = UtteranceDetector(self.sample_rate, config["pipeline"])
+        queue_size = config["server"]["session_queue_size"]
+        self.outbox = asyncio.Queue(maxsize=queue_size)
+        self.sentence_queue_size = queue_size
+
+        self.turn = 0
+        self.bot_active = False
+        self.turn_tasks = []
+        self.turn_trace = None
+        self.transcriptions = set()
+        self.partial_task = None
+        self.speech_started_ns = None
+
+    def is_current(self, turn):
+        return turn == self.turn
+
+    async def send(self, turn, payload, spoken=None):
+        """
+        Queue a JSON event (dict) or audio (bytes) for the client.
+
+        Args:
+            spoken (tuple, optional): (sentence, audio) of the bot, added to the voice context once
+                                      the audio is actually sent. Defaults to None.
+        """
+        await self.outbox.put((turn, payload, spoken))
+
+    async def _send_loop(self):
+        while True:
+            turn, payload, spoken = await self.outbox.get()
+            if turn is not None and not self.is_current(turn):
+                continue
+            if isinstance(payload, bytes):
+                await self.websocket.send_bytes(payload)
+            else:
+                await self.websocket.send_text(json.dumps(payload))
+            # Audio dropped by a barge-in was never heard, so it never enters the voice context.
+            if spoken is not None and self.voice_context is not None and self.is_current(turn):
+                self.voice_context.add_turn(self.models.speaker, *spoken)
+
+    async def run(self):
+        """
+        Serve the session until the client disconnects.
+        """
+        sender = asyncio.create_task(self._send_loop())
+        await self.send(None, {
+            "type": "ready",
+            "session_id": self.session_id,
+            "input_sample_rate": self.sample_rate,
+            "output_sample_rate": self.models.tts.generator.sample_rate,
+        })
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    await self.on_audio(message["bytes"])
+                elif message.get("text"):
+                    await self.on_control(json.loads(message["text"]))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in list(self.transcriptions):
+                task.cancel()
+            await self.cancel_turn()
+            sender.cancel()
+            self.models.rag.end_session(self.session_id)
+
+    async def on_audio(self, data):
+        block = np.frombuffer(data, dtype=np.int16).astype(np.float32) / 32768.0
+        for event, audio in self.detector.feed(block, bot_active=self.bot_active):
+            if event == "speech_start":
+                self.speech_started_ns = now_ns()
+                if self.bot_active:
+                    await self.barge_in()
+            elif event == "partial":
+                if self.partial_task is None or self.partial_task.done():
+                    self.partial_task = asyncio.create_task(self.speculate(audio))
+            elif event == "end":
+                await self.start_turn(audio)
+
+    async def on_control(self, message):
+        if message.get("type") == "end_of_utterance":
+            audio = self.detector.flush()
+            if audio is not None:
+                await self.start_turn(audio)
+
+    async def speculate(self, audio):
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(self.models.stt_executor, self.models.stt.process_audio, audio, self.sample_rate)
+        if text:
+            self.models.rag.speculate(text, session_id=self.session_id)
+
+    async def cancel_turn(self):
+        self.turn += 1
+        self.bot_active = False
+        for task in self.turn_tasks:
+            task.cancel()
+        self.turn_tasks = []
+        if self.turn_trace is not None:
+            self.turn_trace.end(cancelled=True)
+            self.turn_trace = None
+
+    async def barge_in(self):
+        await self.cancel_turn()
+        await self.send(None, {"type": "barge_in"})
+        logger.info(f"Session {self.session_id}: barge-in at turn {self.turn}")
+
+    async def start_turn(self, audio):
+        turn_trace = TurnTrace(tracer, self.turn + 1, self.session_id, start_time=self.speech_started_ns)
+        tracer.start_span("capture", context=turn_trace.context, start_time=turn_trace.start_time).end()
+        # Tasks copy the current context, so their spans become children of the turn.
+        with turn_trace.activate():
+            task = asyncio.create_task(self._transcribe(audio, turn_trace))
+        self.transcriptions.add(task)
+        task.add_done_callback(self.transcriptions.discard)
+
+    async def _transcribe(self, audio, turn_trace):
+        """
+        Transcribe an utterance and start its turn. The previous turn only gives way once there is a
+        transcript, so noise does not cancel the bot's answer; real interruptions already cancel it
+        on speech_start (barge-in).
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            question = await loop.run_in_executor(
+                self.models.stt_executor, bind_context(self.models.stt.process_audio), audio, self.sample_rate
+            )
+        except asyncio.CancelledError:
+            turn_trace.end(cancelled=True)
+            raise
+        except Exception as e:
+            logger.error(f"Session {self.session_id}: error when transcribing audio: {e}")
+            question = ""
+        if not question:
+            turn_trace.end()
+            return
+
+        await self.cancel_turn()
+        turn = self.turn
+        self.turn_trace = turn_trace
+        sentences = asyncio.Queue(maxsize=self.sentence_queue_size)
+        with turn_trace.activate():
+            self.turn_tasks = [
+                asyncio.create_task(self._generate(turn, question, audio, sentences)),
+                asyncio.create_task(self._synthesize(turn, sentences)),
+            ]
+
+    async def _generate(self, turn, question, audio, sentences):
+        try:
+            if self.is_current(turn):
+                if self.voice_context is not None:
+                    self.voice_context.add_turn(self.learner_speaker, question, audio, sample_rate=self.sample_rate)
+                await self.send(turn, {"type": "transcript", "turn": turn, "text": question})
+                self.bot_active = True
+                async for sentence in self.models.rag.astream_sentences(question, session_id=self.session_id):
+                    await self.send(turn, {"type": "sentence", "turn": turn, "text": sentence})
+                    await sentences.put(sentence)
+        except Exception as e:
+            logger.error(f"Session {self.session_id}: error when generating response: {e}")
+        # Not reached on cancellation; the synthesis task is cancelled together with this one.
+        await sentences.put(None)
+
+    async def _synthesize(self, turn, sentences):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                sentence = await sentences.get()
+                if sentence is None:
+                    break
+                audio = await loop.run_in_executor(
+                    self.models.tts_executor,
+                    partial(
+                        bind_context(self.models.tts.generate_audio),
+                        text=sentence,
+                        speaker=self.models.speaker,
+                        context=self.voice_context or self.models.voice_context,
+                        should_stop=lambda: not self.is_current(turn)
+                    )
+                )
+                if audio.numel() and self.is_current(turn):
+                    pcm = (audio.detach().cpu().float().clamp(-1, 1).numpy() * 32767).astype(np.int16)
+                    await self.send(turn, pcm.tobytes(), spoken=(sentence, audio))
+                    if self.turn_trace is not None:
+                        self.turn_trace.mark_first_audio()
+        except Exception as e:
+            logger.error(f"Session {self.session_id}: error when synthesizing audio: {e}")
+        finally:
+            if self.is_current(turn):
+                self.bot_active = False
+                await self.send(turn, {"type": "turn_end", "turn": turn})
+                if self.turn_trace is not None:
+                    self.turn_trace.end()
+                    self.turn_trace = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    config = load_config("config.yaml")
+    app.state.config = config
+    app.state.max_sessions = config["server"]["max_sessions"]
+    app.state.active_sessions = 0
+    logger.info("Loading shared models...")
+    app.state.models = await asyncio.to_thread(SharedModels, config)
+    startup_profile.log_report(logger, getattr(app.state, "profile_startup", None))
+    logger.info(f"Server ready for up to {app.state.max_sessions} sessions")
+    yield
+    app.state.models.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "active_sessions": app.state.active_sessions,
+        "max_sessions": app.state.max_sessions,
+        "tts": app.state.models.tts_stats(),
+        "embedding": app.state.models.embedding_stats(),
+        "dropped_log_records": dropped_log_records(),
+    }
+
+
+@app.websocket("/ws")
+async def voice_websocket(websocket: WebSocket):
+    await websocket.accept()
+    if app.state.active_sessions >= app.state.max_sessions:
+        logger.warning("Rejecting session: server is at capacity")
+        await websocket.close(code=1013, reason="Server is at capacity, try again later")
+        return
+
+    app.state.active_sessions += 1
+    session = VoiceSession(websocket, app.state.models, app.state.config)
+    logger.info(f"Session {session.session_id} connected ({app.state.active_sessions}/{app.state.max_sessions})")
+    try:
+        await session.run()
+    finally:
+        app.state.active_sessions -= 1
+        logger.info(f"Session {session.session_id} closed ({app.state.active_sessions}/{app.state.max_sessions})")
@@ -3,6 +3,7 @@ import logging
 from faster_whisper import WhisperModel
 from src.utils.load_config import load_config
 from src.utils.log_config import setup_logging
+from src.utils.startup import startup_profile
 
 logging.getLogger("faster_whisper").setLevel(logging.WARNING)
 logger = setup_logging()
@@ -35,12 +36,13 @@ def load_model(force_reload=False):
     
     logger.info(f"Loading model {model_size} on {device}")
     try:
-        model = WhisperModel(
-            model_size,
-            device=device,
-            compute_type=compute_type,
-            local_files_only=False
-        )
+        with startup_profile.measure("stt.whisper"):
+            model = WhisperModel(
+                model_size,
+                device=device,
+                compute_type=compute_type,
+                local_files_only=False
+            )
         _model = model
         logger.info("Speech to Text model is ready")
         return model
@@ -10,9 +10,11 @@ from .stt_utils import audio_callback, audio_queue
 from .model import load_model
 from src.utils.load_config import load_config
 from src.utils.log_config import setup_logging
+from src.utils.tracing import get_tracer
 
 
 logger = setup_logging()
+tracer = get_tracer(__name__)
 
 class STTProcessor:
     def __init__(self):
@@ -41,18 +43,21 @@ class STTProcessor:
             str: The transcribed text from the audio data.
         """
         try:
-            buffer = BytesIO()
-            wavfile.write(buffer, sample_rate, audio_data)
-            buffer.seek(0)
-            
-            segments, info = self.model.transcribe(
-                buffer, 
-                beam_size=self.beam_size,
-                language="en",
-                vad_filter=True,
-                vad_parameters=self.vad_parameters
-            )
-            text = " ".join([seg.text for seg in segments]).strip()
+            with tracer.start_as_current_span("stt.process_audio") as span:
+                span.set_attribute("stt.audio_ms", len(audio_data) * 1000 / sample_rate)
+                buffer = BytesIO()
+                wavfile.write(buffer, sample_rate, audio_data)
+                buffer.seek(0)
+
+                segments, info = self.model.transcribe(
+                    buffer,
+                    beam_size=self.beam_size,
+                    language="en",
+                    vad_filter=True,
+                    vad_parameters=self.vad_parameters
+                )
+                text = " ".join([seg.text for seg in segments]).strip()
+                span.set_attribute("stt.chars", len(text))
             return text
         except Exception as e:
             logger.error(f"Error when process audio: {e}")
@@ -69,10 +74,14 @@ class STTProcessor:
                 break
             time.sleep(0.1)
         
-    def run(self):
+    def run(self, on_partial=None):
         """
         Run the audio recording and processing loop to capture and transcribe speech.
 
+        Args:
+            on_partial (Callable[[str], None], optional): Called with the transcript so far whenever it grows,
+                                                          e.g. to start speculative retrieval. Defaults to None.
+
         Returns:
             str: The final transcribed text from the recorded audio.
         """
@@ -109,6 +118,8 @@ class STTProcessor:
                         if text:
                             self.full_transcript += text + " "
                             print(text, end=" ", flush=True)
+                            if on_partial:
+                                on_partial(self.full_transcript.strip())
                         audio_data = audio_data[chunk_samples:]
                         
                     if len(audio_data) > 0:
@@ -116,6 +127,8 @@ class STTProcessor:
                         if text:
                             self.full_transcript += text + " "
                             print(text, end=" ", flush=True)
+                            if on_partial:
+                                on_partial(self.full_transcript.strip())
                 
         except Exception as e:
             logger.error(f"Error when initialize micro: {e}")
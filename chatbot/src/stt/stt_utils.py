@@ -1,13 +1,15 @@
 import queue
 
-from src.utils.log_config import setup_logging
+from src.utils.log_config import RateLimitedLogger, setup_logging
 
 audio_queue = queue.Queue()
 logger = setup_logging()
+# Runs on the PortAudio thread, so status messages are rate limited.
+callback_logger = RateLimitedLogger(logger)
 
 def audio_callback(indata, frames, time, status):
     if status:
-        logger.info(f"Status of audio: {status}")
+        callback_logger.info(f"Status of audio: {status}")
     audio_queue.put(indata.copy())
     
 
@@ -1,5 +1,6 @@
-from dataclasses import dataclass
-from typing import List, Tuple
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
 
 import torch
 import torchaudio
@@ -9,6 +10,11 @@ from moshi.models import loaders
 from tokenizers.processors import TemplateProcessing
 from transformers import AutoTokenizer
 from src.tts.csm.watermarking import CSM_1B_GH_WATERMARK, load_watermarker, watermark
+from src.tts.shape_buckets import DEFAULT_PREFILL_BUCKETS, bucket_length, compile_monitor, prefill_mask
+from src.utils.tracing import frame_spans_enabled, get_tracer
+from src.utils.startup import startup_profile
+
+tracer = get_tracer(__name__)
 
 
 @dataclass
@@ -17,6 +23,9 @@ class Segment:
     text: str
     # (num_samples,), sample_rate = 24_000
     audio: torch.Tensor
+    # (seq_len, 33), (seq_len, 33) filled in by Generator.tokenize_segment, so a segment is only encoded once
+    tokens: Optional[torch.Tensor] = field(default=None, repr=False, compare=False)
+    tokens_mask: Optional[torch.Tensor] = field(default=None, repr=False, compare=False)
 
 
 def load_llama3_tokenizer():
@@ -40,23 +49,70 @@ class Generator:
     def __init__(
         self,
         model: Model,
+        prefill_buckets: Optional[List[int]] = None,
+        num_codebooks: Optional[int] = None,
     ):
         self._model = model
+        self.prefill_buckets = sorted(prefill_buckets or DEFAULT_PREFILL_BUCKETS)
+        if num_codebooks is not None:
+            self._model.set_num_codebooks(num_codebooks)
         self._model.setup_caches(1)
 
-        self._text_tokenizer = load_llama3_tokenizer()
+        with startup_profile.measure("tts.llama_tokenizer"):
+            self._text_tokenizer = load_llama3_tokenizer()
 
         device = next(model.parameters()).device
-        mimi_weight = hf_hub_download(loaders.DEFAULT_REPO, loaders.MIMI_NAME)
-        mimi = loaders.get_mimi(mimi_weight, device=device)
-        mimi.set_num_codebooks(32)
+        with startup_profile.measure("tts.mimi"):
+            mimi_weight = hf_hub_download(loaders.DEFAULT_REPO, loaders.MIMI_NAME)
+            mimi = loaders.get_mimi(mimi_weight, device=device)
+            mimi.set_num_codebooks(32)
         self._audio_tokenizer = mimi
 
-        self._watermarker = load_watermarker(device=device)
+        with startup_profile.measure("tts.watermarker"):
+            self._watermarker = load_watermarker(device=device)
 
         self.sample_rate = mimi.sample_rate
         self.device = device
 
+    @property
+    def model(self) -> Model:
+        return self._model
+
+    @property
+    def num_codebooks(self) -> int:
+        return self._model.num_codebooks
+
+    def set_num_codebooks(self, num_codebooks: int):
+        """
+        Switch how many codebooks are generated per frame. Context segments keep all 32 codebooks;
+        Mimi decodes the generated frames from the first num_codebooks levels of its quantizer.
+        Do not call while a TTSScheduler owns the caches.
+        """
+        self._model.set_num_codebooks(num_codebooks)
+        self._model.setup_caches(1)
+
+    def codec_roundtrip(self, audio: torch.Tensor, num_codebooks: int) -> torch.Tensor:
+        """
+        Encode audio with Mimi and decode it from its first num_codebooks codebooks, which bounds
+        the fidelity a reduced-codebook mode can reach.
+
+        Args:
+            audio: (num_samples,) audio at the generator's sample rate
+
+        Returns:
+            (num_samples,) audio
+        """
+        codes = self._audio_tokenizer.encode(audio.to(self.device).unsqueeze(0).unsqueeze(0))
+        return self._audio_tokenizer.decode(codes[:, :num_codebooks]).squeeze(0).squeeze(0)
+
+    def warmup(self, temperature: float = 0.9, topk: int = 50):
+        """
+        Compile every prefill bucket and the decode step now, not on the first sentences of a conversation.
+        """
+        with startup_profile.measure("tts.compile_warmup"), torch.inference_mode():
+            self._model.warmup_steps(1, self.prefill_buckets, temperature, topk)
+        compile_monitor.mark_warm()
+
     def _tokenize_text_segment(self, text: str, speaker: int) -> Tuple[torch.Tensor, torch.Tensor]:
         frame_tokens = []
         frame_masks = []
@@ -105,6 +161,37 @@ class Generator:
 
         return torch.cat([text_tokens, audio_tokens], dim=0), torch.cat([text_masks, audio_masks], dim=0)
 
+    def tokenize_segment(self, segment: Segment) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Tokenize a context segment once and keep the tokens on it, so voice prompts and past turns
+        are not run through Mimi again for every sentence.
+
+        Returns:
+            (seq_len, 33), (seq_len, 33)
+        """
+        if segment.tokens is None:
+            tokens, tokens_mask = self._tokenize_segment(segment)
+            segment.tokens_mask = tokens_mask.bool()
+            segment.tokens = tokens.long()
+        return segment.tokens, segment.tokens_mask
+
+    def tokenize_prompt(self, text: str, speaker: int, context: List[Segment]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns:
+            (seq_len, 33), (seq_len, 33) context segments followed by the text to generate
+        """
+        tokens, tokens_mask = [], []
+        for segment in context:
+            segment_tokens, segment_tokens_mask = self.tokenize_segment(segment)
+            tokens.append(segment_tokens)
+            tokens_mask.append(segment_tokens_mask)
+
+        gen_segment_tokens, gen_segment_tokens_mask = self._tokenize_text_segment(text, speaker)
+        tokens.append(gen_segment_tokens)
+        tokens_mask.append(gen_segment_tokens_mask)
+
+        return torch.cat(tokens, dim=0).long().to(self.device), torch.cat(tokens_mask, dim=0).bool().to(self.device)
+
     @torch.inference_mode()
     def generate(
         self,
@@ -114,57 +201,95 @@ class Generator:
         max_audio_length_ms: float = 90_000,
         temperature: float = 0.9,
         topk: int = 50,
-        skip_watermark: bool = False
+        skip_watermark: bool = False,
+        should_stop: Optional[Callable[[], bool]] = None,
     ) -> torch.Tensor:
         self._model.reset_caches()
 
         max_generation_len = int(max_audio_length_ms / 80)
-        tokens, tokens_mask = [], []
-        for segment in context:
-            segment_tokens, segment_tokens_mask = self._tokenize_segment(segment)
-            tokens.append(segment_tokens)
-            tokens_mask.append(segment_tokens_mask)
-
-        gen_segment_tokens, gen_segment_tokens_mask = self._tokenize_text_segment(text, speaker)
-        tokens.append(gen_segment_tokens)
-        tokens_mask.append(gen_segment_tokens_mask)
-
-        prompt_tokens = torch.cat(tokens, dim=0).long().to(self.device)
-        prompt_tokens_mask = torch.cat(tokens_mask, dim=0).bool().to(self.device)
-
-        samples = []
-        curr_tokens = prompt_tokens.unsqueeze(0)
-        curr_tokens_mask = prompt_tokens_mask.unsqueeze(0)
-        curr_pos = torch.arange(0, prompt_tokens.size(0)).unsqueeze(0).long().to(self.device)
+        prompt_tokens, prompt_tokens_mask = self.tokenize_prompt(text, speaker, context)
 
         max_seq_len = 2048
         max_context_len = max_seq_len - max_generation_len
-        if curr_tokens.size(1) >= max_context_len:
+        if prompt_tokens.size(0) >= max_context_len:
             raise ValueError(
                 f"Inputs too long, must be below max_seq_len - max_generation_len: {max_context_len}"
             )
 
-        for _ in range(max_generation_len):
-            sample = self._model.generate_frame(
-                curr_tokens, 
-                curr_tokens_mask, 
-                curr_pos, 
-                temperature, 
-                topk
-            )
+        # Left-pad the prompt to a bucket so the compiled prefill sees a few fixed shapes.
+        # Padding rows are masked out of attention and real rows keep their RoPE positions.
+        n = prompt_tokens.size(0)
+        cache_len = self._model.backbone_causal_mask.size(0)
+        length = bucket_length(n, self.prefill_buckets, limit=cache_len - max_generation_len)
+        pad = length - n
+        curr_tokens = torch.zeros(1, length, prompt_tokens.size(1), dtype=torch.long, device=self.device)
+        curr_tokens_mask = torch.zeros(1, length, prompt_tokens.size(1), dtype=torch.bool, device=self.device)
+        curr_pos = torch.zeros(1, length, dtype=torch.long, device=self.device)
+        curr_tokens[0, pad:] = prompt_tokens
+        curr_tokens_mask[0, pad:] = prompt_tokens_mask
+        curr_pos[0, pad:] = torch.arange(n, device=self.device)
+        curr_mask = prefill_mask(length, pad, cache_len, self.device)
+        step_mask = curr_mask[:, -1:].clone()
+        cache_pos = length
+
+        samples = []
+        frame_spans = frame_spans_enabled()
+        for i in range(max_generation_len):
+            if should_stop is not None and should_stop():
+                break
+
+            # The first frame runs the prefill over the whole prompt.
+            # torch.all below syncs with the device, so the span covers the frame's compute.
+            if i == 0:
+                span = tracer.start_span("tts.prefill", attributes={"tts.prompt_len": n, "tts.bucket": length})
+            elif frame_spans:
+                span = tracer.start_span("tts.decode_frame", attributes={"tts.frame": i})
+            else:
+                span = None
+
+            if i == 0:
+                sample = self._model.prefill(
+                    curr_tokens, curr_tokens_mask, curr_pos, temperature, topk, mask=curr_mask
+                )
+            else:
+                # The previous frame is written at cache_pos, so it joins what the next frame attends to.
+                step_mask[0, 0, cache_pos] = True
+                cache_pos += 1
+                sample = self._model.decode_step(
+                    curr_tokens, curr_tokens_mask, curr_pos, temperature, topk, mask=step_mask
+                )
             
-            if torch.all(sample == 0):
+            eos = bool(torch.all(sample == 0))
+            if span is not None:
+                span.end()
+            if eos:
                 break  # eos
 
             samples.append(sample)
 
-            curr_tokens = torch.cat([sample, torch.zeros(1, 1).long().to(self.device)], dim=1).unsqueeze(1)
-            curr_tokens_mask = torch.cat(
-                [torch.ones_like(sample).bool(), torch.zeros(1, 1).bool().to(self.device)], dim=1
-            ).unsqueeze(1)
+            # Codebooks past num_codebooks (and the text column) stay masked out of the next frame's input.
+            curr_tokens = torch.zeros(1, 1, prompt_tokens.size(1), dtype=torch.long, device=self.device)
+            curr_tokens_mask = torch.zeros(1, 1, prompt_tokens.size(1), dtype=torch.bool, device=self.device)
+            curr_tokens[0, 0, :sample.size(1)] = sample[0]
+            curr_tokens_mask[0, 0, :sample.size(1)] = True
             curr_pos = curr_pos[:, -1:] + 1
 
-        audio = self._audio_tokenizer.decode(torch.stack(samples).permute(1, 2, 0)).squeeze(0).squeeze(0)
+        compile_monitor.check("in Generator.generate")
+        return self.decode_frames(samples, skip_watermark=skip_watermark)
+
+    def decode_frames(self, samples: List[torch.Tensor], skip_watermark: bool = False) -> torch.Tensor:
+        """
+        Args:
+            samples: list of (1, num_codebooks) frames
+
+        Returns:
+            (num_samples,) audio, empty if there are no frames
+        """
+        if not samples:
+            return torch.zeros(0, device=self.device)
+
+        with tracer.start_as_current_span("tts.mimi_decode", attributes={"tts.frames": len(samples)}):
+            audio = self._audio_tokenizer.decode(torch.stack(samples).permute(1, 2, 0)).squeeze(0).squeeze(0)
 
         # This applies an imperceptible watermark to identify audio as AI-generated.
         # Watermarking ensures transparency, dissuades misuse, and enables traceability.
@@ -178,10 +303,33 @@ class Generator:
         return audio
 
 
-def load_csm_1b(device: str = "cuda") -> Generator:
-    model = Model.from_pretrained("sesame/csm-1b")
-    model = torch.compile(model, backend="inductor")
-    model.to(device=device, dtype=torch.bfloat16)
-
-    generator = Generator(model)
+def load_csm_1b(
+    device: str = "cuda",
+    compile: bool = True,
+    compile_cache_dir: Optional[str] = None,
+    prefill_buckets: Optional[List[int]] = None,
+    num_codebooks: Optional[int] = None,
+) -> Generator:
+    """
+    Args:
+        device: device to run the model on
+        compile: compile the prefill and decode steps with torch.compile
+        compile_cache_dir: persistent inductor cache, so compiled graphs survive restarts
+        prefill_buckets: prompt lengths prefills are padded to, defaults to DEFAULT_PREFILL_BUCKETS
+        num_codebooks: codebooks generated per frame, defaults to all 32
+    """
+    if compile_cache_dir:
+        os.makedirs(compile_cache_dir, exist_ok=True)
+        os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", os.path.abspath(compile_cache_dir))
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+
+    with startup_profile.measure("tts.csm_weights"):
+        model = Model.from_pretrained("sesame/csm-1b")
+    with startup_profile.measure("tts.to_device"):
+        model.to(device=device, dtype=torch.bfloat16)
+        if compile:
+            model.compile_steps(backend="inductor")
+
+    generator = Generator(model, prefill_buckets=prefill_buckets, num_codebooks=num_codebooks)
     return generator
\ No newline at end of file
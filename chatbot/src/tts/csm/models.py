@@ -1,10 +1,12 @@
 from dataclasses import dataclass
+from typing import List, Optional
 
 import torch
 import torch.nn as nn
 import torchtune
 from huggingface_hub import PyTorchModelHubMixin
 from torchtune.models import llama3_2
+from torchtune.modules import KVCache
 
 
 def llama3_2_1B() -> torchtune.modules.transformer.TransformerDecoder:
@@ -116,18 +118,34 @@ class Model(
         self.projection = nn.Linear(backbone_dim, decoder_dim, bias=False)
         self.codebook0_head = nn.Linear(backbone_dim, config.audio_vocab_size, bias=False)
         self.audio_head = nn.Parameter(torch.empty(config.audio_num_codebooks - 1, decoder_dim, config.audio_vocab_size))
+        self.compiled = False
+        # Codebooks generated per frame; fewer skips decoder passes at some cost in fidelity.
+        self.num_codebooks = config.audio_num_codebooks
 
-    def setup_caches(self, max_batch_size: int) -> torch.Tensor:
-        """Setup KV caches and return a causal mask."""
+    def set_num_codebooks(self, num_codebooks: int):
+        """Generate only the first num_codebooks codebooks of every frame. Call setup_caches afterwards,
+        which sizes the decoder cache and mask to match."""
+        if not 1 <= num_codebooks <= self.config.audio_num_codebooks:
+            raise ValueError(f"num_codebooks must be between 1 and {self.config.audio_num_codebooks}: {num_codebooks}")
+        self.num_codebooks = num_codebooks
+
+    def setup_caches(self, max_batch_size: int, max_cache_len: Optional[int] = None) -> torch.Tensor:
+        """Setup KV caches and return a causal mask.
+
+        Args:
+            max_batch_size: number of sequences decoded together
+            max_cache_len: backbone KV-cache length, defaults to the backbone max_seq_len
+        """
         dtype = next(self.parameters()).dtype
         device = next(self.parameters()).device
+        cache_len = max_cache_len or self.backbone.max_seq_len
 
         with device:
-            self.backbone.setup_caches(max_batch_size, dtype)
-            self.decoder.setup_caches(max_batch_size, dtype, decoder_max_seq_len=self.config.audio_num_codebooks)
+            self.backbone.setup_caches(max_batch_size, dtype, decoder_max_seq_len=cache_len)
+            self.decoder.setup_caches(max_batch_size, dtype, decoder_max_seq_len=self.num_codebooks)
 
-        self.register_buffer("backbone_causal_mask", _create_causal_mask(self.backbone.max_seq_len, device))
-        self.register_buffer("decoder_causal_mask", _create_causal_mask(self.config.audio_num_codebooks, device))
+        self.register_buffer("backbone_causal_mask", _create_causal_mask(cache_len, device))
+        self.register_buffer("decoder_causal_mask", _create_causal_mask(self.num_codebooks, device))
 
     def generate_frame(
         self,
@@ -136,22 +154,27 @@ class Model(
         input_pos: torch.Tensor,
         temperature: float,
         topk: int,
+        mask: Optional[torch.Tensor] = None,
     ) -> torch.Tensor:
         """
         Args:
             tokens: (batch_size, seq_len, audio_num_codebooks+1)
             tokens_mask: (batch_size, seq_len, audio_num_codebooks+1)
             input_pos: (batch_size, seq_len) positions for each token
-            mask: (batch_size, seq_len, max_seq_len
+            mask: (batch_size, seq_len, max_cache_len) backbone attention mask over the KV-cache,
+                defaults to the causal mask indexed by input_pos
 
         Returns:
-            (batch_size, audio_num_codebooks) sampled tokens
+            (batch_size, num_codebooks) sampled tokens
         """
         dtype = next(self.parameters()).dtype
         b, s, _ = tokens.size()
 
         assert self.backbone.caches_are_enabled(), "backbone caches are not enabled"
-        curr_backbone_mask = _index_causal_mask(self.backbone_causal_mask, input_pos)
+        if mask is None:
+            curr_backbone_mask = _index_causal_mask(self.backbone_causal_mask, input_pos)
+        else:
+            curr_backbone_mask = mask
         embeds = self._embed_tokens(tokens)
         masked_embeds = embeds * tokens_mask.unsqueeze(-1)
         h = masked_embeds.sum(dim=2)
@@ -168,7 +191,7 @@ class Model(
 
         # Decoder caches must be reset every frame.
         self.decoder.reset_caches()
-        for i in range(1, self.config.audio_num_codebooks):
+        for i in range(1, self.num_codebooks):
             curr_decoder_mask = _index_causal_mask(self.decoder_causal_mask, curr_pos)
             decoder_h = self.decoder(self.projection(curr_h), input_pos=curr_pos, mask=curr_decoder_mask).to(
                 dtype=dtype
@@ -183,10 +206,93 @@ class Model(
 
         return curr_sample
 
+    def prefill(
+        self,
+        tokens: torch.Tensor,
+        tokens_mask: torch.Tensor,
+        input_pos: torch.Tensor,
+        temperature: float,
+        topk: int,
+        mask: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """generate_frame over a (bucketed) prompt. A separate entry point, so torch.compile keeps
+        the prefill graphs apart from the decode step graph."""
+        return self.generate_frame(tokens, tokens_mask, input_pos, temperature, topk, mask=mask)
+
+    def decode_step(
+        self,
+        tokens: torch.Tensor,
+        tokens_mask: torch.Tensor,
+        input_pos: torch.Tensor,
+        temperature: float,
+        topk: int,
+        mask: Optional[torch.Tensor] = None,
+    ) -> torch.Tensor:
+        """generate_frame over the previous frame only, seq_len 1."""
+        return self.generate_frame(tokens, tokens_mask, input_pos, temperature, topk, mask=mask)
+
+    def compile_steps(self, backend: str = "inductor"):
+        """Compile prefill and decode_step separately with static shapes.
+
+        Every prefill bucket and batch size gets its own graph, so the per-function cache limit is raised
+        to keep dynamo from falling back to eager once the buckets are compiled.
+        """
+        import torch._dynamo
+
+        torch._dynamo.config.cache_size_limit = max(torch._dynamo.config.cache_size_limit, 64)
+        self.prefill = torch.compile(self.prefill, backend=backend, dynamic=False)
+        self.decode_step = torch.compile(self.decode_step, backend=backend, dynamic=False)
+        self.compiled = True
+
+    def warmup_steps(self, batch_size: int, buckets: List[int], temperature: float, topk: int):
+        """Compile the graph of every prefill bucket and of the decode step for the current caches.
+
+        Args:
+            batch_size: batch size the caches were set up with
+            buckets: prefill lengths to compile
+            temperature, topk: sampling settings of the real requests, which the graphs specialize on
+        """
+        if not self.compiled:
+            return
+        device = next(self.parameters()).device
+        cache_len = self.backbone_causal_mask.size(0)
+        width = self.config.audio_num_codebooks + 1
+        for length in buckets:
+            if length >= cache_len:
+                continue
+            self.reset_caches()
+            tokens = torch.zeros(batch_size, length, width, dtype=torch.long, device=device)
+            tokens_mask = torch.zeros(batch_size, length, width, dtype=torch.bool, device=device)
+            input_pos = torch.arange(length, device=device).unsqueeze(0).repeat(batch_size, 1)
+            mask = torch.zeros(batch_size, length, cache_len, dtype=torch.bool, device=device)
+            mask[:, :, :length] = torch.tril(torch.ones(length, length, dtype=torch.bool, device=device))
+            self.prefill(tokens, tokens_mask, input_pos, temperature, topk, mask=mask)
+
+            step_mask = torch.zeros(batch_size, 1, cache_len, dtype=torch.bool, device=device)
+            step_mask[:, :, :length + 1] = True
+            self.decode_step(
+                tokens[:, -1:].clone(), tokens_mask[:, -1:].clone(), input_pos[:, -1:] + 1, temperature, topk, mask=step_mask
+            )
+        self.reset_caches()
+
     def reset_caches(self):
         self.backbone.reset_caches()
         self.decoder.reset_caches()
 
+    def compact_caches(self, order: torch.Tensor, length: int):
+        """Reorder the backbone KV-cache entries of every batch row and continue writing at `length`.
+
+        Args:
+            order: (batch_size, max_cache_len) cache indices to gather, entries to keep first
+            length: cache position the next tokens are written to
+        """
+        for module in self.backbone.modules():
+            if isinstance(module, KVCache):
+                index = order[:, None, :, None].expand_as(module.k_cache)
+                module.k_cache.copy_(torch.gather(module.k_cache, 2, index))
+                module.v_cache.copy_(torch.gather(module.v_cache, 2, index))
+                module.cache_pos.copy_(torch.arange(module.cache_pos.numel(), device=order.device) + length)
+
     def _embed_audio(self, codebook: int, tokens: torch.Tensor) -> torch.Tensor:
         return self.audio_embeddings(tokens + codebook * self.config.audio_vocab_size)
 
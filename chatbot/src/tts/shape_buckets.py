@@ -0,0 +1,94 @@
+import threading
+
+import torch
+
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+DEFAULT_PREFILL_BUCKETS = [128, 256, 384, 512, 768, 1024, 1536, 2048]
+
+
+def bucket_length(length, buckets, limit=None):
+    """
+    Round a prefill length up to the smallest bucket, so torch.compile sees a handful of shapes
+    instead of one per prompt.
+
+    Args:
+        length (int): Rows of the prompt.
+        buckets (List[int]): Bucket lengths, ascending.
+        limit (int, optional): Longest padded length that still fits the KV-cache. Defaults to None.
+
+    Returns:
+        int: The bucket, or length itself if no bucket fits.
+    """
+    for bucket in buckets:
+        if bucket >= length:
+            return bucket if limit is None or bucket <= limit else length
+    return length
+
+
+def prefill_mask(length, pad, cache_len, device):
+    """
+    Attention mask of a left-padded prefill written at the start of an empty KV-cache.
+
+    Args:
+        length (int): Padded length of the prefill.
+        pad (int): Padding rows in front of the prompt.
+        cache_len (int): Length of the KV-cache.
+        device (torch.device): Device of the mask.
+
+    Returns:
+        torch.Tensor: (1, length, cache_len) mask; prompt rows attend causally to prompt rows only.
+    """
+    real = torch.arange(length, device=device) >= pad
+    causal = torch.tril(torch.ones(length, length, dtype=torch.bool, device=device))
+    # Padding rows attend to themselves only so their attention is never empty.
+    own = (causal & real[None, :]) | torch.eye(length, dtype=torch.bool, device=device)
+    mask = torch.zeros(1, length, cache_len, dtype=torch.bool, device=device)
+    mask[0, :, :length] = own
+    return mask
+
+
+class CompileMonitor:
+    def __init__(self):
+        """
+        Count the graphs torch.compile builds after warmup. Every one of them is a recompile that
+        stalled a live request, so they are logged and exposed in the TTS stats.
+        """
+        self.baseline = None
+        self.recompiles = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def compiled_graphs():
+        from torch._dynamo.utils import counters
+
+        return counters["stats"]["unique_graphs"]
+
+    def mark_warm(self):
+        with self.lock:
+            self.baseline = self.compiled_graphs()
+            self.recompiles = 0
+
+    def check(self, where=""):
+        """
+        Log the graphs compiled since the last check, once warmup is done.
+
+        Args:
+            where (str, optional): Caller, for the log line.
+
+        Returns:
+            int: Recompiles since warmup.
+        """
+        with self.lock:
+            if self.baseline is None:
+                return 0
+            recompiles = self.compiled_graphs() - self.baseline
+            if recompiles > self.recompiles:
+                logger.warning(f"torch.compile recompiled {recompiles - self.recompiles} graph(s) after warmup {where}".rstrip())
+                self.recompiles = recompiles
+            return self.recompiles
+
+
+compile_monitor = CompileMonitor()
@@ -1,15 +1,23 @@
 from src.tts.csm.generator import load_csm_1b, Segment
+from src.tts.tts_scheduler import TTSScheduler
+from src.tts.voice_context import VoiceContext
+from src.utils.tracing import get_tracer
+from src.utils.load_config import load_config
+from src.utils.startup import startup_profile
 import torchaudio
 import torch
 import re
 
+tracer = get_tracer(__name__)
+
 class TTSProcessor:
-    def __init__(self, device=None):
+    def __init__(self, device=None, generator=None):
         """
         Initialize model and decide which device to use.
         
         Args:
             device (str): Device to run model (CPU, CUDA, MPS).
+            generator (Generator): Already loaded CSM generator, e.g. a small random-weight one for benchmarks (optional).
         """
         if device is None:
             if torch.backends.mps.is_available():
@@ -21,8 +29,46 @@ class TTSProcessor:
         else:
             self.device = device
 
-        self.generator = load_csm_1b(device=self.device)
-    
+        tts_config = load_config("config.yaml").get("tts", {})
+        self.generator = generator or load_csm_1b(
+            device=self.device,
+            compile=tts_config.get("compile", True),
+            compile_cache_dir=tts_config.get("compile_cache_dir"),
+            prefill_buckets=tts_config.get("prefill_buckets"),
+            num_codebooks=tts_config.get("num_codebooks")
+        )
+        self.compile_warmup = tts_config.get("compile_warmup", True)
+        self.scheduler = None
+
+    def warmup(self):
+        """
+        Compile the prefill buckets and the decode step at startup, so the first sentences
+        of a conversation do not pay for it. With batching, the scheduler warms up instead.
+        """
+        if self.compile_warmup and self.scheduler is None:
+            self.generator.warmup()
+
+    def enable_batching(self, max_batch_size=4, max_cache_len=4096, stats_interval_s=30, decode_workers=1):
+        """
+        Route generate_audio through a continuous batching scheduler so concurrent callers share decode steps.
+
+        Args:
+            max_batch_size (int, optional): Number of sentences decoded together. Defaults to 4.
+            max_cache_len (int, optional): Length of the shared KV-cache timeline. Defaults to 4096.
+            stats_interval_s (int, optional): Seconds between throughput log lines. Defaults to 30.
+            decode_workers (int, optional): Threads decoding finished sentences with Mimi. Defaults to 1.
+        """
+        self.scheduler = TTSScheduler(
+            self.generator,
+            max_batch_size=max_batch_size,
+            max_cache_len=max_cache_len,
+            stats_interval_s=stats_interval_s,
+            warmup=self.compile_warmup,
+            decode_workers=decode_workers
+        )
+        with startup_profile.measure("tts.scheduler_warmup"):
+            self.scheduler.start()
+
     def estimate_audio_length_ms(self, text: str, ms_per_word: int = 450):
         """
         Estimate the audio length in milliseconds based on the length of text.
@@ -70,31 +116,59 @@ class TTSProcessor:
         
         return sentences
 
-    def generate_audio(self, text, speaker, context=None):
+    def generate_audio(self, text, speaker, context=None, should_stop=None):
         """
         Generate audio from text.
 
         Args:
             text (str): The input text to be converted into speech.
             speaker (int): ID of the speaker.
-            context (list): List of Segment objects providing conversational context (optional).
+            context (list | VoiceContext): Segment objects or a rolling VoiceContext providing conversational context (optional).
+            should_stop (Callable[[], bool]): Checked before every frame; generation stops once it returns True (optional).
 
         Returns:
             torch.Tensor: The generated audio waveform.
         """
         
+        with tracer.start_as_current_span("tts.generate_audio") as span:
+            span.set_attribute("tts.chars", len(text))
+            return self._generate_audio(text, speaker, context, should_stop)
+
+    def _generate_audio(self, text, speaker, context, should_stop):
         audio_length_ms = self.estimate_audio_length_ms(text=text)
         sentences = self.preprocess_text(text)
+        if isinstance(context, VoiceContext):
+            context = self.fit_context(context, speaker, sentences, audio_length_ms)
         
+        if self.scheduler is not None:
+            futures = [
+                self.scheduler.submit(
+                    text=sentence,
+                    speaker=speaker,
+                    context=context or [],
+                    max_audio_length_ms=audio_length_ms,
+                    skip_watermark=True,
+                    should_stop=should_stop
+                )
+                for sentence in sentences
+            ]
+            audio_segments = [future.result() for future in futures]
+            if audio_segments:
+                return torch.cat(audio_segments, dim=-1)
+            return torch.tensor([])
+
         audio_segments = []
         for sentence in sentences:
+            if should_stop is not None and should_stop():
+                break
             with torch.inference_mode():
                 audio = self.generator.generate(
                     text=sentence,
                     speaker=speaker,
                     context=context or [],
                     max_audio_length_ms=audio_length_ms,
-                    skip_watermark=True
+                    skip_watermark=True,
+                    should_stop=should_stop
                 )
             audio_segments.append(audio)
         
@@ -102,6 +176,25 @@ class TTSProcessor:
             return torch.cat(audio_segments, dim=-1)
         return torch.tensor([])
 
+    def fit_context(self, voice_context, speaker, sentences, audio_length_ms):
+        """
+        Take the newest turns of a rolling context that leave room in the backbone for the sentences to generate.
+
+        Args:
+            voice_context (VoiceContext): Rolling context of the conversation.
+            speaker (int): ID of the speaker.
+            sentences (list[str]): Sentences about to be generated.
+            audio_length_ms (int): Upper bound on the audio of each sentence.
+
+        Returns:
+            list: Segment objects fitting the backbone together with any of the sentences.
+        """
+        if not sentences:
+            return []
+        # Every text token covers at least one character, plus the begin and end of text tokens.
+        text_len = max(len(f"[{speaker}]{sentence}") for sentence in sentences) + 2
+        return voice_context.segments(reserve=text_len + int(audio_length_ms / 80))
+
     def save_audio(self, file_path, audio, sample_rate):
         """
         Save audio to a WAV file.
@@ -149,7 +242,20 @@ class TTSProcessor:
         ]
         return segments
 
+    def load_voice_prompts(self, voice_prompts, speaker):
+        """
+        Create the segments conditioning the bot's voice from the "tts.voice_prompts" config.
 
+        Args:
+            voice_prompts (list): List of {"text": ..., "audio": ...} entries.
+            speaker (int): ID of the speaker.
 
-
-
+        Returns:
+            list: List of Segment objects.
+        """
+        with startup_profile.measure("tts.voice_prompts"):
+            return self.create_segments(
+                [prompt["text"] for prompt in voice_prompts],
+                [speaker] * len(voice_prompts),
+                [prompt["audio"] for prompt in voice_prompts]
+            )
@@ -0,0 +1,419 @@
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import numpy as np
+import torch
+from opentelemetry import trace
+
+from src.tts.shape_buckets import bucket_length, compile_monitor
+from src.utils.log_config import setup_logging
+from src.utils.tracing import frame_spans_enabled, get_tracer
+
+logger = setup_logging()
+tracer = get_tracer(__name__)
+
+
+@dataclass(eq=False)
+class TTSRequest:
+    tokens: torch.Tensor
+    tokens_mask: torch.Tensor
+    max_frames: int
+    skip_watermark: bool
+    should_stop: Optional[Callable[[], bool]]
+    future: Future
+    submitted_at: float
+    span: trace.Span
+    admitted_at: float = 0.0
+    position: int = 0
+    frames: List[torch.Tensor] = field(default_factory=list)
+
+
+class TTSScheduler:
+    def __init__(
+        self, generator, max_batch_size=4, max_cache_len=4096, temperature=0.9, topk=50, stats_interval_s=30, warmup=False,
+        decode_workers=1
+    ):
+        """
+        Continuous batching for CSM: one decode loop runs a batch of slots and admits and retires
+        requests from any session at frame granularity.
+
+        The backbone KV-cache is written along one timeline shared by all slots. Every slot keeps
+        its own RoPE positions and a mask of the cache entries that belong to it, so a new request
+        is prefilled in the same step in which the running slots decode their next frame. When the
+        timeline runs out, each slot's entries are compacted to the front of the cache. Prefill steps are
+        padded to the generator's prefill buckets, so a compiled model only ever sees a few step shapes.
+        Finished requests are decoded by Mimi on separate threads, so the other slots keep stepping meanwhile.
+
+        The scheduler owns the model's KV-caches: once started, do not call Generator.generate.
+
+        Args:
+            generator (Generator): Loaded CSM generator.
+            max_batch_size (int, optional): Number of slots decoded together. Defaults to 4.
+            max_cache_len (int, optional): Length of the shared cache timeline. Defaults to 4096.
+            temperature (float, optional): Sampling temperature. Defaults to 0.9.
+            topk (int, optional): Top-k sampling. Defaults to 50.
+            stats_interval_s (int, optional): Seconds between throughput log lines. Defaults to 30.
+            warmup (bool, optional): Compile every prefill bucket at batch size max_batch_size before
+                                     serving; start() waits for it. Defaults to False.
+            decode_workers (int, optional): Threads decoding finished requests to audio. Defaults to 1.
+        """
+        self.generator = generator
+        self.model = generator.model
+        self.device = generator.device
+        self.max_batch_size = max_batch_size
+        self.max_seq_len = self.model.backbone.max_seq_len
+        self.max_cache_len = max(max_cache_len, self.max_seq_len)
+        self.temperature = temperature
+        self.topk = topk
+        self.stats_interval_s = stats_interval_s
+        self.frame_spans = frame_spans_enabled()
+        self.prefill_buckets = generator.prefill_buckets
+        self.warmup = warmup
+        self.decode_workers = decode_workers
+
+        self.incoming = queue.Queue()
+        self.waiting = deque()
+        self.slots: List[Optional[TTSRequest]] = [None] * max_batch_size
+        self.timeline = 0
+        self.valid = None
+
+        self.running = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+        self.decoder = None
+        self.decoding = set()
+        self.decoding_lock = threading.Lock()
+
+        self.frames = 0
+        self.completed = 0
+        self.busy_s = 0.0
+        self.queue_delays = deque(maxlen=1000)
+        self.last_stats_at = time.perf_counter()
+
+    def submit(self, text, speaker, context, max_audio_length_ms=90_000, skip_watermark=False, should_stop=None):
+        """
+        Queue a sentence for synthesis.
+
+        Args:
+            text (str): Text to synthesize.
+            speaker (int): ID of the speaker.
+            context (list): Segment objects conditioning the voice.
+            max_audio_length_ms (float, optional): Upper bound on the generated audio. Defaults to 90_000.
+            skip_watermark (bool, optional): Skip the audio watermark. Defaults to False.
+            should_stop (Callable[[], bool], optional): Checked before every frame; the request is
+                                                        retired with the audio so far once it returns True.
+
+        Returns:
+            Future: Resolves to the generated audio waveform.
+        """
+        future = Future()
+        # Started in the caller's context so the request shows up under its turn; ended by the scheduler.
+        span = tracer.start_span("tts.request")
+        with trace.use_span(span), torch.inference_mode():
+            tokens, tokens_mask = self.generator.tokenize_prompt(text, speaker, context)
+        span.set_attribute("tts.prompt_len", tokens.size(0))
+
+        max_frames = int(max_audio_length_ms / 80)
+        max_context_len = self.max_seq_len - max_frames
+        if tokens.size(0) >= max_context_len:
+            span.end()
+            future.set_exception(ValueError(
+                f"Inputs too long, must be below max_seq_len - max_generation_len: {max_context_len}"
+            ))
+            return future
+
+        self.incoming.put(TTSRequest(
+            tokens=tokens,
+            tokens_mask=tokens_mask,
+            max_frames=max_frames,
+            skip_watermark=skip_watermark,
+            should_stop=should_stop,
+            future=future,
+            submitted_at=time.perf_counter(),
+            span=span
+        ))
+        return future
+
+    def start(self):
+        self.decoder = ThreadPoolExecutor(max_workers=self.decode_workers, thread_name_prefix="tts-decode")
+        self.running.set()
+        self.thread = threading.Thread(target=self._run, name="tts-scheduler", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        logger.info(f"TTS scheduler started with {self.max_batch_size} slots")
+
+    def stop(self):
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+        for request in list(self.waiting) + [slot for slot in self.slots if slot is not None]:
+            if not request.future.done():
+                request.future.cancel()
+        self.waiting.clear()
+        self.slots = [None] * self.max_batch_size
+        if self.decoder is not None:
+            self.decoder.shutdown(wait=False, cancel_futures=True)
+            self.decoder = None
+        with self.decoding_lock:
+            decoding = list(self.decoding)
+        for request in decoding:
+            if not request.future.done():
+                request.future.cancel()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Slot occupancy, completed requests, aggregate frames/sec while busy and queueing delay percentiles.
+        """
+        delays = list(self.queue_delays)
+        return {
+            "active": sum(slot is not None for slot in self.slots),
+            "queued": self.incoming.qsize() + len(self.waiting),
+            "decoding": len(self.decoding),
+            "completed": self.completed,
+            "frames_per_s": round(self.frames / self.busy_s, 1) if self.busy_s else 0.0,
+            "realtime_factor": round(self.frames * 0.08 / self.busy_s, 2) if self.busy_s else 0.0,
+            "queue_delay_ms_p50": round(float(np.percentile(delays, 50)) * 1000, 1) if delays else None,
+            "queue_delay_ms_p95": round(float(np.percentile(delays, 95)) * 1000, 1) if delays else None,
+            "recompiles": compile_monitor.recompiles,
+            "num_codebooks": self.model.num_codebooks,
+        }
+
+    def _run(self):
+        with torch.inference_mode():
+            try:
+                self.model.setup_caches(self.max_batch_size, self.max_cache_len)
+                if self.warmup:
+                    self._warmup()
+            finally:
+                self.ready.set()
+            self._reset()
+            while self.running.is_set():
+                try:
+                    if not any(self.slots) and not self.waiting:
+                        try:
+                            self.waiting.append(self.incoming.get(timeout=0.1))
+                        except queue.Empty:
+                            continue
+                        self._reset()
+
+                    admitted = self._admit()
+                    if not any(self.slots):
+                        continue
+
+                    start_time = time.perf_counter()
+                    self._step(admitted)
+                    self.busy_s += time.perf_counter() - start_time
+                except Exception as e:
+                    logger.error(f"Error in TTS scheduler: {e}")
+                    for index, request in enumerate(self.slots):
+                        if request is not None:
+                            self.slots[index] = None
+                            request.span.end()
+                            if not request.future.done():
+                                request.future.set_exception(e)
+                    self._reset()
+
+                if time.perf_counter() - self.last_stats_at >= self.stats_interval_s:
+                    self.last_stats_at = time.perf_counter()
+                    logger.info(f"TTS scheduler stats: {self.stats()}")
+
+    def _warmup(self):
+        start_time = time.perf_counter()
+        try:
+            self.model.warmup_steps(self.max_batch_size, self.prefill_buckets, self.temperature, self.topk)
+        except Exception as e:
+            logger.error(f"Error when warming up the TTS scheduler: {e}")
+            return
+        compile_monitor.mark_warm()
+        logger.info(
+            f"TTS scheduler compiled {len(self.prefill_buckets)} prefill buckets "
+            f"in {time.perf_counter() - start_time:.1f} seconds"
+        )
+
+    def _reset(self):
+        self.model.reset_caches()
+        self.timeline = 0
+        self.valid = torch.zeros(self.max_batch_size, self.max_cache_len, dtype=torch.bool, device=self.device)
+
+    def _compact(self):
+        """
+        Move every slot's cache entries to the front of the timeline, dropping padding and retired slots.
+        """
+        lengths = self.valid.sum(dim=1)
+        order = torch.argsort((~self.valid).to(torch.uint8), dim=1, stable=True)
+        self.timeline = int(lengths.max())
+        self.model.compact_caches(order, self.timeline)
+        self.valid = torch.arange(self.max_cache_len, device=self.device)[None, :] < lengths[:, None]
+        logger.debug(f"Compacted TTS cache timeline to {self.timeline} positions")
+
+    def _admit(self):
+        """
+        Move waiting requests into free slots while the prefill fits on the cache timeline.
+
+        Returns:
+            set: Indices of the slots admitted in this step.
+        """
+        while True:
+            try:
+                self.waiting.append(self.incoming.get_nowait())
+            except queue.Empty:
+                break
+
+        admitted = set()
+        width = 1
+        free = [index for index, slot in enumerate(self.slots) if slot is None]
+        while free and self.waiting:
+            request = self.waiting[0]
+            if request.future.cancelled() or (request.should_stop is not None and request.should_stop()):
+                self.waiting.popleft()
+                request.span.end()
+                if not request.future.done():
+                    request.future.set_result(torch.zeros(0, device=self.device))
+                continue
+
+            needed = max(width, self._bucket(request.tokens.size(0)))
+            if self.timeline + needed > self.max_cache_len:
+                self._compact()
+                if self.timeline + needed > self.max_cache_len:
+                    break
+
+            self.waiting.popleft()
+            index = free.pop(0)
+            request.admitted_at = time.perf_counter()
+            self.queue_delays.append(request.admitted_at - request.submitted_at)
+            request.span.add_event("admitted")
+            request.span.set_attribute("tts.queue_delay_ms", (request.admitted_at - request.submitted_at) * 1000)
+            self.slots[index] = request
+            self.valid[index] = False
+            admitted.add(index)
+            width = needed
+        return admitted
+
+    def _bucket(self, length):
+        return bucket_length(length, self.prefill_buckets, limit=self.max_cache_len)
+
+    def _step_mask(self, step_valid):
+        """
+        Args:
+            step_valid (torch.Tensor): (batch_size, seq_len) which positions of this step are real tokens
+
+        Returns:
+            torch.Tensor: (batch_size, seq_len, max_cache_len) attention mask over the cache
+        """
+        b, s = step_valid.shape
+        mask = torch.zeros(b, s, self.max_cache_len, dtype=torch.bool, device=self.device)
+        mask[:, :, :self.timeline] = self.valid[:, None, :self.timeline]
+        causal = torch.tril(torch.ones(s, s, dtype=torch.bool, device=self.device))
+        # Padding rows attend to themselves only so their attention is never empty.
+        own = (causal[None] & step_valid[:, None, :]) | torch.eye(s, dtype=torch.bool, device=self.device)[None]
+        mask[:, :, self.timeline:self.timeline + s] = own
+        return mask
+
+    def _step(self, admitted):
+        """
+        Run one batched frame: prefill the admitted slots and decode the next frame of the others.
+        """
+        seq_len = self._bucket(max(self.slots[index].tokens.size(0) for index in admitted)) if admitted else 1
+        if self.timeline + seq_len > self.max_cache_len:
+            self._compact()
+
+        b = self.max_batch_size
+        tokens = torch.zeros(b, seq_len, 33, dtype=torch.long, device=self.device)
+        tokens_mask = torch.zeros(b, seq_len, 33, dtype=torch.bool, device=self.device)
+        input_pos = torch.zeros(b, seq_len, dtype=torch.long, device=self.device)
+        step_valid = torch.zeros(b, seq_len, dtype=torch.bool, device=self.device)
+
+        # Real tokens are right-aligned so the last position of every slot is the one sampled from.
+        for index, request in enumerate(self.slots):
+            if request is None:
+                continue
+            if index in admitted:
+                n = request.tokens.size(0)
+                tokens[index, seq_len - n:] = request.tokens
+                tokens_mask[index, seq_len - n:] = request.tokens_mask
+                input_pos[index, seq_len - n:] = torch.arange(n, device=self.device)
+                step_valid[index, seq_len - n:] = True
+                request.position = n
+            else:
+                frame = request.frames[-1][0]
+                tokens[index, -1, :frame.size(0)] = frame
+                tokens_mask[index, -1, :frame.size(0)] = True
+                input_pos[index, -1] = request.position
+                step_valid[index, -1] = True
+                request.position += 1
+
+        span = None
+        if admitted or self.frame_spans:
+            active = [request for request in self.slots if request is not None]
+            span = tracer.start_span(
+                "tts.prefill" if admitted else "tts.decode_frame",
+                links=[trace.Link(request.span.get_span_context()) for request in active],
+                attributes={"tts.batch_size": len(active), "tts.seq_len": seq_len, "tts.admitted": len(admitted)}
+            )
+
+        mask = self._step_mask(step_valid)
+        step = self.model.prefill if admitted else self.model.decode_step
+        samples = step(tokens, tokens_mask, input_pos, self.temperature, self.topk, mask=mask)
+        self.valid[:, self.timeline:self.timeline + seq_len] = step_valid
+        self.timeline += seq_len
+
+        # tolist syncs with the device, so the span covers the step's compute.
+        eos = torch.all(samples == 0, dim=1).tolist()
+        if span is not None:
+            span.end()
+        compile_monitor.check("in TTSScheduler")
+        for index, request in enumerate(self.slots):
+            if request is None:
+                continue
+            if eos[index]:
+                self._finish(index)
+                continue
+            request.frames.append(samples[index:index + 1])
+            self.frames += 1
+            stopped = request.should_stop is not None and request.should_stop()
+            if stopped or len(request.frames) >= request.max_frames:
+                self._finish(index)
+
+    def _finish(self, index):
+        """
+        Retire a slot and hand its frames to a decode thread, which resolves the request with the audio.
+        """
+        request = self.slots[index]
+        self.slots[index] = None
+        self.valid[index] = False
+        self.completed += 1
+        request.span.set_attribute("tts.frames", len(request.frames))
+        if request.future.done():
+            request.span.end()
+            return
+        with self.decoding_lock:
+            self.decoding.add(request)
+        self.decoder.submit(self._decode, request)
+
+    def _decode(self, request):
+        """
+        Decode a finished request with Mimi, watermark it and resolve its future. Runs on a decode thread.
+        """
+        try:
+            with torch.inference_mode(), trace.use_span(request.span, end_on_exit=True):
+                audio = self.generator.decode_frames(request.frames, skip_watermark=request.skip_watermark)
+            if not request.future.done():
+                request.future.set_result(audio)
+        except Exception as e:
+            if not request.future.done():
+                request.future.set_exception(e)
+        finally:
+            with self.decoding_lock:
+                self.decoding.discard(request)
+        logger.debug(
+            f"TTS request done: {len(request.frames)} frames, "
+            f"queued {(request.admitted_at - request.submitted_at) * 1000:.0f} ms, "
+            f"total {(time.perf_counter() - request.submitted_at) * 1000:.0f} ms"
+        )
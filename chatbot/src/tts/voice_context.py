@@ -0,0 +1,151 @@
+import threading
+from collections import deque
+
+import numpy as np
+import torch
+import torchaudio
+
+from src.tts.csm.generator import Segment
+from src.utils.log_config import setup_logging
+
+logger = setup_logging()
+
+
+class VoiceContext:
+    def __init__(self, generator, prompts=None, max_context_len=1024, max_turns=8, max_segment_ms=20_000):
+        """
+        Rolling conversational context for CSM: the pinned voice prompts followed by the most recent
+        learner and bot turns, so the voice conditions on the live dialogue.
+
+        Every segment is tokenized once and its tokens are cached on it. When a prompt is built, the
+        newest turns are kept while the voice prompts and turns fit in the token budget and the oldest
+        are evicted, so the prefill length stays bounded however long the conversation runs.
+
+        Args:
+            generator (Generator): Loaded CSM generator, used to tokenize the segments.
+            prompts (list, optional): Segment objects always kept at the start of the context. Defaults to None.
+            max_context_len (int, optional): Most prompt rows (text tokens + audio frames) of context. Defaults to 1024.
+            max_turns (int, optional): Most turns kept. Defaults to 8.
+            max_segment_ms (int, optional): Longer turns are not added. Defaults to 20_000.
+        """
+        self.generator = generator
+        self.prompts = list(prompts or [])
+        self.max_context_len = max_context_len
+        self.max_segment_ms = max_segment_ms
+        self.turns = deque(maxlen=max_turns)
+        self.evicted = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, generator, prompts, context_config):
+        """
+        Args:
+            generator (Generator): Loaded CSM generator.
+            prompts (list): Voice prompt segments.
+            context_config (dict): The "tts.context" config.
+
+        Returns:
+            VoiceContext: Rolling context, or None if it is disabled.
+        """
+        if not context_config.get("enabled", False):
+            return None
+        return cls(
+            generator,
+            prompts,
+            max_context_len=context_config.get("max_context_len", 1024),
+            max_turns=context_config.get("max_turns", 8),
+            max_segment_ms=context_config.get("max_segment_ms", 20_000)
+        )
+
+    def add_turn(self, speaker, text, audio, sample_rate=None):
+        """
+        Append a turn of the dialogue. Tokenization is deferred to the next segments() call,
+        so callers on the audio path do not wait for Mimi.
+
+        Args:
+            speaker (int): ID of the speaker.
+            text (str): What was said.
+            audio (torch.Tensor | np.ndarray): Mono audio of the turn.
+            sample_rate (int, optional): Sample rate of the audio. Defaults to the generator's.
+
+        Returns:
+            bool: True if the turn was added.
+        """
+        if not text or not text.strip():
+            return False
+        if isinstance(audio, np.ndarray):
+            audio = torch.from_numpy(audio)
+        audio = audio.detach().float().flatten().cpu()
+        if sample_rate is not None and sample_rate != self.generator.sample_rate:
+            audio = torchaudio.functional.resample(audio, orig_freq=sample_rate, new_freq=self.generator.sample_rate)
+        if not audio.numel():
+            return False
+        audio_ms = audio.numel() * 1000 / self.generator.sample_rate
+        if audio_ms > self.max_segment_ms:
+            logger.debug(f"Skipping {audio_ms:.0f} ms turn of speaker {speaker}, above {self.max_segment_ms} ms")
+            return False
+
+        with self.lock:
+            if len(self.turns) == self.turns.maxlen:
+                self.evicted += 1
+            self.turns.append(Segment(speaker=speaker, text=text.strip(), audio=audio))
+        return True
+
+    def segments(self, reserve=0):
+        """
+        Build the context of the next prompt.
+
+        Args:
+            reserve (int, optional): Rows the caller needs in the backbone after the context, i.e. the text
+                                     to generate and the frames of audio to generate. Defaults to 0.
+
+        Returns:
+            list: Segment objects: the voice prompts, then the newest turns that fit, oldest first.
+        """
+        with self.lock:
+            turns = list(self.turns)
+        max_seq_len = self.generator.model.backbone.max_seq_len
+        budget = min(self.max_context_len, max_seq_len - reserve - 1)
+
+        with torch.inference_mode():
+            used = sum(self._length(segment) for segment in self.prompts)
+            kept = []
+            retained = 0
+            for segment in reversed(turns):
+                used += self._length(segment)
+                if used > self.max_context_len:
+                    break
+                retained += 1
+                if used <= budget:
+                    kept.append(segment)
+
+        # Turns past max_context_len are evicted for good; later turns only ever go after them.
+        stale = {id(segment) for segment in turns[:len(turns) - retained]}
+        if stale:
+            with self.lock:
+                while self.turns and id(self.turns[0]) in stale:
+                    self.turns.popleft()
+                    self.evicted += 1
+        return self.prompts + kept[::-1]
+
+    def clear(self):
+        with self.lock:
+            self.turns.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Turns kept, turns evicted so far and prompt rows of the full context.
+        """
+        with self.lock:
+            turns = list(self.turns)
+        return {
+            "turns": len(turns),
+            "evicted": self.evicted,
+            "context_len": sum(
+                segment.tokens.size(0) for segment in self.prompts + turns if segment.tokens is not None
+            ),
+        }
+
+    def _length(self, segment):
+        return self.generator.tokenize_segment(segment)[0].size(0)
@@ -1,5 +1,128 @@
+import os
+import threading
+from typing import Any, Dict, List, TypedDict
+
 import yaml
 
-def load_config(yaml_path="config.yaml"):
-    with open(yaml_path, "r") as f:
-        return yaml.safe_load(f)
\ No newline at end of file
+
+class DataConfig(TypedDict):
+    pdf: str
+    csv: str
+    vector_store: str
+
+
+class STTConfig(TypedDict):
+    sample_rate: int
+    chunk_duration: float
+    model_size: str
+    device: str
+    compute_type: str
+    beam_size: int
+    vad_parameters: Dict[str, Any]
+
+
+class RAGConfig(TypedDict, total=False):
+    embedding_model: str
+    embedding: Dict[str, Any]
+    chunk_size: int
+    chunk_overlap: int
+    chroma_collection: str
+    backend: str
+    snapshot: Dict[str, Any]
+    retriever_k: Dict[str, int]
+    dedupe: Dict[str, Any]
+    tagging: Dict[str, Any]
+    profile: Dict[str, Any]
+    hybrid: Dict[str, Any]
+    router: Dict[str, Any]
+    context: Dict[str, Any]
+    memory: Dict[str, Any]
+    speculative: Dict[str, Any]
+
+
+class TTSConfig(TypedDict, total=False):
+    speaker: int
+    voice_prompts: List[Dict[str, str]]
+    batching: Dict[str, Any]
+    context: Dict[str, Any]
+    compile: bool
+    compile_cache_dir: str
+    compile_warmup: bool
+    prefill_buckets: List[int]
+    num_codebooks: int
+
+
+class OllamaConfig(TypedDict, total=False):
+    host: str
+    model: str
+    keep_alive: Any
+    preload: bool
+    request_timeout: float
+    max_concurrency: int
+    max_connections: int
+
+
+class LoggingConfig(TypedDict, total=False):
+    level: str
+    file: str
+    queue_size: int
+
+
+class AppConfig(TypedDict, total=False):
+    project: Dict[str, str]
+    data: DataConfig
+    stt: STTConfig
+    rag: RAGConfig
+    tts: TTSConfig
+    pipeline: Dict[str, Any]
+    server: Dict[str, Any]
+    logging: LoggingConfig
+    tracing: Dict[str, Any]
+    ollama: OllamaConfig
+
+
+REQUIRED_SECTIONS = {
+    "data": DataConfig,
+    "stt": STTConfig,
+    "rag": RAGConfig,
+    "logging": LoggingConfig,
+    "ollama": OllamaConfig,
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _validate(config, yaml_path):
+    for section, schema in REQUIRED_SECTIONS.items():
+        if not isinstance(config.get(section), dict):
+            raise ValueError(f"{yaml_path}: missing section '{section}'")
+        missing = [key for key in schema.__required_keys__ if key not in config[section]]
+        if missing:
+            raise ValueError(f"{yaml_path}: section '{section}' is missing {missing}")
+
+
+def load_config(yaml_path="config.yaml") -> AppConfig:
+    """
+    Load the application config, parsing each file only once per process.
+
+    The file is parsed again only if it changed on disk. The returned dict is shared
+    between callers and must not be modified.
+
+    Args:
+        yaml_path (str, optional): Path to the config file. Defaults to "config.yaml".
+
+    Returns:
+        AppConfig: The parsed config.
+    """
+    path = os.path.abspath(yaml_path)
+    mtime = os.stat(path).st_mtime_ns
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, "r") as f:
+            config = yaml.safe_load(f)
+        _validate(config, yaml_path)
+        _cache[path] = (mtime, config)
+        return config
@@ -1,23 +1,146 @@
 import logging
-import yaml
+import logging.handlers
+import atexit
+import queue
+import threading
+import time
 import os
 
+from src.utils.load_config import load_config
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that never blocks the caller: records are dropped, and counted, while the queue is full.
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DroppedRecordsListener(logging.handlers.QueueListener):
+    """
+    QueueListener that warns, at most once per interval, when the queue handler has dropped records.
+    The warning is written straight to the handlers, since the queue is what overflowed.
+    """
+    def __init__(self, log_queue, *handlers, queue_handler, interval_s=10.0, respect_handler_level=False):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.queue_handler = queue_handler
+        self.interval_s = interval_s
+        self.reported = 0
+        self.last_reported = float("-inf")
+
+    def handle(self, record):
+        super().handle(record)
+        dropped = self.queue_handler.dropped
+        now = time.monotonic()
+        if dropped > self.reported and now - self.last_reported >= self.interval_s:
+            warning = logging.getLogger(__name__).makeRecord(
+                __name__, logging.WARNING, __file__, 0,
+                f"Log queue full: dropped {dropped - self.reported} records ({dropped} in total)", None, None
+            )
+            self.reported = dropped
+            self.last_reported = now
+            super().handle(warning)
+
+
+class RateLimitedLogger:
+    def __init__(self, logger, interval_s=1.0):
+        """
+        Log at most once per interval for each message key, for callbacks running on real-time threads.
+
+        Args:
+            logger (logging.Logger): Logger to write to.
+            interval_s (float, optional): Minimum seconds between two records with the same key. Defaults to 1.0.
+        """
+        self.logger = logger
+        self.interval_s = interval_s
+        self.last_logged = {}
+        self.suppressed = {}
+
+    def log(self, level, message, key=None, stacklevel=2):
+        """
+        Args:
+            level (int): Logging level.
+            message (str): Message to log.
+            key (str, optional): Messages with the same key share a rate limit. Defaults to the message itself.
+        """
+        key = key or message
+        now = time.monotonic()
+        if now - self.last_logged.get(key, float("-inf")) < self.interval_s:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return
+        self.last_logged[key] = now
+        suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        self.logger.log(level, message, stacklevel=stacklevel)
+
+    def info(self, message, key=None):
+        self.log(logging.INFO, message, key, stacklevel=3)
+
+    def warning(self, message, key=None):
+        self.log(logging.WARNING, message, key, stacklevel=3)
+
+
+def dropped_log_records():
+    """
+    Returns:
+        int: Records dropped so far because the log queue was full.
+    """
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
 def setup_logging():
-    with open("config.yaml", "r") as f:
-        config = yaml.safe_load(f)
-        
-    log_level = getattr(logging, config["logging"]["level"], logging.INFO)
-    log_file = config["logging"].get("file", "logs/app.log")
-    
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file),
-            logging.StreamHandler()
-        ]
-    )
-    return logging.getLogger(__name__)
+    """
+    Configure logging once per process and return the application logger.
 
+    Callers only put records on a queue; a QueueListener thread formats them and writes
+    to the log file and the console, so slow disk writes never block the caller.
 
+    Returns:
+        logging.Logger: The application logger.
+    """
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            config = load_config("config.yaml")
+
+            log_level = getattr(logging, config["logging"]["level"], logging.INFO)
+            log_file = config["logging"].get("file", "logs/app.log")
+            queue_size = config["logging"].get("queue_size", 10000)
+            dropped_warning_interval_s = config["logging"].get("dropped_warning_interval_s", 10.0)
+
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s")
+            handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+            for handler in handlers:
+                handler.setFormatter(formatter)
+
+            log_queue = queue.Queue(maxsize=queue_size)
+            root = logging.getLogger()
+            root.setLevel(log_level)
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            _queue_handler = DroppingQueueHandler(log_queue)
+            root.addHandler(_queue_handler)
+
+            _listener = DroppedRecordsListener(
+                log_queue, *handlers,
+                queue_handler=_queue_handler,
+                interval_s=dropped_warning_interval_s,
+                respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(_listener.stop)
+    return logging.getLogger(__name__)
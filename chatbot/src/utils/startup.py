@@ -0,0 +1,86 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StartupProfile:
+    def __init__(self):
+        """
+        Wall-clock timings of the steps of a cold start, recorded from any thread.
+        """
+        self.origin = time.perf_counter()
+        self.records = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, name):
+        """
+        Time the enclosed block as one startup component.
+
+        Args:
+            name (str): Component name, dotted by subsystem, e.g. "tts.mimi".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.lock:
+                self.records.append({
+                    "name": name,
+                    "thread": threading.current_thread().name,
+                    "start_s": round(start - self.origin, 3),
+                    "duration_s": round(end - start, 3),
+                })
+
+    def load_parallel(self, loaders):
+        """
+        Run independent loaders on background threads at the same time and wait for all of them.
+
+        Args:
+            loaders (Dict[str, Callable[[], Any]]): Loader per component name.
+
+        Returns:
+            Dict[str, Any]: Result per component name.
+        """
+        def run(name, loader):
+            with self.measure(name):
+                return loader()
+
+        with ThreadPoolExecutor(max_workers=len(loaders), thread_name_prefix="startup") as executor:
+            futures = {name: executor.submit(run, name, loader) for name, loader in loaders.items()}
+            return {name: future.result() for name, future in futures.items()}
+
+    def report(self):
+        """
+        Returns:
+            dict: Seconds since the profile started and every component ordered by start time.
+        """
+        with self.lock:
+            records = sorted(self.records, key=lambda record: record["start_s"])
+        return {"total_s": round(time.perf_counter() - self.origin, 3), "components": records}
+
+    def log_report(self, logger, path=None):
+        """
+        Log the breakdown as a table and optionally write it as JSON.
+
+        Args:
+            logger (logging.Logger): Logger to write the table to.
+            path (str, optional): JSON file to write the report to. Defaults to None.
+        """
+        report = self.report()
+        lines = [f"{'component':<28}{'start':>9}{'duration':>10}  thread"]
+        for record in report["components"]:
+            lines.append(
+                f"{record['name']:<28}{record['start_s']:>8.2f}s{record['duration_s']:>9.2f}s  {record['thread']}"
+            )
+        lines.append(f"{'total':<28}{'':>9}{report['total_s']:>9.2f}s")
+        logger.info("Startup profile:\n" + "\n".join(lines))
+        if path:
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+
+
+startup_profile = StartupProfile()
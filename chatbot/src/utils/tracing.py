@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+from opentelemetry import baggage, context, trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import SpanProcessor, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    BatchSpanProcessor,
+    ConsoleSpanExporter,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from src.utils.load_config import load_config
+
+_setup_lock = threading.Lock()
+_tracing_config = None
+
+
+class JSONLSpanExporter(SpanExporter):
+    def __init__(self, path):
+        """
+        Write finished spans as one JSON object per line, for when there is no collector.
+
+        Args:
+            path (str): Path of the JSONL file, appended to.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "a")
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        lines = []
+        for span in spans:
+            lines.append(json.dumps({
+                "name": span.name,
+                "trace_id": format(span.context.trace_id, "032x"),
+                "span_id": format(span.context.span_id, "016x"),
+                "parent_id": format(span.parent.span_id, "016x") if span.parent else None,
+                "start_time_ns": span.start_time,
+                "duration_ms": round((span.end_time - span.start_time) / 1e6, 3),
+                "attributes": dict(span.attributes or {}),
+                "events": [
+                    {"name": event.name, "offset_ms": round((event.timestamp - span.start_time) / 1e6, 3)}
+                    for event in span.events
+                ],
+                "links": [format(link.context.span_id, "016x") for link in span.links],
+            }))
+        with self.lock:
+            self.file.write("\n".join(lines) + "\n")
+            self.file.flush()
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        with self.lock:
+            self.file.close()
+
+
+class TurnAttributeProcessor(SpanProcessor):
+    """
+    Copy the turn and session ids carried as baggage onto every span started under a turn.
+    """
+    def on_start(self, span, parent_context=None):
+        for key in ("turn.id", "session.id"):
+            value = baggage.get_baggage(key, parent_context)
+            if value is not None:
+                span.set_attribute(key, value)
+
+
+def setup_tracing(config_path="config.yaml"):
+    """
+    Install the global tracer provider from the "tracing" config, once per process.
+
+    Spans go to an OTLP collector when tracing.otlp_endpoint is set, otherwise to a local
+    JSONL file (and optionally the console). With tracing disabled the no-op tracer stays in place.
+
+    Args:
+        config_path (str, optional): Path to the config file. Defaults to "config.yaml".
+
+    Returns:
+        dict: The tracing config.
+    """
+    global _tracing_config
+    with _setup_lock:
+        if _tracing_config is not None:
+            return _tracing_config
+
+        _tracing_config = load_config(config_path).get("tracing", {})
+        if not _tracing_config.get("enabled", False):
+            return _tracing_config
+
+        provider = TracerProvider(resource=Resource.create({
+            "service.name": _tracing_config.get("service_name", "english-buddy")
+        }))
+        provider.add_span_processor(TurnAttributeProcessor())
+        if _tracing_config.get("otlp_endpoint"):
+            from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+            provider.add_span_processor(BatchSpanProcessor(
+                OTLPSpanExporter(endpoint=_tracing_config["otlp_endpoint"], insecure=True)
+            ))
+        else:
+            provider.add_span_processor(BatchSpanProcessor(
+                JSONLSpanExporter(_tracing_config.get("file", "logs/traces.jsonl"))
+            ))
+        if _tracing_config.get("console", False):
+            provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter()))
+        trace.set_tracer_provider(provider)
+        return _tracing_config
+
+
+def get_tracer(name):
+    setup_tracing()
+    return trace.get_tracer(name)
+
+
+def frame_spans_enabled():
+    """
+    Returns:
+        bool: Whether to record a span for every TTS frame.
+    """
+    return setup_tracing().get("frame_spans", False)
+
+
+def now_ns():
+    return time.time_ns()
+
+
+def bind_context(fn):
+    """
+    Bind a callable to the current tracing context, for handing it to an executor thread.
+
+    Args:
+        fn (Callable): Function to run later.
+
+    Returns:
+        Callable: fn running inside a copy of the current context.
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+class TurnTrace:
+    def __init__(self, tracer, turn_id, session_id, start_time=None):
+        """
+        Root span of one conversational turn. Stages activate it so the spans they start become its children.
+
+        Args:
+            tracer (Tracer): Tracer to start the span with.
+            turn_id (int): Id of the turn.
+            session_id (str): Id of the conversation.
+            start_time (int, optional): Start in ns since the epoch, e.g. when the learner started speaking.
+        """
+        parent = baggage.set_baggage("turn.id", str(turn_id), context.Context())
+        parent = baggage.set_baggage("session.id", str(session_id), parent)
+        self.span = tracer.start_span("turn", context=parent, start_time=start_time)
+        self.context = trace.set_span_in_context(self.span, parent)
+        self.start_time = start_time or now_ns()
+        self.ended = False
+        self.first_audio = False
+
+    @contextmanager
+    def activate(self):
+        token = context.attach(self.context)
+        try:
+            yield self
+        finally:
+            context.detach(token)
+
+    def mark_first_audio(self):
+        """
+        Record when the bot's voice first reaches the learner.
+        """
+        if not self.first_audio:
+            self.first_audio = True
+            self.span.add_event("first_audio")
+            self.span.set_attribute("turn.time_to_first_audio_ms", (now_ns() - self.start_time) / 1e6)
+
+    def end(self, cancelled=False):
+        if not self.ended:
+            self.ended = True
+            self.span.set_attribute("turn.cancelled", cancelled)
+            self.span.end()